@@ -22,8 +22,10 @@ setup(
         ]
     },
     install_requires=[            # I get to this in a second
+        'aiohttp',
         'coloredlogs',
         'emoji',
+        'numpy',
         'requests',
         'urllib3',
     ],
@@ -0,0 +1,212 @@
+'''Benchmarks for the word game logic. The Swedish wordlist is read from the package
+data directory unless another one is given with --wordlist.
+
+Usage: python -m tests.benchmark [--wordlist FILE] [benchmark ...]'''
+import argparse
+import gc
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from wordfeudbot.wordfeud_logic.bitmask import BitmaskWordlist
+from wordfeudbot.wordfeud_logic.board import LineMoves
+from wordfeudbot.wordfeud_logic.parallel import LinePool
+from wordfeudbot.wordfeud_logic.wordlist import Wordlist
+
+from .test_wordfeud_logic import random_board
+
+DEFAULT_WORDLIST = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                                'wordfeudbot', 'data', 'wordlists', 'swedish.txt')
+
+
+class TrieNode(object):
+    '''The dict-per-node trie node that Wordlist used before the DAWG, kept as a reference'''
+
+    def __init__(self):
+        self.word = 0
+        self.variants = 0
+        self.children = {}
+
+
+def read_trie(wordfile, variant=1):
+    root = TrieNode()
+    with open(wordfile) as f:
+        for line in f:
+            word = line.lower().strip()
+            if not word or word[0] == '#':
+                continue
+            node = root
+            for ch in word:
+                node.variants |= variant
+                node = node.children.setdefault(ch, TrieNode())
+            node.word |= variant
+            node.variants |= variant
+    return root
+
+
+def count_nodes(root):
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(node.children.values())
+    return len(seen)
+
+
+def measure(load):
+    '''Returns (result, seconds, retained MB, peak MB) for a load function'''
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, current / 2**20, peak / 2**20
+
+
+def bench_load(wordfile):
+    '''Memory and load time of the old trie against the minimized DAWG'''
+    print('%-6s %10s %10s %12s %10s' % ('', 'nodes', 'seconds', 'retained MB', 'peak MB'))
+    trie, seconds, current, peak = measure(lambda: read_trie(wordfile))
+    print('%-6s %10d %10.2f %12.1f %10.1f' % ('trie', count_nodes(trie), seconds, current, peak))
+    del trie
+    wordlist = Wordlist()
+    _, seconds, current, peak = measure(lambda: wordlist.read_wordlist(wordfile))
+    print('%-6s %10d %10.2f %12.1f %10.1f' % ('dawg', count_nodes(wordlist.root), seconds, current, peak))
+
+
+def load_compiled(wordfile):
+    '''Returns a Wordlist memory mapped from a lexicon compiled next to wordfile, or in
+    the temporary directory if that is not writable'''
+    wordlist = Wordlist()
+    path = os.path.splitext(wordfile)[0] + '.lexicon'
+    if not os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+        path = os.path.join(tempfile.gettempdir(), os.path.basename(path))
+    wordlist.load_compiled(path, wordfile)
+    return wordlist
+
+
+def time_moves(board, racks, wordlist, repeat=3, **kwargs):
+    '''Returns (moves, best seconds) for generating and scoring the moves of all racks'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        moves = sum(len(list(board.calc_all_word_scores(rack, wordlist, **kwargs))) for rack in racks)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return moves, best
+
+
+def bench_generate(wordfile):
+    '''calc_all_word_scores on a mid-game board with the string rack and set cross-checks
+    of Wordlist.anchored_words against the bitmask inner loop'''
+    wordlist = load_compiled(wordfile)
+    board = random_board(wordlist, 3, moves=8)
+    racks = ['aeknrst', 'eil*sa', 'dgmo*ru', 'nnåäöss']
+    print(board)
+    print('%-10s %10s %10s' % ('', 'moves', 'seconds'))
+    for name, generator, kwargs in (('trie', wordlist, {}),
+                                    ('anchored', wordlist, {'anchored': True}),
+                                    ('bitmask', BitmaskWordlist(wordlist, dominated_blanks=True), {'anchored': True})):
+        moves, seconds = time_moves(board, racks, generator, **kwargs)
+        print('%-10s %10d %10.3f' % (name, moves, seconds))
+
+
+def bench_blanks(wordfile):
+    '''Racks with 0, 1 and 2 blanks, generating every placement of the blanks against
+    skipping the dominated ones, and the top 10 moves'''
+    wordlist = load_compiled(wordfile)
+    every = BitmaskWordlist(wordlist, dominated_blanks=True)
+    pruned = BitmaskWordlist(wordlist)
+    # the node tables of the lexicon are computed once, keep that out of the timings
+    wordlist.lexicon.heights
+    boards = [random_board(wordlist, seed, moves=8) for seed in (3, 5)]
+    racks = {0: ['aeknrst', 'dgilmou'], 1: ['aekn*st', 'dgi*mou'], 2: ['ae**nst', 'dg*lm*u']}
+    print('%-7s %-12s %10s %10s' % ('blanks', '', 'moves', 'seconds'))
+    for blanks, rack_list in sorted(racks.items()):
+        for name, generator in (('every', every), ('pruned', pruned)):
+            moves = seconds = 0
+            for board in boards:
+                result = time_moves(board, rack_list, generator, repeat=1)
+                moves += result[0]
+                seconds += result[1]
+            print('%-7d %-12s %10d %10.3f' % (blanks, name, moves, seconds))
+        start = time.perf_counter()
+        for board in boards:
+            for rack in rack_list:
+                board.calc_best_word_scores(rack, pruned, num_moves=10)
+        print('%-7d %-12s %10d %10.3f' % (blanks, 'pruned top10', 10 * len(boards) * len(rack_list),
+                                          time.perf_counter() - start))
+
+
+def bench_parallel(wordfile):
+    '''The top 10 moves of a few racks generated line by line in one process against a
+    LinePool with one process per CPU'''
+    wordlist = load_compiled(wordfile)
+    serial = BitmaskWordlist(wordlist)
+    serial.lexicon.heights
+    boards = [random_board(wordlist, seed, moves=8) for seed in (3, 5)]
+    racks = ['aeknrst', 'dgilmou', 'aekn*st', 'ae**nst']
+    print('%-12s %10s %10s' % ('', 'processes', 'seconds'))
+    start = time.perf_counter()
+    for board in boards:
+        for rack in racks:
+            board.calc_best_word_scores(rack, serial, num_moves=10)
+    print('%-12s %10d %10.3f' % ('serial', 1, time.perf_counter() - start))
+    with LinePool(wordlist, multiprocessing.cpu_count()) as pool:
+        # the first call waits for the workers to map the lexicon
+        pool.calc_best_word_scores(boards[0], racks[0])
+        start = time.perf_counter()
+        for board in boards:
+            for rack in racks:
+                pool.calc_best_word_scores(board, rack, num_moves=10)
+        print('%-12s %10d %10.3f' % ('pool', pool.processes, time.perf_counter() - start))
+
+
+def bench_lookahead(wordfile):
+    '''The 3 best replies after each of the 10 best moves, generated on a copy of the
+    board for every move against LineMoves that only generates the changed lines'''
+    wordlist = load_compiled(wordfile)
+    generator = BitmaskWordlist(wordlist)
+    boards = [random_board(wordlist, seed, moves=8) for seed in (3, 5)]
+    print('%-12s %10s %10s' % ('', 'lines', 'seconds'))
+    start = time.perf_counter()
+    for board in boards:
+        for move in board.calc_best_word_scores('aeknrst', generator, num_moves=10):
+            after = board.copy()
+            after.play_word(move[3], move[0], move[1], move[2])
+            after.calc_best_word_scores('dgilmou', generator, num_moves=3)
+    print('%-12s %10d %10.3f' % ('copy', 2 * 10 * 30, time.perf_counter() - start))
+    start = time.perf_counter()
+    lines = 0
+    for board in boards:
+        base = LineMoves(board, 'dgilmou', generator, num_moves=3, anchored=True)
+        lines += base.generated
+        for move in board.calc_best_word_scores('aeknrst', generator, num_moves=10):
+            after = base.after(move)
+            after.moves()
+            lines += after.generated
+    print('%-12s %10d %10.3f' % ('line moves', lines, time.perf_counter() - start))
+
+
+BENCHMARKS = {'load': bench_load, 'generate': bench_generate, 'blanks': bench_blanks,
+              'parallel': bench_parallel, 'lookahead': bench_lookahead}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run word game logic benchmarks')
+    parser.add_argument('--wordlist', default=DEFAULT_WORDLIST, help='Wordlist with one word per line')
+    parser.add_argument('benchmarks', nargs='*', choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        print('== %s ==' % name)
+        BENCHMARKS[name](args.wordlist)
+
+
+if __name__ == '__main__':
+    main()
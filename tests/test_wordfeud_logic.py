@@ -0,0 +1,488 @@
+import heapq
+import os
+import random
+import tempfile
+import unittest
+
+import numpy
+
+from wordfeudbot.wordfeud_logic.bitmask import BitmaskWordlist
+from wordfeudbot.wordfeud_logic.board import Board, Deadline, LineMoves
+from wordfeudbot.wordfeud_logic.endgame import EndgameSolver, placed_tiles, rack_points, remove_tiles
+from wordfeudbot.wordfeud_logic.gaddag import Gaddag
+from wordfeudbot.wordfeud_logic.leave import LeaveIndex, LeaveTable, compile_table, heuristic_value
+from wordfeudbot.wordfeud_logic.parallel import LinePool
+from wordfeudbot.wordfeud_logic.simulation import ReplySimulator, draw_racks
+from wordfeudbot.wordfeud_logic.wordlist import Node, Wordlist
+
+
+def random_words(seed, count=600, alphabet='aeiklnorstå'):
+    rnd = random.Random(seed)
+    return sorted(set(''.join(rnd.choice(alphabet) for _ in range(rnd.randint(2, 7)))
+                      for _ in range(count)))
+
+
+def write_wordlist(words):
+    f = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+    with f:
+        f.write('# test wordlist\n' + '\n'.join(words) + '\n')
+    return f.name
+
+
+def build_trie(words, variant=1):
+    '''The plain trie that Wordlist built before the DAWG'''
+    root = Node()
+    for word in words:
+        node = root
+        for ch in word:
+            node.variants |= variant
+            node = node.child(ch)
+        node.word |= variant
+        node.variants |= variant
+    return root
+
+
+def random_board(wordlist, seed, moves=6, letters='aaeeiiklnnorrsstå'):
+    '''Plays random legal moves on an empty board'''
+    rnd = random.Random(seed)
+    board = Board()
+    for _ in range(moves):
+        rack = ''.join(rnd.choice(letters) for _ in range(7))
+        candidates = list(board.calc_all_word_scores(rack, wordlist))
+        if candidates:
+            x, y, horizontal, word, _ = rnd.choice(candidates)
+            board.play_word(word, x, y, horizontal)
+    return board
+
+
+def minimax(board, wordlist, rack, opponent_rack, passes, width):
+    '''The spread of an end game searched without pruning'''
+    best = None
+    for move in board.calc_best_word_scores(rack, wordlist, 1, width, anchored=True) + [None]:
+        if move is None:
+            value = rack_points(opponent_rack) - rack_points(rack) if passes else \
+                -minimax(board, wordlist, ''.join(sorted(opponent_rack)), rack, 1, width)
+        else:
+            left = remove_tiles(rack, placed_tiles(board, move))
+            if not left:
+                value = move[4] + 2 * rack_points(opponent_rack)
+            else:
+                after = board.copy()
+                after.play_word(move[3], move[0], move[1], move[2])
+                value = move[4] - minimax(after, wordlist, opponent_rack, left, 0, width)
+        best = value if best is None else max(best, value)
+    return best
+
+
+class TestWordlist(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.words = random_words(1)
+        cls.wordfile = write_wordlist(cls.words)
+        cls.wordlist = Wordlist()
+        cls.variant = cls.wordlist.read_wordlist(cls.wordfile)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.wordfile)
+
+    def test_word_count(self):
+        self.assertEqual(self.wordlist.word_count, len(self.words))
+        self.assertEqual([word for word, _ in self.wordlist.iter_words()], self.words)
+
+    def test_is_word(self):
+        for word in self.words:
+            self.assertTrue(self.wordlist.is_word(word))
+        for word in random_words(2, 200):
+            self.assertEqual(bool(self.wordlist.is_word(word)), word in self.words)
+
+    def test_cross_check_cache(self):
+        wordlist = Wordlist(cross_check_cache_size=2)
+        wordlist.read_wordlist(self.wordfile)
+        patterns = [word[0] + ' ' + word[2:] for word in self.words[:20]]
+        expected = [self.wordlist.get_legal_characters(pattern, 1) for pattern in patterns]
+        self.assertEqual([wordlist.get_legal_characters(pattern, 1) for pattern in patterns], expected)
+        self.assertEqual(wordlist.cross_checks.hits, 0)
+        self.assertEqual(len(wordlist.cross_checks), 2)
+        self.assertEqual(wordlist.get_legal_characters(patterns[-1], 1), expected[-1])
+        self.assertEqual(wordlist.cross_checks.hits, 1)
+
+    def test_dawg_shares_suffixes(self):
+        trie = build_trie(self.words)
+        self.assertLess(count_nodes(self.wordlist.root), count_nodes(trie))
+
+    def test_dawg_matches_trie(self):
+        trie = build_trie(self.words)
+        rnd = random.Random(3)
+        rowdata = [(self.wordlist.all_chars, i % 3 == 0) for i in range(16)]
+        for _ in range(30):
+            row = ''.join(rnd.choice('   ast') for _ in range(15)) + ' '
+            letters = ''.join(rnd.choice('aeiklnorst*') for _ in range(5))
+            for pos in range(15):
+                self.assertEqual(
+                    sorted(self.wordlist.root.matches(row, rowdata, pos, letters, self.variant)),
+                    sorted(trie.matches(row, rowdata, pos, letters, self.variant)))
+
+    def test_add_after_minimize(self):
+        wordlist = Wordlist()
+        wordlist.read_wordlist(self.wordfile)
+        wordlist.add('stekare', 1)
+        self.assertTrue(wordlist.is_word('stekare'))
+        self.assertFalse(self.wordlist.is_word('stekare'))
+        for word in self.words:
+            self.assertTrue(wordlist.is_word(word))
+
+
+class TestCompiledLexicon(unittest.TestCase):
+
+    def setUp(self):
+        self.words = random_words(4)
+        self.wordfile = write_wordlist(self.words)
+        self.path = self.wordfile + '.lexicon'
+        self.reference = Wordlist()
+        self.reference.read_wordlist(self.wordfile)
+
+    def tearDown(self):
+        for path in (self.wordfile, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_compiled_matches_graph(self):
+        wordlist = Wordlist()
+        self.assertEqual(wordlist.load_compiled(self.path, self.wordfile), 1)
+        self.assertIsNotNone(wordlist.lexicon)
+        self.assertEqual(list(wordlist.iter_words()), list(self.reference.iter_words()))
+        self.assertEqual(wordlist.all_chars, self.reference.all_chars)
+        rnd = random.Random(5)
+        rowdata = [(wordlist.all_chars, i % 4 == 1) for i in range(16)]
+        for _ in range(20):
+            row = ''.join(rnd.choice('   ekn') for _ in range(15))
+            letters = ''.join(rnd.choice('aeiklnorst*') for _ in range(5))
+            self.assertEqual(sorted(wordlist.words(row, rowdata[:15], letters, 1)),
+                             sorted(self.reference.words(row, rowdata[:15], letters, 1)))
+        for word in self.words[:50]:
+            pattern = word[:1] + ' ' + word[2:]
+            self.assertEqual(wordlist.get_legal_characters(pattern, 1),
+                             self.reference.get_legal_characters(pattern, 1))
+
+    def test_stale_lexicon_is_rebuilt(self):
+        Wordlist().load_compiled(self.path, self.wordfile)
+        with open(self.wordfile, 'a') as f:
+            f.write('stekare\n')
+        wordlist = Wordlist()
+        wordlist.load_compiled(self.path, self.wordfile)
+        self.assertTrue(wordlist.is_word('stekare'))
+        self.assertIsNotNone(wordlist.lexicon)
+        unchecked = Wordlist()
+        unchecked.load_compiled(self.path)
+        self.assertTrue(unchecked.is_word('stekare'))
+
+
+class TestBoard(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board([['2w'] * 15 for _ in range(15)], expand=False)
+        self.board.play_word('kant', 4, 7, True)
+
+    def test_layout(self):
+        layout = Board().layout
+        self.assertEqual((layout.letter_multipliers[0], layout.word_multipliers[0]), (3, 1))
+        self.assertEqual((layout.letter_multipliers[4], layout.word_multipliers[4]), (1, 3))
+        self.assertEqual((layout.letter_multipliers[7*15+7], layout.word_multipliers[7*15+7]), (1, 1))
+
+    def test_word_points(self):
+        self.assertEqual(self.board.calc_word_points('ek', 4, 6, False), 8)
+        self.assertEqual(self.board.calc_word_points('se', 3, 6, True), 16)
+        self.assertEqual(self.board.calc_word_points('Se', 3, 6, True), 12)
+        self.assertEqual(self.board.calc_word_points('kants', 4, 7, True), 14)
+        self.assertEqual(Board([['2w'] * 15 for _ in range(15)], expand=False).calc_word_points(
+            'aeknrst', 4, 7, True), 9 * 2**7 + 40)
+
+    def test_copy(self):
+        board = self.board.copy()
+        board.play_word('se', 3, 6, True)
+        self.assertEqual(self.board.calc_word_points('se', 3, 6, True), 16)
+        self.assertEqual(board.calc_word_points('tse', 2, 6, True), 6)
+
+    def test_hash(self):
+        board = self.board.copy()
+        board.play_word('se', 3, 6, True)
+        self.assertNotEqual(hash(board), hash(self.board))
+        board.play_word('  ', 3, 6, True)
+        self.assertEqual(hash(board), hash(self.board))
+        self.assertEqual(board, self.board)
+        same = Board([['2w'] * 15 for _ in range(15)], expand=False)
+        same.set_state(self.board.horizontal)
+        self.assertEqual(hash(same), hash(self.board))
+        self.assertEqual({self.board: 1}.get(same), 1)
+        other = Board()
+        other.set_state(self.board.horizontal)
+        self.assertNotEqual(hash(other), hash(self.board))
+        self.assertNotEqual(other, self.board)
+
+
+class TestLeaveTable(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LeaveIndex('abes*', 4)
+        self.table = LeaveTable(compile_table({'bb': 5.0}, index=self.index))
+
+    def test_index(self):
+        indices = sorted(i for (i, _) in self.index.leaves())
+        self.assertEqual(indices, list(range(self.index.size)))
+        self.assertEqual(self.index.index(''), 0)
+        for (i, leave) in self.index.leaves():
+            self.assertEqual(self.index.index(leave[::-1]), i)
+        self.assertRaises(ValueError, self.index.index, 'aaaaa')
+
+    def test_values(self):
+        for (_, leave) in self.index.leaves():
+            if leave != 'bb':
+                self.assertAlmostEqual(self.table.value(leave), heuristic_value(leave), places=2)
+        self.assertEqual(self.table.value('bb'), 5.0)
+        self.assertEqual(self.table.move_value('bsab*', ['a', '*', 's']), 5.0)
+        self.assertGreater(self.table.value('*s'), self.table.value('bb'))
+
+    def test_other_tiles(self):
+        self.assertTrue(self.table.covers('bsab*'))
+        self.assertFalse(self.table.covers('abewq'))
+        self.assertFalse(LeaveTable(compile_table(index=LeaveIndex(max_leave=1))).covers('abcdewq'))
+        self.assertRaises(KeyError, self.table.move_value, 'abewq', ['a'])
+
+    def test_load(self):
+        with tempfile.NamedTemporaryFile(suffix='.leaves', delete=False) as f:
+            f.write(compile_table(index=self.index))
+        try:
+            table = LeaveTable.load(f.name)
+            self.assertAlmostEqual(table.value('sea'), heuristic_value('sea'), places=2)
+            self.assertEqual(table.path, f.name)
+        finally:
+            os.remove(f.name)
+        self.assertRaises(ValueError, LeaveTable, b'WFLEX\x00\x00\x01' + bytes(16))
+
+
+class TestMoveGeneration(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.wordfile = write_wordlist(random_words(6, 1000))
+        cls.wordlist = Wordlist()
+        cls.wordlist.read_wordlist(cls.wordfile)
+        cls.boards = [Board()] + [random_board(cls.wordlist, seed) for seed in range(3)]
+        cls.racks = ['aeknrst', 'eil*sa', 'k**', 'nnåå']
+        cls.expected = [[sorted(board.calc_all_word_scores(rack, cls.wordlist)) for rack in cls.racks]
+                        for board in cls.boards]
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.wordfile)
+
+    def assertSameMoves(self, wordlist, **kwargs):
+        for board, expected in zip(self.boards, self.expected):
+            for rack, moves in zip(self.racks, expected):
+                self.assertEqual(sorted(board.calc_all_word_scores(rack, wordlist, **kwargs)), moves)
+
+    def test_gaddag(self):
+        self.assertSameMoves(Gaddag(self.wordlist))
+
+    def test_anchored(self):
+        self.assertSameMoves(self.wordlist, anchored=True)
+
+    def test_bitmask(self):
+        self.assertSameMoves(BitmaskWordlist(self.wordlist, dominated_blanks=True), anchored=True)
+
+    def test_scored_while_generated(self):
+        wordlist = BitmaskWordlist(self.wordlist, dominated_blanks=True)
+        for seed in range(4):
+            board = random_board(self.wordlist, seed, moves=10)
+            for rack in self.racks + ['aeiklno']:
+                for (x, y, horizontal, word, points) in board.calc_all_word_scores(rack, wordlist):
+                    self.assertEqual(points, board.calc_word_points(word, x, y, horizontal))
+
+    def test_dominated_blanks(self):
+        wordlist = BitmaskWordlist(self.wordlist)
+        for board, expected in zip(self.boards, self.expected):
+            for rack, moves in zip(self.racks, expected):
+                best = {}
+                for (x, y, horizontal, word, points) in moves:
+                    placed = [ch for i, ch in enumerate(word) if
+                              not board.is_occupied(x + (i if horizontal else 0), y + (0 if horizontal else i))]
+                    left = rack
+                    for ch in placed:
+                        left = left.replace('*' if ch.isupper() else ch, '', 1)
+                    if any(ch.isupper() and ch.lower() in left for ch in placed):
+                        continue
+                    key = (x, y, horizontal, word.lower())
+                    if key not in best or best[key][4] < points:
+                        best[key] = (x, y, horizontal, word, points)
+                self.assertEqual(sorted(move[4] for move in board.calc_all_word_scores(rack, wordlist)),
+                                 sorted(move[4] for move in best.values()))
+                self.assertEqual(sorted(move[:3] + (move[3].lower(),) for move in
+                                        board.calc_all_word_scores(rack, wordlist)), sorted(best))
+
+    def test_best_moves(self):
+        wordlist = BitmaskWordlist(self.wordlist, dominated_blanks=True)
+        for seed in range(4):
+            board = random_board(self.wordlist, seed, moves=10)
+            for rack in self.racks:
+                for num_moves in (1, 10):
+                    self.assertEqual(board.calc_best_word_scores(rack, wordlist, num_moves=num_moves),
+                                     heapq.nlargest(num_moves, board.calc_all_word_scores(rack, wordlist),
+                                                    lambda move: move[4]))
+
+    def test_deadline(self):
+        ticks = iter(range(1000))
+        for wordlist in (BitmaskWordlist(self.wordlist), self.wordlist):
+            for seed in range(3):
+                board = random_board(self.wordlist, seed, moves=10)
+                for rack in self.racks:
+                    expected = board.calc_best_word_scores(rack, wordlist, num_moves=5)
+                    deadline = Deadline(None)
+                    moves = board.calc_best_word_scores(rack, wordlist, num_moves=5, deadline=deadline)
+                    self.assertEqual([move[4] for move in moves], [move[4] for move in expected])
+                    self.assertFalse(deadline.reached)
+                    # only the most promising line is generated when the deadline has passed
+                    for deadline in (Deadline(0), Deadline(1, clock=lambda: next(ticks))):
+                        moves = board.calc_best_word_scores(rack, wordlist, num_moves=5, deadline=deadline)
+                        self.assertTrue(deadline.reached)
+                        self.assertLessEqual(set(moves), set(board.calc_all_word_scores(rack, wordlist)))
+                        self.assertLessEqual(len(set((move[2], move[1] if move[2] else move[0]) for move in moves)), 1)
+
+    def test_incremental_cross_checks(self):
+        rnd = random.Random(7)
+        for anchored in (False, True):
+            board = Board()
+            for _ in range(6):
+                rack = ''.join(rnd.choice('aaeeiiklnnorrsstå*') for _ in range(7))
+                moves = list(board.calc_all_word_scores(rack, self.wordlist, anchored=anchored))
+                fresh = Board()
+                fresh.set_state(board.horizontal)
+                self.assertEqual(sorted(moves), sorted(fresh.calc_all_word_scores(rack, self.wordlist)))
+                self.assertEqual(board.rowdata, fresh.rowdata)
+                self.assertEqual(board.anchors, fresh.anchors)
+                if moves:
+                    x, y, horizontal, word, _ = rnd.choice(moves)
+                    copy = board.copy()
+                    board.play_word(word, x, y, horizontal)
+                    self.assertNotEqual(copy.horizontal, board.horizontal)
+
+    def test_line_moves(self):
+        for (wordlist, anchored) in ((BitmaskWordlist(self.wordlist), True), (self.wordlist, False)):
+            for board in self.boards[1:]:
+                base = LineMoves(board, 'eilsar', wordlist, num_moves=3, anchored=anchored)
+                self.assertEqual(base.moves(), board.calc_best_word_scores('eilsar', wordlist, num_moves=3,
+                                                                           anchored=anchored))
+                for move in board.calc_best_word_scores('aeknrst', wordlist, num_moves=4):
+                    after = base.after(move)
+                    played = board.copy()
+                    played.play_word(move[3], move[0], move[1], move[2])
+                    self.assertEqual(after.moves(), played.calc_best_word_scores('eilsar', wordlist, num_moves=3,
+                                                                                 anchored=anchored))
+                    self.assertLess(after.generated, len(after.lines))
+
+    def test_endgame(self):
+        wordlist = BitmaskWordlist(self.wordlist)
+        for (seed, rack, opponent_rack) in ((0, 'aek', 'nrs'), (1, 'ilo', 'aekr'), (2, 'nrs*', 'aet')):
+            board = random_board(self.wordlist, seed, moves=8)
+            rows = list(board.horizontal)
+            solver = EndgameSolver(wordlist, width=4)
+            moves = solver.solve(board, rack, opponent_rack)
+            self.assertTrue(solver.exact)
+            self.assertEqual(board.horizontal, rows)
+            spreads = []
+            for move in board.calc_best_word_scores(''.join(sorted(rack)), wordlist, 1, 4, anchored=True):
+                left = remove_tiles(''.join(sorted(rack)), placed_tiles(board, move))
+                after = board.copy()
+                after.play_word(move[3], move[0], move[1], move[2])
+                spreads.append(move[4] + (-minimax(after, wordlist, opponent_rack, left, 0, 4) if left else
+                                          2 * rack_points(opponent_rack)))
+            best = moves[0]
+            self.assertEqual(best[5], max(spreads))
+            self.assertTrue(all(move[5] <= best[5] for move in moves))
+        solver = EndgameSolver(wordlist)
+        solver.solve(random_board(self.wordlist, 3, moves=8), 'aeiklnr', 'ekorst*', budget=0)
+        self.assertFalse(solver.exact)
+
+    def test_line_pool(self):
+        path = self.wordfile + '.lexicon'
+        try:
+            wordlist = Wordlist()
+            wordlist.load_compiled(path, self.wordfile)
+            serial = BitmaskWordlist(wordlist)
+            with LinePool(wordlist, processes=2) as pool:
+                for seed in range(3):
+                    board = random_board(wordlist, seed, moves=10)
+                    for rack in self.racks:
+                        self.assertEqual(pool.calc_all_word_scores(board, rack),
+                                         list(board.calc_all_word_scores(rack, serial)))
+                        # the lines that are left when the deadline has passed are skipped
+                        deadline = Deadline(0)
+                        self.assertEqual(pool.calc_best_word_scores(board, rack, num_moves=5, deadline=deadline), [])
+                        self.assertTrue(deadline.reached)
+                        moves = pool.calc_best_word_scores(board, rack, num_moves=5, deadline=Deadline(0.05))
+                        self.assertLessEqual(set(moves), set(board.calc_all_word_scores(rack, serial)))
+                        self.assertEqual(pool.calc_best_word_scores(board, rack, num_moves=5),
+                                         board.calc_best_word_scores(rack, serial, num_moves=5))
+            self.assertRaises(ValueError, LinePool, self.wordlist)
+        finally:
+            os.remove(path)
+
+    def test_reply_simulation(self):
+        racks = draw_racks('aab*', 1000, 3)
+        self.assertEqual(sorted(rack for (rack, _) in racks), ['*aa', '*ab', 'aab'])
+        self.assertEqual(sum(times for (_, times) in racks), 1000)
+        self.assertEqual(draw_racks('ab', 10), [('ab', 10)])
+        path = self.wordfile + '.lexicon'
+        try:
+            wordlist = Wordlist()
+            wordlist.load_compiled(path, self.wordfile)
+            serial = BitmaskWordlist(wordlist)
+            board = random_board(wordlist, 1, moves=6)
+            moves = board.calc_best_word_scores('aeknrst', serial, num_moves=3)
+            unseen = 'aaeeiiklnnorrsstå'
+            replies = ReplySimulator(serial, racks=12, seed=1).simulate(board, unseen, moves)
+            racks = draw_racks(unseen, 12, rng=numpy.random.default_rng(1))
+            for (i, (expected, worst, count)) in enumerate(replies):
+                after = board.copy()
+                if i:
+                    (x, y, horizontal, word, _) = moves[i-1]
+                    after.play_word(word, x, y, horizontal)
+                points = [(times, max([move[4] for move in after.calc_all_word_scores(rack, serial, anchored=True)] or [0]))
+                          for (rack, times) in racks]
+                self.assertEqual(count, 12)
+                self.assertAlmostEqual(expected, sum(times * reply for (times, reply) in points) / 12)
+                self.assertEqual(worst, max(reply for (_, reply) in points))
+            with LinePool(wordlist, processes=2) as pool:
+                self.assertEqual(ReplySimulator(serial, pool.pool, racks=12, seed=1).simulate(board, unseen, moves),
+                                 replies)
+            simulator = ReplySimulator(serial, racks=12, chunk=2, seed=1)
+            self.assertEqual(simulator.simulate(board, unseen, moves, budget=0)[0][2],
+                             sum(times for (_, times) in racks[:2]))
+            self.assertEqual(simulator.timeouts, 1)
+        finally:
+            os.remove(path)
+
+    def test_anchored_compiled(self):
+        path = self.wordfile + '.lexicon'
+        try:
+            wordlist = Wordlist()
+            wordlist.load_compiled(path, self.wordfile)
+            self.assertSameMoves(wordlist, anchored=True)
+        finally:
+            os.remove(path)
+
+
+def count_nodes(root):
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(node.children.values())
+    return len(seen)
+
+
+if __name__ == '__main__':
+    unittest.main()
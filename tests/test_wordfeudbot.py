@@ -1,5 +1,15 @@
-import wordfeudbot.main as wfbot
+import asyncio
+import collections
+import json
+import time
+import types
 import unittest
+from unittest import mock
+
+import requests
+
+import wordfeudbot.main as wfbot
+from wordfeudbot.wordfeud_logic.leave import LeaveIndex, LeaveTable, compile_table
 
 
 class TestStringMethods(unittest.TestCase):
@@ -36,5 +46,404 @@ class TestStringMethods(unittest.TestCase):
         self.assertFalse(wfbot.is_emoji('njdwe"%¤%&!/'))
 
 
+class TestPollScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.slept = []
+        self.scheduler = wfbot.PollScheduler(30, 3600, 21600, clock=lambda: self.now, sleep=self.sleep)
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def test_interval_adapts(self):
+        self.assertTrue(self.scheduler.start_pass())
+        self.scheduler.wait()
+        self.assertEqual(self.slept, [60])
+        for _ in range(10):
+            self.scheduler.start_pass()
+            self.scheduler.wait()
+        self.assertEqual(self.scheduler.interval, 3600)
+        self.scheduler.start_pass()
+        self.now += 10
+        self.scheduler.turn(self.now - 100)
+        self.assertEqual((self.scheduler.queue_depth, self.scheduler.lag), (1, 100))
+        self.scheduler.wait()
+        self.assertEqual(self.slept[-1], 1800 - 10)
+
+    def test_full_sync(self):
+        passes = []
+        for _ in range(30):
+            passes.append(self.scheduler.start_pass())
+            self.scheduler.turn(self.now)
+            self.now += 1000
+        self.assertEqual([i for i, full in enumerate(passes) if full], [0, 22])
+        self.assertEqual(self.scheduler.full_syncs, 2)
+
+
+BOARD = {"board_id": 0, "board": [[0] * 15 for _ in range(15)]}
+
+
+def game_data(game_id, updated, rack=("A",)):
+    return {"id": game_id, "updated": updated, "board": 0, "ruleset": 4, "bag_count": 50, "tiles": [],
+            "last_move": None, "is_running": True, "current_player": 1,
+            "players": [{"is_local": False, "rack": [], "score": 0, "username": "opponent"},
+                        {"is_local": True, "rack": list(rack), "score": 0, "username": "bot"}]}
+
+
+class FakeServer:
+    # answers the game requests of a client, the games of the bulk request can be left out
+
+    def __init__(self, games, bulk_games=None):
+        self.games = {game["id"]: game for game in games}
+        self.bulk_games = bulk_games
+        self.paths = []
+
+    def request(self, method, path, data=None, check=True, idempotent=True):
+        path = path.split("?")[0]
+        self.paths.append(path)
+        if path == "/wf/user/games/detail/":
+            games = [game for game in self.games.values() if self.bulk_games is None or game["id"] in self.bulk_games]
+        else:
+            games = [self.games[int(path.split("/")[3])]]
+        return {"status": "success", "content": {"games": [dict(game) for game in games], "boards": [BOARD]}}
+
+
+class TestGameCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = wfbot.GameCache()
+        self.assertIsNone(cache.get(1, 10.0))
+        cache.update({"status": "success", "content": {"games": [game_data(1, 10.0)], "boards": [BOARD]}})
+        self.assertEqual(cache.get(1, 10.0)["content"]["games"][0]["id"], 1)
+        # updated since it was fetched
+        self.assertIsNone(cache.get(1, 11.0))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(cache.stale({1: 10.0, 2: 5.0}), [2])
+        self.assertEqual(cache.stale({1: 11.0}), [1])
+        self.assertEqual(cache.known_query(), "known_tile_points=&known_boards=0")
+        cache.forget_games([2])
+        self.assertEqual(cache.stale({1: 10.0}), [1])
+        self.assertIn(0, cache.board_layouts)
+
+    def test_fetch_by_updated(self):
+        wf = wfbot.Wordfeud()
+        server = FakeServer([game_data(1, 10.0)])
+        wf.request = server.request
+        wf.board_and_tile_data(1, 10.0)
+        wf.board_and_tile_data(1, 10.0)
+        self.assertEqual(server.paths, ["/wf/games/1/"])
+        server.games[1] = game_data(1, 12.0)
+        self.assertEqual(wf.board_and_tile_data(1, 12.0)["content"]["games"][0]["updated"], 12.0)
+        self.assertEqual(server.paths, ["/wf/games/1/"] * 2)
+
+
+class TestFetchGames(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer([game_data(game_id, 10.0) for game_id in (1, 2, 3)])
+        self.summaries = [{"id": game_id, "updated": 10.0, "chat_count": 1, "read_chat_count": 1}
+                          for game_id in (1, 2, 3)]
+
+    def fetch(self, last_check, threshold):
+        wf = wfbot.Wordfeud()
+        wf.request = self.server.request
+        return wfbot.fetch_games(wf, self.summaries, last_check, threshold)
+
+    def fetch_pass(self, last_check, threshold):
+        awf = wfbot.AsyncWordfeud()
+
+        async def request(*args, **kwargs):
+            return self.server.request(*args, **kwargs)
+        awf.request = request
+        return asyncio.run(wfbot.fetch_pass(awf, self.summaries, last_check, threshold, [], ()))
+
+    def test_threshold(self):
+        for fetch in (self.fetch, self.fetch_pass):
+            # three changed games reach a threshold of three
+            self.server.paths = []
+            self.assertEqual(sorted(fetch(0, 3)), [1, 2, 3])
+            self.assertEqual(self.server.paths, ["/wf/user/games/detail/"])
+            self.server.paths = []
+            self.assertEqual(sorted(fetch(0, 4)), [1, 2, 3])
+            self.assertEqual(sorted(self.server.paths), ["/wf/games/1/", "/wf/games/2/", "/wf/games/3/"])
+
+    def test_last_check(self):
+        self.summaries[0]["updated"] = 5.0
+        for fetch in (self.fetch, self.fetch_pass):
+            self.server.paths = []
+            self.assertEqual(sorted(fetch(8.0, 2)), [2, 3])
+            self.assertEqual(self.server.paths, ["/wf/user/games/detail/"])
+
+    def test_fallback(self):
+        # a game that is left out of the bulk response is fetched on its own
+        self.server.bulk_games = {1, 2}
+        for fetch in (self.fetch, self.fetch_pass):
+            self.server.paths = []
+            games = fetch(0, 1)
+            self.assertEqual(sorted(games), [1, 2, 3])
+            self.assertEqual(games[3].game_id, 3)
+            self.assertEqual(self.server.paths, ["/wf/user/games/detail/", "/wf/games/3/"])
+
+
+class TestSolveTurn(unittest.TestCase):
+
+    @mock.patch.object(wfbot, 'LEAVE_WEIGHT', 1.0)
+    @mock.patch.object(wfbot, 'LEAVES', LeaveTable(compile_table(index=LeaveIndex(max_leave=2))))
+    def test_leave_values(self):
+        cache = wfbot.GameCache()
+        cache.update_board_quarters([BOARD])
+        with mock.patch.object(wfbot, 'best_word_scores', return_value=[(7, 7, True, 'ab', 10)]):
+            game = wfbot.WordfeudGame(game_data(1, 10.0, "ABC"), cache.board_quarters)
+            self.assertEqual(wfbot.solve_turn(game), ([(7, 7, True, 'ab', 10, 10 + wfbot.LEAVES.value('c'))], False))
+            # the tiles of other rulesets are not in the table, the moves are ranked by points
+            game = wfbot.WordfeudGame(game_data(1, 10.0, "ABW"), cache.board_quarters)
+            self.assertEqual(wfbot.solve_turn(game), ([(7, 7, True, 'ab', 10, 10)], False))
+
+    @mock.patch.object(wfbot, 'TURN_BUDGET', 0.001)
+    def test_turn_budget(self):
+        cache = wfbot.GameCache()
+        cache.update_board_quarters([BOARD])
+        game = wfbot.WordfeudGame(game_data(1, 10.0, "ABC"), cache.board_quarters)
+        moves = [(7, 7, True, 'ab', 10)]
+
+        def generate(board, letters, num_moves, deadline, stop=False):
+            time.sleep(0.01)
+            if stop:
+                # a search that looks at the deadline stops early
+                deadline.passed()
+            return moves
+        # a turn that ends late without stopping a search did not use up the budget
+        with mock.patch.object(wfbot, 'best_word_scores', generate):
+            self.assertEqual(wfbot.solve_turn(game), ([moves[0] + (10,)], False))
+        with mock.patch.object(wfbot, 'best_word_scores', lambda *args: generate(*args, stop=True)):
+            self.assertEqual(wfbot.solve_turn(game), ([moves[0] + (10,)], True))
+
+    @mock.patch.object(wfbot, 'TURN_BUDGET', 0.001)
+    @mock.patch.object(wfbot, 'ENDGAME_BUDGET', 0)
+    def test_no_lookahead_out_of_time(self):
+        cache = wfbot.GameCache()
+        cache.update_board_quarters([BOARD])
+        game = wfbot.WordfeudGame(dict(game_data(1, 10.0, "ABC"), bag_count=0), cache.board_quarters)
+        moves = [(7, 7, True, 'abc', 12), (7, 7, True, 'ab', 10)]
+
+        def generate(board, letters, num_moves, deadline):
+            time.sleep(0.01)
+            return moves
+        with mock.patch.object(wfbot, 'best_word_scores', generate), \
+                mock.patch.object(wfbot.WordfeudGame, 'opponent_line_moves') as opponent_line_moves:
+            self.assertEqual(wfbot.solve_turn(game), ([move + (move[4],) for move in moves], True))
+        opponent_line_moves.assert_not_called()
+
+
+class TestRateBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.slept = []
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def test_budget(self):
+        budget = wfbot.RateBudget(60, 3, clock=lambda: self.now, sleep=self.sleep)
+        for _ in range(3):
+            budget.acquire()
+        self.assertEqual(self.slept, [])
+        budget.acquire()
+        self.assertAlmostEqual(self.slept[0], 1)
+        self.now += 10
+        for _ in range(3):
+            budget.acquire()
+        self.assertEqual(len(self.slept), 1)
+        budget.acquire()
+        self.assertAlmostEqual(budget.waited, 2)
+
+
+def response(status_code, body, cookies=None):
+    # a response of the requests session in TestWordfeud
+    result = mock.Mock(status_code=status_code, cookies=mock.Mock())
+    result.json.side_effect = lambda: json.loads(body)
+    result.cookies.get_dict.return_value = cookies or {}
+    return result
+
+
+class TestWordfeud(unittest.TestCase):
+
+    def setUp(self):
+        self.wf = wfbot.Wordfeud(backoff=0)
+        self.wf.session = mock.Mock()
+        self.wf.sessionid = "old"
+        self.cookies = []
+        self.responses = []
+        self.wf.session.request.side_effect = self.send
+
+    def send(self, method, url, data=None, headers=None, **kwargs):
+        self.cookies.append(headers.get("Cookie"))
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def test_retry(self):
+        self.responses = [requests.exceptions.ConnectTimeout(), response(503, "<html>"),
+                                               response(502, "<html>"), response(200, '{"status": "success"}')]
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/"), {"status": "success"})
+        self.assertEqual(len(self.cookies), 4)
+        self.responses = [response(500, "<html>")] * 5
+        self.assertRaises(requests.exceptions.HTTPError, self.wf.request, "GET", "/wf/user/status/")
+
+    def test_no_retry_of_moves(self):
+        # the server may have played the move
+        self.responses = [requests.exceptions.ReadTimeout()]
+        self.assertRaises(wfbot.CONNECTION_ERRORS, self.wf.request, "POST", "/wf/game/1/move/", "{}",
+                          idempotent=False)
+        self.responses = [response(500, "<html>")]
+        self.assertRaises(wfbot.CONNECTION_ERRORS, self.wf.request, "POST", "/wf/game/1/move/", "{}",
+                          idempotent=False)
+        self.assertEqual(len(self.cookies), 2)
+
+    def test_invalid_json(self):
+        self.responses = [response(200, "<html>"), response(200, '{"status": "success"}')]
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/"), {"status": "success"})
+        self.responses = [response(200, "<html>")] * 5
+        self.assertRaises(wfbot.CONNECTION_ERRORS, self.wf.request, "GET", "/wf/user/status/")
+
+    def test_login_again(self):
+        self.wf.user_id = 1
+        self.wf.password = "secret"
+        self.wf.language_code = "sv"
+        self.responses = [response(401, '{"status": "error"}'), response(200, '{"status": "success"}')]
+        self.wf.session.post.return_value = response(200, '{"status": "success"}', {"sessionid": "new"})
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/"), {"status": "success"})
+        self.assertEqual(self.cookies, ["sessionid=old", "sessionid=new"])
+        # the resend after logging in is not a retry
+        self.wf.retries = 1
+        self.responses = [response(503, "<html>"), response(401, '{"status": "error"}'),
+                          response(200, '{"status": "success"}')]
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/"), {"status": "success"})
+        self.wf.retries = 0
+        self.responses = [response(401, '{"status": "error"}'), response(200, '{"status": "success"}')]
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/"), {"status": "success"})
+        self.assertEqual(self.wf.session.post.call_count, 3)
+        # the session is renewed once for each request
+        self.responses = [response(401, '{"status": "error"}')] * 2
+        self.assertEqual(self.wf.request("GET", "/wf/user/status/", check=False), {"status": "error"})
+        self.assertEqual(self.wf.session.post.call_count, 4)
+
+
+class FakeResponse:
+    # a response of the aiohttp session in TestAsyncWordfeud
+    request_info = mock.Mock(real_url="https://api.wordfeud.com")
+    history = ()
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        self.cookies = {}
+
+    async def json(self, content_type=None):
+        return json.loads(self.body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeSession:
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.cookies = []
+
+    def request(self, method, path, data=None, headers=None):
+        self.cookies.append(headers.get("Cookie"))
+        return self.responses.pop(0)
+
+
+class TestAsyncWordfeud(unittest.TestCase):
+
+    def request(self, responses, client=None, rate_budget=None, retries=4, **kwargs):
+        awf = wfbot.AsyncWordfeud(backoff=0, client=client, rate_budget=rate_budget, retries=retries)
+        awf.sessionid = "old"
+        awf.session = FakeSession(responses)
+
+        async def run():
+            awf.semaphore = asyncio.Semaphore(1)
+            awf.login_lock = asyncio.Lock()
+            return await awf.request("GET", "/wf/user/status/", **kwargs)
+        return (asyncio.run(run()), awf.session.cookies)
+
+    def test_retry(self):
+        (parsed, cookies) = self.request([FakeResponse(503, "<html>"), FakeResponse(200, '{"status": "success"}')])
+        self.assertEqual(parsed, {"status": "success"})
+        self.assertEqual(len(cookies), 2)
+        with self.assertRaises(wfbot.CONNECTION_ERRORS):
+            self.request([FakeResponse(502, "<html>")] * 5)
+        (parsed, cookies) = self.request([FakeResponse(200, "<html>"), FakeResponse(200, '{"status": "success"}')])
+        self.assertEqual(parsed, {"status": "success"})
+
+    def test_rate_budget(self):
+        now = [0.0]
+        budget = wfbot.RateBudget(60, 1, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+        budget.acquire = mock.Mock(wraps=budget.acquire)
+        self.request([FakeResponse(503, "<html>"), FakeResponse(200, '{"status": "success"}')], rate_budget=budget)
+        # every attempt waits for the budget, the second one a second
+        self.assertEqual(budget.acquire.call_count, 2)
+        self.assertEqual(now[0], 1.0)
+        self.assertAlmostEqual(budget.waited, 1.0)
+
+    def test_login_again(self):
+        client = mock.Mock(user_id=1, password="secret", language_code="sv")
+        client.login.side_effect = lambda *args: setattr(client, "sessionid", "new")
+        (parsed, cookies) = self.request([FakeResponse(200, '{"status": "error", "content": {"type": "login_required"}}'),
+                                          FakeResponse(200, '{"status": "success"}')], client)
+        self.assertEqual(parsed, {"status": "success"})
+        client.login.assert_called_once_with(1, "secret", "sv")
+        self.assertEqual(cookies, ["sessionid=old", "sessionid=new"])
+        # the resend after logging in is not a retry
+        (parsed, cookies) = self.request([FakeResponse(401, '{"status": "error"}'),
+                                          FakeResponse(200, '{"status": "success"}')], client, retries=0)
+        self.assertEqual(parsed, {"status": "success"})
+
+
+def solved(game):
+    # solve_turn of the solver processes in TestTurnPipeline, the first game runs out of time
+    return ([], game.game_id == 1)
+
+
+def play_turn(wf, game, player_optimal_moves, high_points_messages):
+    if game.game_id in wf.unreachable:
+        raise requests.exceptions.ConnectionError()
+    wf.played.append(game.game_id)
+
+
+class TestTurnPipeline(unittest.TestCase):
+
+    @mock.patch.object(wfbot, 'play_turn', play_turn)
+    @mock.patch.object(wfbot, 'solve_turn', solved)
+    @mock.patch.object(wfbot, 'WORDLIST', object())
+    @mock.patch.object(wfbot, 'TURN_BUDGET', 30)
+    @mock.patch.object(wfbot, 'DEADLINES', collections.Counter())
+    def test_submit(self):
+        pipeline = wfbot.TurnPipeline(1)
+        try:
+            wf = types.SimpleNamespace(unreachable={2}, played=[])
+            for game_id in (1, 2, 3):
+                pipeline.put(wf, types.SimpleNamespace(game_id=game_id), [])
+            pipeline.join(wf)
+            self.assertEqual(wf.played, [1, 3])
+            self.assertEqual(pipeline.take_failed(wf), {2})
+            self.assertEqual(pipeline.take_failed(wf), set())
+            # the turns are counted in this process, not in the solver processes
+            self.assertEqual(wfbot.DEADLINES, {"turns": 3, "reached": 1})
+        finally:
+            pipeline.close()
+
+
 if __name__ == '__main__':
     unittest.main()
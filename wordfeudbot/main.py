@@ -1,11 +1,16 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 import argparse
-import heapq
+import asyncio
+import collections
 import inspect
+import json
 import logging
+import multiprocessing
 import os
+import queue
 import random
+import threading
 import time
 
 import coloredlogs
@@ -13,99 +18,143 @@ import requests
 import urllib3
 from emoji import UNICODE_EMOJI
 
+try:
+    import aiohttp
+except ImportError:
+    # Only needed by the async client (--async_client)
+    aiohttp = None
+
+# Errors that mean that the wordfeud server could not be reached
+CONNECTION_ERRORS = (requests.exceptions.RequestException,) + (
+    (aiohttp.ClientError, asyncio.TimeoutError) if aiohttp else ())
+
 try:    # Usually works
-    from wordfeud_logic.board import Board
+    from wordfeud_logic.bitmask import BitmaskWordlist
+    from wordfeud_logic.cache import LRUCache
+    from wordfeud_logic.board import Board, Deadline, Layout, LineMoves
+    from wordfeud_logic.endgame import EndgameSolver
+    from wordfeud_logic.gaddag import Gaddag
+    from wordfeud_logic.leave import LeaveTable
+    from wordfeud_logic.parallel import LinePool
+    from wordfeud_logic.simulation import ReplySimulator
     from wordfeud_logic.wordlist import Wordlist
 except ImportError:  # Needed for tests to run
-    from wordfeudbot.wordfeud_logic.board import Board
+    from wordfeudbot.wordfeud_logic.bitmask import BitmaskWordlist
+    from wordfeudbot.wordfeud_logic.cache import LRUCache
+    from wordfeudbot.wordfeud_logic.board import Board, Deadline, Layout, LineMoves
+    from wordfeudbot.wordfeud_logic.endgame import EndgameSolver
+    from wordfeudbot.wordfeud_logic.gaddag import Gaddag
+    from wordfeudbot.wordfeud_logic.leave import LeaveTable
+    from wordfeudbot.wordfeud_logic.parallel import LinePool
+    from wordfeudbot.wordfeud_logic.simulation import ReplySimulator
     from wordfeudbot.wordfeud_logic.wordlist import Wordlist
 
 # Define globals
-dsso_id = script_dir = WORDLIST = VERIFY_SSL = PLAYING_SPEED = HIGH_POINTS_THRESHOLD = ACTIVE_GAMES_LIMIT = PASSWORD = USER_ID = None
+dsso_id = script_dir = LEAVE_VALUES = MOVE_CACHE_SIZE = WORDLIST = VERIFY_SSL = PLAYING_SPEED = HIGH_POINTS_THRESHOLD = ACTIVE_GAMES_LIMIT = PASSWORD = USER_ID = MOVE_GENERATOR = MOVE_POOL = BULK_FETCH_THRESHOLD = LEAVES = SIMULATOR = SIMULATION_BUDGET = ENDGAME_BUDGET = MOVE_CACHE = TURN_BUDGET = None
+LEAVE_WEIGHT = SIMULATION_RACKS = 0
 
+# Held while a turn is solved in the main process, when several accounts are played in threads
+SOLVE_LOCK = threading.Lock()
+# The turns that were solved and the turns that ran into the turn budget, counted in
+# the main process (see count_turn)
+DEADLINES = collections.Counter()
+DEADLINES_LOCK = threading.Lock()
 
-class Wordfeud:
-    def login(self, user_id: int, password: str, language_code: str):
-        """Returns sessionid cookie used for future requests
 
-        Args:
-            user_id (int): Unique user id
-            password (str): Previously randomly generated password
-            language_code (str): Code for UI language: en,sv,no...
+class GameCache:
+    def __init__(self):
+        """Keeps what the server does not have to send again: the layouts of the boards
+        and the tile points of the rulesets that have been seen, and the last fetched
+        state of each game together with the time it was updated"""
 
-        Raises:
-            Exception: Server not accepting credentials
+        self.board_quarters = {}
+        self.board_layouts = {}
+        self.tile_points = {}
+        self.games = {}
+        self.hits = 0
+        self.misses = 0
+
+    def known_query(self):
+        """Returns the query string that tells the server which boards and tile points
+        are already known, so that it leaves them out of the response
 
         Returns:
-            str: sessionid
+            str: e.g. "known_tile_points=1,4&known_boards=3"
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "90",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-        }
+        known_tile_points = ",".join(str(ruleset)
+                                     for ruleset in sorted(self.tile_points))
+        known_boards = ",".join(str(board_id)
+                                for board_id in sorted(self.board_quarters))
+        return f"known_tile_points={known_tile_points}&known_boards={known_boards}"
 
-        data = f'{{"id": {user_id}, "password": "{password}", "language_code": "{language_code}"}}'
+    def get(self, game_id: int, updated: float):
+        """Returns a game as a board_and_tile_data response if it has not been updated
+        since it was fetched, else None
 
-        response = requests.post(
-            "https://api.wordfeud.com/wf/user/login/id/",
-            headers=headers,
-            data=data.encode("utf-8"),
-            verify=VERIFY_SSL,
-        )
+        Args:
+            game_id (int): ID of the game
+            updated (float): When the game was last updated (from game_status_data)
 
-        # Verify that server accepted credentials
-        if response.json()["status"] == "error":
-            raise Exception("Server returned error message")
+        Returns:
+            dict: Parsed server response from the cache, or None
+        """
 
-        self.user_id = user_id
-        self.password = password
+        game = self.games.get(game_id)
+        if game is None or game["updated"] != updated:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"status": "success", "content": {"games": [game], "boards": []}}
 
-        # Make cookies into a dictionary
-        cookies = response.cookies.get_dict()
+    def update(self, parsed: dict):
+        """Adds the boards, tile points and games of a board_and_tile_data response
 
-        # Return sessionid
-        sessionid = cookies["sessionid"]
-        return sessionid
+        Args:
+            parsed (dict): Parsed server response
+        """
 
-    def board_and_tile_data(self, game_id=None):
-        """Get info about users active games
+        content = parsed.get("content", {})
+        self.update_board_quarters(content.get("boards", []))
+        for tile_points in content.get("tile_points", []):
+            if isinstance(tile_points, dict) and "ruleset" in tile_points:
+                self.tile_points[tile_points["ruleset"]] = tile_points
+        for game in content.get("games", []):
+            self.games[game["id"]] = game
+
+    def stale(self, updated: dict):
+        """Returns the games that are not in the cache or have been updated since they were fetched
+
+        Args:
+            updated (dict): When each game was last updated by game id
 
         Returns:
-            dict: Active games info
+            list: IDs of the games that have to be fetched
         """
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
 
-        if game_id is None:
-            # Data about all games
-            response = requests.get(
-                f"https://api.wordfeud.com/wf/user/games/detail/?known_tile_points=&known_boards=",
-                headers=headers,
-                verify=VERIFY_SSL,
-            )
-        else:
-            # Data about specific game
-            response = requests.get(
-                f"https://api.wordfeud.com/wf/games/{game_id}/?known_tile_points=&known_boards=",
-                headers=headers,
-                verify=VERIFY_SSL,
-            )
+        return [game_id for (game_id, game_updated) in updated.items()
+                if game_id not in self.games or self.games[game_id]["updated"] != game_updated]
 
-        parsed = response.json()
-        return parsed
+    def forget_games(self, game_ids):
+        """Drops the games that are not in game_ids, e.g. games that are no longer listed
+
+        Args:
+            game_ids (iterable): IDs of the games to keep
+        """
+
+        game_ids = set(game_ids)
+        for game_id in list(self.games):
+            if game_id not in game_ids:
+                del self.games[game_id]
 
     def update_board_quarters(self, board_list):
-        self.board_quarters = {}
+        """Adds the layouts of boards to the cache. The layout of a board id never
+        changes, so boards that are already known are kept as they are
+
+        Args:
+            board_list (list): The boards of a board_and_tile_data response
+        """
+
         multiplier_number_to_text_dict = {
             0: "--", 1: "2l", 2: "3l", 3: "2w", 4: "3w"}
 
@@ -128,6 +177,8 @@ class Wordfeud:
         ]
         for board in board_list:
             board_id = board["board_id"]
+            if board_id in self.board_quarters:
+                continue
 
             board_placements = default_board_placements
             board_placements = [row.split(" ") for row in board_placements]
@@ -140,39 +191,303 @@ class Wordfeud:
                     ]
 
             self.board_quarters[board_id] = board_placements
+            # Multipliers as flat arrays, shared by all games on the board
+            self.board_layouts[board_id] = Layout(board_placements)
+
+    def __repr__(self):
+        return f"<GameCache: {len(self.board_quarters)} boards, {len(self.games)} games, {self.hits} hits, {self.misses} misses>"
 
-    def place_tiles(self, game: object, word: str, tile_positions: list):
-        """Sends request to wordfeud servers to play a move
+
+class RateBudget:
+    def __init__(self, requests_per_minute: float, burst: int = None, clock=time.monotonic, sleep=time.sleep):
+        """Limits how often an account makes requests: on average requests_per_minute, and
+        up to burst requests right after each other. A request that is over the budget
+        waits until it is within it again
 
         Args:
-            game (object): Game object with info about game id
-            word (str): The full word that is going to be placed
-            tile_positions (list): 2D list of all tiles and their respective positions
+            requests_per_minute (float): Average amount of requests per minute
+            burst (int, optional): Amount of requests that can be made at once. Defaults to a sixth of requests_per_minute.
+            clock (function, optional): Returns the current time. Defaults to time.monotonic.
+            sleep (function, optional): Sleeps for a number of seconds. Defaults to time.sleep.
+        """
 
-        Returns:
-            dict: Server response
+        self.rate = requests_per_minute / 60
+        self.burst = burst or max(1, int(requests_per_minute / 6))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.waited = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Waits until a request is within the budget and counts it"""
+
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self.sleep(delay)
+                self.waited += delay
+                self.tokens = 1
+                self.updated = self.clock()
+            self.tokens -= 1
+
+    def __repr__(self):
+        return f"<RateBudget: {self.rate * 60:g} requests per minute, {self.waited:.0f} s waited>"
+
+
+LOGIN_PATH = "/wf/user/login/id/"
+
+
+def retryable(status_code: int, idempotent: bool):
+    """Returns True if a request that got a status code should be sent again. Requests
+    that change a game are only sent again when the server can not have acted on them
+
+    Args:
+        status_code (int): HTTP status of the response
+        idempotent (bool): If the request can be sent twice without harm
+    """
+
+    return status_code >= 500 and (idempotent or status_code in (502, 503, 504))
+
+
+def retry_delay(attempt: int, backoff: float, max_backoff: float):
+    """Returns the seconds to wait before a retry, exponential backoff with full jitter
+    so that retries are spread out
+
+    Args:
+        attempt (int): The attempt that failed, 0 for the first
+        backoff (float): Base delay in seconds, doubled for each attempt
+        max_backoff (float): Longest delay in seconds
+    """
+
+    return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+
+def auth_failed(status_code: int, parsed: dict):
+    """Returns True if the server refused a request because the session is not logged in
+
+    Args:
+        status_code (int): HTTP status of the response
+        parsed (dict): The parsed response
+    """
+
+    if status_code in (401, 403):
+        return True
+    content = parsed.get("content")
+    return parsed.get("status") == "error" and isinstance(content, dict) and content.get("type") == "login_required"
+
+
+class Wordfeud:
+    def __init__(self, pool_size: int = 10, timeout: tuple = (5, 30), retries: int = 4, backoff: float = 0.5,
+                 base_url: str = "https://api.wordfeud.com", adapter=None, rate_budget=None):
+        """Create a client that sends all requests through one session, which keeps its
+        connections to the server alive. Requests that time out or get a server error
+        are retried with exponential backoff, and the client logs in again when a
+        request is refused because the session has expired
+
+        Args:
+            pool_size (int, optional): Amount of connections kept open. Defaults to 10.
+            timeout (tuple, optional): Connect and read timeout of each request in seconds. Defaults to (5, 30).
+            retries (int, optional): Amount of times a failed request is retried. Defaults to 4.
+            backoff (float, optional): Base delay in seconds before the first retry, doubled for each retry. Defaults to 0.5.
+            base_url (str, optional): The server. Defaults to "https://api.wordfeud.com".
+            adapter (requests.adapters.HTTPAdapter, optional): Connection pool to share with
+                other sessions, pool_size is not used then. Defaults to a new pool.
+            rate_budget (RateBudget, optional): Limits the rate of the requests. Defaults to no limit.
         """
 
-        headers = {
+        self.base_url = base_url
+        self.rate_budget = rate_budget
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = 30
+        self.sessionid = None
+        self.user_id = self.password = self.language_code = None
+        self.cache = GameCache()
+        self.session = requests.Session()
+        self.session.mount(base_url, adapter or requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({
             "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
             "Connection": "Keep-Alive",
             "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
+        })
 
-        data = f"""{{"words": ["{word.upper()}"], "ruleset": {game.ruleset}, "move": {str(tile_positions).replace("'",'"').replace("False","false").replace("True","true")}}}"""
+    def request(self, method: str, path: str, data: str = None, check=True, idempotent=True):
+        """Sends a request and returns the parsed response
+
+        Args:
+            method (str): GET or POST
+            path (str): Path of the API endpoint, e.g. "/wf/user/status/"
+            data (str, optional): JSON body of a POST request. Defaults to None.
+            check (bool, optional): Log an error if the server does not return success. Defaults to True.
+            idempotent (bool, optional): If the request can be sent twice without harm. Requests
+                that change a game (moves, chat messages ...) are only retried when the server
+                can not have acted on them. Defaults to True.
+
+        Raises:
+            requests.exceptions.RequestException: The request failed after all retries
+
+        Returns:
+            dict: Parsed server response
+        """
+
+        headers = {}
+        if data is not None:
+            headers["Content-Type"] = "application/json; charset=UTF-8"
+            data = data.encode("utf-8")
+        logged_in = False
+
+        attempt = 0
+        while True:
+            if self.sessionid is not None:
+                headers["Cookie"] = f"sessionid={self.sessionid}"
+            if self.rate_budget:
+                self.rate_budget.acquire()
+            try:
+                response = self.session.request(
+                    method, f"{self.base_url}{path}", data=data, headers=headers,
+                    timeout=self.timeout, verify=VERIFY_SSL)
+            except requests.exceptions.ConnectTimeout as e:
+                # The request never reached the server
+                error = e
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # The server may have acted on the request before the connection failed
+                if not idempotent:
+                    raise
+                error = e
+            else:
+                if retryable(response.status_code, idempotent):
+                    error = requests.exceptions.HTTPError(
+                        f"{response.status_code} from server", response=response)
+                else:
+                    try:
+                        parsed = response.json()
+                    except ValueError as e:
+                        # Not from the server itself, e.g. the error page of a proxy
+                        error = requests.exceptions.HTTPError(
+                            f"{response.status_code} from server with invalid JSON ({e})", response=response)
+                        if not idempotent:
+                            raise error
+                    else:
+                        if auth_failed(response.status_code, parsed) and not logged_in and self.user_id is not None:
+                            # The session has expired, log in again and resend, which is
+                            # not a retry so it is also done after the last attempt
+                            logging.info("Session expired, logging in again")
+                            self.login(self.user_id, self.password, self.language_code)
+                            logged_in = True
+                            continue
+                        break
+
+            if attempt == self.retries:
+                raise error
+            delay = retry_delay(attempt, self.backoff, self.max_backoff)
+            logging.warning(
+                f"{method} {path} failed ({error}), retrying in {delay:.1f} s")
+            time.sleep(delay)
+            attempt += 1
+
+        if check and not (parsed["status"] == "success"):
+            logging.error(
+                f"Unexpected response from server in {inspect.stack()[1][3]}")
+
+        return parsed
+
+    def login(self, user_id: int, password: str, language_code: str):
+        """Returns sessionid cookie used for future requests
 
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/game/{game.game_id}/move/",
+        Args:
+            user_id (int): Unique user id
+            password (str): Previously randomly generated password
+            language_code (str): Code for UI language: en,sv,no...
+
+        Raises:
+            Exception: Server not accepting credentials
+
+        Returns:
+            str: sessionid
+        """
+
+        data = f'{{"id": {user_id}, "password": "{password}", "language_code": "{language_code}"}}'
+
+        # Log in without the old session
+        self.sessionid = None
+        if self.rate_budget:
+            self.rate_budget.acquire()
+        response = self.session.post(
+            f"{self.base_url}{LOGIN_PATH}",
+            headers={"Content-Type": "application/json; charset=UTF-8"},
             data=data.encode("utf-8"),
-            headers=headers,
+            timeout=self.timeout,
             verify=VERIFY_SSL,
         )
 
-        parsed = response.json()
+        # Verify that server accepted credentials
+        if response.json()["status"] == "error":
+            raise Exception("Server returned error message")
+
+        self.user_id = user_id
+        self.password = password
+        self.language_code = language_code
+
+        # Make cookies into a dictionary
+        cookies = response.cookies.get_dict()
+
+        # Return sessionid
+        self.sessionid = cookies["sessionid"]
+        return self.sessionid
+
+    def board_and_tile_data(self, game_id=None, updated=None):
+        """Get info about users active games. Boards and tile points that are already in
+        the cache are left out by the server, the boards are added to the cache
+
+        Args:
+            game_id (int, optional): ID of a specific game. Defaults to None, all games.
+            updated (float, optional): When the game was last updated, the cached game is
+                returned if it is the same. Defaults to None, always fetch.
+
+        Returns:
+            dict: Active games info
+        """
+
+        if game_id is not None and updated is not None:
+            parsed = self.cache.get(game_id, updated)
+            if parsed:
+                return parsed
+
+        if game_id is None:
+            # Data about all games
+            parsed = self.request(
+                "GET", f"/wf/user/games/detail/?{self.cache.known_query()}", check=False)
+        else:
+            # Data about specific game
+            parsed = self.request(
+                "GET", f"/wf/games/{game_id}/?{self.cache.known_query()}", check=False)
+
+        self.cache.update(parsed)
+        return parsed
+
+    def place_tiles(self, game: object, word: str, tile_positions: list):
+        """Sends request to wordfeud servers to play a move
+
+        Args:
+            game (object): Game object with info about game id
+            word (str): The full word that is going to be placed
+            tile_positions (list): 2D list of all tiles and their respective positions
+
+        Returns:
+            dict: Server response
+        """
+
+        data = f"""{{"words": ["{word.upper()}"], "ruleset": {game.ruleset}, "move": {str(tile_positions).replace("'",'"').replace("False","false").replace("True","true")}}}"""
+        parsed = self.request(
+            "POST", f"/wf/game/{game.game_id}/move/", data, check=False, idempotent=False)
 
         if not (parsed["status"] == "success"):
             raise AssertionError("Unexpected response from server")
@@ -189,29 +504,7 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/game/{game_id}/pass/",
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("POST", f"/wf/game/{game_id}/pass/", idempotent=False)
 
     def swap_tiles(self, game_id: int, tiles: list):
         """Swap set of tiles for a new set of random ones
@@ -224,32 +517,8 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
         data = f"""{{"tiles":{str(tiles).replace("'",'"')}}}"""
-
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/game/{game_id}/swap/",
-            data=data.encode("utf-8"),
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("POST", f"/wf/game/{game_id}/swap/", data, idempotent=False)
 
     def send_chat_message(self, game_id: int, message: str):
         """Send a chat message to an opponent
@@ -262,32 +531,8 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
         data = f"""{{"message":"{message}"}}"""
-
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/game/{game_id}/chat/send/",
-            data=data.encode("utf-8"),
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("POST", f"/wf/game/{game_id}/chat/send/", data, idempotent=False)
 
     def update_chat_read_count(self, game_id: int, messages_read: int):
         """Inform the server about the number of messages in chat you have seen (in total, not new)
@@ -300,32 +545,8 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
         data = f"""{{"read_chat_count":{messages_read}}}"""
-
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/game/{game_id}/read_chat_count/",
-            data=data.encode("utf-8"),
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("POST", f"/wf/game/{game_id}/read_chat_count/", data)
 
     def get_full_chat(self, game_id: int):
         """Return all chat messages sent in a game session
@@ -337,29 +558,7 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
-        response = requests.get(
-            f"https://api.wordfeud.com/wf/game/{game_id}/chat/",
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("GET", f"/wf/game/{game_id}/chat/")
 
     def start_new_game_random(self, ruleset: int, board_type: str):
         """Starts a new game against random opponent
@@ -372,32 +571,8 @@ class Wordfeud:
             dict: Parsed server response
         """
 
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
-
         data = f'{{"ruleset":{ruleset},"board_type":"{board_type}"}}'
-
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/random_request/create/",
-            data=data.encode("utf-8"),
-            headers=headers,
-            verify=VERIFY_SSL,
-        )
-
-        parsed = response.json()
-
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
-
-        return parsed
+        return self.request("POST", "/wf/random_request/create/", data, idempotent=False)
 
     def accept_incoming_request(self, request_id: int):
         """Accepts an incoming game request
@@ -408,66 +583,441 @@ class Wordfeud:
         Returns:
             dict: Parsed server response
         """
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Content-Length": "0",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
 
-        data = ''
+        return self.request("POST", f"/wf/invite/{request_id}/accept/")
 
-        response = requests.post(
-            f"https://api.wordfeud.com/wf/invite/{request_id}/accept/",
-            data=data.encode("utf-8"),
-            headers=headers,
-            verify=VERIFY_SSL,
+    def game_status_data(self):
+        """Return a summary of all games
+
+        Returns:
+            dict: Parsed server response
+        """
+
+        return self.request("GET", "/wf/user/status/")
+
+
+class AsyncWordfeud:
+    def __init__(self, max_concurrency: int = 8, base_url: str = "https://api.wordfeud.com", cache=None,
+                 retries: int = 4, backoff: float = 0.5, client=None, rate_budget=None):
+        """Makes the same requests as Wordfeud, as coroutines. All requests go through one
+        session that keeps its connections to the server alive, and at most
+        max_concurrency of them are in flight at the same time. Failed requests are
+        retried and an expired session is renewed like Wordfeud does. open() has to be
+        awaited in the event loop that the requests are made from
+
+        Args:
+            max_concurrency (int, optional): Amount of concurrent requests. Defaults to 8.
+            base_url (str, optional): The server. Defaults to "https://api.wordfeud.com".
+            cache (GameCache, optional): Cache to share, e.g. with a Wordfeud client. Defaults to a new one.
+            retries (int, optional): Amount of times a failed request is retried. Defaults to 4.
+            backoff (float, optional): Base delay in seconds before the first retry, doubled for each retry. Defaults to 0.5.
+            client (Wordfeud, optional): Client whose session is shared, it logs in again when
+                the session has expired. Defaults to None, logging in with login().
+            rate_budget (RateBudget, optional): Limits the rate of the requests, e.g. the
+                budget of the account that the client is shared with. Defaults to no limit.
+
+        Raises:
+            ImportError: aiohttp is not installed
+        """
+
+        if aiohttp is None:
+            raise ImportError("The async client needs aiohttp")
+
+        self.max_concurrency = max_concurrency
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = 30
+        self.client = client
+        self.rate_budget = rate_budget
+        self.session = None
+        self.semaphore = None
+        self.login_lock = None
+        self.sessionid = None
+        self.user_id = self.password = self.language_code = None
+        self.cache = cache or GameCache()
+
+    async def open(self):
+        """Creates the connection pool"""
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency, keepalive_timeout=60, ssl=None if VERIFY_SSL else False)
+        self.session = aiohttp.ClientSession(
+            self.base_url,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30, connect=5),
+            headers={
+                "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
+                "Accept-Encoding": "gzip",
+            },
         )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.login_lock = asyncio.Lock()
 
-        parsed = response.json()
+    async def close(self):
+        """Closes the connection pool"""
 
-        if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
-        return parsed
+    async def request(self, method: str, path: str, data: str = None, check=True, idempotent=True):
+        """Sends a request and returns the parsed response, see Wordfeud.request
 
-    def game_status_data(self):
-        """Return a summary of all games
+        Args:
+            method (str): GET or POST
+            path (str): Path of the API endpoint, e.g. "/wf/user/status/"
+            data (str, optional): JSON body of a POST request. Defaults to None.
+            check (bool, optional): Log an error if the server does not return success. Defaults to True.
+            idempotent (bool, optional): If the request can be sent twice without harm. Defaults to True.
+
+        Raises:
+            aiohttp.ClientError: The request failed after all retries
 
         Returns:
             dict: Parsed server response
         """
-        headers = {
-            "User-Agent": "WebFeudClient/3.0.17 (Android 10)",
-            "Host": "api.wordfeud.com",
-            "Connection": "Keep-Alive",
-            "Accept-Encoding": "gzip",
-            "Cookie": f"sessionid={self.sessionid}",
-        }
 
-        response = requests.get(
-            f"https://api.wordfeud.com/wf/user/status/", headers=headers, verify=VERIFY_SSL
-        )
+        headers = {}
+        if data is not None:
+            headers["Content-Type"] = "application/json; charset=UTF-8"
+            data = data.encode("utf-8")
+        elif method == "POST":
+            data = b""
+        logged_in = False
+
+        attempt = 0
+        while True:
+            sessionid = self.sessionid
+            if sessionid is not None:
+                headers["Cookie"] = f"sessionid={sessionid}"
+            if self.rate_budget:
+                # Waits in a thread, the other requests go on meanwhile
+                await asyncio.get_running_loop().run_in_executor(None, self.rate_budget.acquire)
+            parsed = None
+            try:
+                async with self.semaphore:
+                    async with self.session.request(method, path, data=data, headers=headers) as response:
+                        if retryable(response.status, idempotent):
+                            error = aiohttp.ClientResponseError(
+                                response.request_info, response.history, status=response.status,
+                                message="Server error")
+                        else:
+                            try:
+                                parsed = await response.json(content_type=None)
+                            except ValueError as e:
+                                # Not from the server itself, e.g. the error page of a proxy
+                                error = aiohttp.ClientResponseError(
+                                    response.request_info, response.history, status=response.status,
+                                    message=f"Invalid JSON ({e})")
+                                if not idempotent:
+                                    raise error
+                            else:
+                                if path == LOGIN_PATH and "sessionid" in response.cookies:
+                                    parsed["sessionid"] = response.cookies["sessionid"].value
+            except aiohttp.ClientConnectorError as e:
+                # The request never reached the server
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # The server may have acted on the request before the connection failed
+                if not idempotent:
+                    raise
+                error = e
+
+            if parsed is not None:
+                if (auth_failed(response.status, parsed) and not logged_in and path != LOGIN_PATH and
+                        (self.client or self.user_id is not None)):
+                    # The session has expired, log in again and resend, which is not a retry
+                    await self.relogin(sessionid)
+                    logged_in = True
+                    continue
+                break
+
+            if attempt == self.retries:
+                raise error
+            delay = retry_delay(attempt, self.backoff, self.max_backoff)
+            logging.warning(
+                f"{method} {path} failed ({error}), retrying in {delay:.1f} s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if check and not (parsed["status"] == "success"):
+            logging.error(
+                f"Unexpected response from server in {inspect.stack()[1][3]}")
+
+        return parsed
+
+    async def relogin(self, sessionid):
+        """Logs in again after the session has expired, once for all requests that were
+        sent with the expired session
+
+        Args:
+            sessionid (str): The session that the server refused
+        """
 
-        parsed = response.json()
+        async with self.login_lock:
+            if self.sessionid != sessionid:
+                # Another request has logged in already
+                return
+            logging.info("Session expired, logging in again")
+            if self.client:
+                # The client is not used by anything else while the event loop runs
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.client.login, self.client.user_id, self.client.password, self.client.language_code)
+                self.sessionid = self.client.sessionid
+            else:
+                await self.login(self.user_id, self.password, self.language_code)
+
+    async def login(self, user_id: int, password: str, language_code: str):
+        """Returns sessionid cookie used for future requests, see Wordfeud.login"""
+
+        data = f'{{"id": {user_id}, "password": "{password}", "language_code": "{language_code}"}}'
+        parsed = await self.request("POST", LOGIN_PATH, data, check=False)
+
+        # Verify that server accepted credentials
+        if parsed["status"] == "error":
+            raise Exception("Server returned error message")
+
+        self.user_id = user_id
+        self.password = password
+        self.language_code = language_code
+        self.sessionid = parsed["sessionid"]
+        return self.sessionid
+
+    async def board_and_tile_data(self, game_id=None, updated=None):
+        """Get info about users active games, see Wordfeud.board_and_tile_data"""
+
+        if game_id is not None and updated is not None:
+            parsed = self.cache.get(game_id, updated)
+            if parsed:
+                return parsed
+
+        if game_id is None:
+            # Data about all games
+            parsed = await self.request("GET", f"/wf/user/games/detail/?{self.cache.known_query()}", check=False)
+        else:
+            # Data about specific game
+            parsed = await self.request("GET", f"/wf/games/{game_id}/?{self.cache.known_query()}", check=False)
+
+        self.cache.update(parsed)
+        return parsed
+
+    async def place_tiles(self, game: object, word: str, tile_positions: list):
+        """Sends request to wordfeud servers to play a move, see Wordfeud.place_tiles"""
+
+        data = f"""{{"words": ["{word.upper()}"], "ruleset": {game.ruleset}, "move": {str(tile_positions).replace("'",'"').replace("False","false").replace("True","true")}}}"""
+        parsed = await self.request("POST", f"/wf/game/{game.game_id}/move/", data, check=False, idempotent=False)
 
         if not (parsed["status"] == "success"):
-            logging.error(
-                f"Unexpected response from server in {inspect.stack()[0][3]}")
+            raise AssertionError("Unexpected response from server")
 
         return parsed
 
+    async def skip_turn(self, game_id: int):
+        """Skip the current turn, see Wordfeud.skip_turn"""
+
+        return await self.request("POST", f"/wf/game/{game_id}/pass/", idempotent=False)
+
+    async def swap_tiles(self, game_id: int, tiles: list):
+        """Swap set of tiles for a new set of random ones, see Wordfeud.swap_tiles"""
+
+        data = f"""{{"tiles":{str(tiles).replace("'",'"')}}}"""
+        return await self.request("POST", f"/wf/game/{game_id}/swap/", data, idempotent=False)
+
+    async def send_chat_message(self, game_id: int, message: str):
+        """Send a chat message to an opponent, see Wordfeud.send_chat_message"""
+
+        data = f"""{{"message":"{message}"}}"""
+        return await self.request("POST", f"/wf/game/{game_id}/chat/send/", data, idempotent=False)
+
+    async def update_chat_read_count(self, game_id: int, messages_read: int):
+        """Inform the server about the number of messages in chat you have seen, see Wordfeud.update_chat_read_count"""
+
+        data = f"""{{"read_chat_count":{messages_read}}}"""
+        return await self.request("POST", f"/wf/game/{game_id}/read_chat_count/", data)
+
+    async def get_full_chat(self, game_id: int):
+        """Return all chat messages sent in a game session, see Wordfeud.get_full_chat"""
+
+        return await self.request("GET", f"/wf/game/{game_id}/chat/")
+
+    async def start_new_game_random(self, ruleset: int, board_type: str):
+        """Starts a new game against random opponent, see Wordfeud.start_new_game_random"""
+
+        data = f'{{"ruleset":{ruleset},"board_type":"{board_type}"}}'
+        return await self.request("POST", "/wf/random_request/create/", data, idempotent=False)
+
+    async def accept_incoming_request(self, request_id: int):
+        """Accepts an incoming game request, see Wordfeud.accept_incoming_request"""
+
+        return await self.request("POST", f"/wf/invite/{request_id}/accept/")
+
+    async def game_status_data(self):
+        """Return a summary of all games, see Wordfeud.game_status_data"""
+
+        return await self.request("GET", "/wf/user/status/")
+
+
+class PollScheduler:
+    def __init__(self, min_interval: float, max_interval: float, full_sync_interval: float, backoff: float = 2.0,
+                 clock=time.time, sleep=time.sleep):
+        """Decides when to check the server for game updates. The time between checks is
+        divided by backoff after every pass where an opponent had played and multiplied by
+        it after every pass where no one had, so the bot answers quickly while opponents are
+        active and polls rarely when they are not. A full re-sync (looking at every game
+        instead of only the ones updated since the last check) is done on the first pass
+        and after that at most once every full_sync_interval seconds
+
+        Args:
+            min_interval (float): Shortest time in seconds between the start of two passes
+            max_interval (float): Longest time in seconds between the start of two passes
+            full_sync_interval (float): Time in seconds between full re-syncs
+            backoff (float, optional): Factor the interval changes with. Defaults to 2.0.
+            clock (function, optional): Returns the current time. Defaults to time.time.
+            sleep (function, optional): Sleeps for a number of seconds. Defaults to time.sleep.
+        """
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.full_sync_interval = full_sync_interval
+        self.backoff = backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.interval = min_interval
+        self.pass_start = None
+        self.last_full_sync = None
+        self.passes = 0
+        self.full_syncs = 0
+        # Games where it is the players turn in the current pass and how long ago each opponent played
+        self.queue_depth = 0
+        self.lags = []
+
+    def start_pass(self):
+        """Starts a pass
+
+        Returns:
+            bool: True if the pass should be a full re-sync
+        """
+
+        now = self.clock()
+        self.pass_start = now
+        self.passes += 1
+        self.queue_depth = 0
+        self.lags = []
+        if self.last_full_sync is None or now - self.last_full_sync >= self.full_sync_interval:
+            self.last_full_sync = now
+            self.full_syncs += 1
+            return True
+        return False
+
+    def turn(self, updated: float):
+        """Records a game where it is the players turn
+
+        Args:
+            updated (float): When the opponent played
+        """
+
+        self.queue_depth += 1
+        self.lags.append(max(0, self.clock() - updated))
+
+    @property
+    def lag(self):
+        """Longest time in seconds that a turn in the current pass waited before it was found"""
+
+        return max(self.lags, default=0)
+
+    def wait(self):
+        """Adapts the interval to the pass that has ended and sleeps until the next one"""
+
+        if self.queue_depth:
+            self.interval = max(self.min_interval,
+                                self.interval / self.backoff)
+        else:
+            self.interval = min(self.max_interval,
+                                self.interval * self.backoff)
+        self.sleep(max(0, self.pass_start + self.interval - self.clock()))
+
+    def __repr__(self):
+        return (f"<PollScheduler: interval {self.interval:.0f} s, queue depth {self.queue_depth}, "
+                f"lag {self.lag:.0f} s, {self.full_syncs} full re-syncs in {self.passes} passes>")
+
+
+class Account:
+    def __init__(self, user_id: str, password: str, active_games_limit: int, scheduler, requests_per_minute: float = 0, adapter=None):
+        """A wordfeud account that the bot plays with, with its own session, game limit,
+        request budget and scheduler
+
+        Args:
+            user_id (str): Wordfeud user id for login
+            password (str): Password for login
+            active_games_limit (int): Amount of games that are played concurrently
+            scheduler (PollScheduler): Decides when the games of the account are checked
+            requests_per_minute (float, optional): Request budget of the account. Defaults to 0, no limit.
+            adapter (requests.adapters.HTTPAdapter, optional): Connection pool shared with other accounts. Defaults to None.
+        """
+
+        self.user_id = user_id
+        self.password = password
+        self.active_games_limit = active_games_limit
+        self.scheduler = scheduler
+        self.rate_budget = RateBudget(
+            requests_per_minute) if requests_per_minute else None
+        # Its connections are kept between iterations
+        self.wf = Wordfeud(adapter=adapter, rate_budget=self.rate_budget)
+
+    def __repr__(self):
+        return f"<Account: {self.user_id}>"
+
+
+def read_accounts(path: str, var_dict: dict, adapter=None):
+    """Reads the accounts to play with from a JSON file with a list of objects with
+    "user_id" and "password" and optionally "active_games_limit" and "requests_per_minute",
+    which default to the command line arguments
+
+    Args:
+        path (str): The credentials file
+        var_dict (dict): The command line arguments
+        adapter (requests.adapters.HTTPAdapter, optional): Connection pool shared by the accounts. Defaults to None.
+
+    Returns:
+        list: The accounts
+    """
+
+    with open(path) as f:
+        credentials = json.load(f)
+
+    return [Account(str(entry["user_id"]), entry["password"],
+                    entry.get("active_games_limit",
+                              var_dict['active_games_limit']),
+                    new_scheduler(var_dict),
+                    entry.get("requests_per_minute",
+                              var_dict['requests_per_minute']),
+                    adapter)
+            for entry in credentials]
+
+
+def new_scheduler(var_dict: dict):
+    """Returns a PollScheduler with the intervals of the command line arguments
+
+    Args:
+        var_dict (dict): The command line arguments
+
+    Returns:
+        PollScheduler: The scheduler
+    """
+
+    return PollScheduler(min(var_dict['min_playing_speed'], var_dict['playing_speed']),
+                         var_dict['playing_speed'], var_dict['full_sync_interval'])
+
 
 class WordfeudGame:
-    def __init__(self, data, board_quarters):
+    def __init__(self, data, board_quarters, board_layouts=None):
         """Create a new wordfeud_game object and set the correct parameters
 
         Args:
             data (dict): Dictionary containing all game data
             board_quarters (list): List containing all board multipliers
+            board_layouts (dict, optional): Precomputed Layout of each board. Defaults to None.
         """
 
         self.user_index = int(data["players"][1]["is_local"])
@@ -485,60 +1035,58 @@ class WordfeudGame:
         self.active = data["is_running"]
         self.opponent = data["players"][self.opponent_index]["username"]
         self.quarter_board = board_quarters[self.board_id]
+        self.layout = board_layouts.get(self.board_id) if board_layouts else None
         self.my_turn = data["current_player"] == self.user_index
+        self._board = None
+
+    def board(self):
+        """Returns a Board with the bonus squares and tiles of the game. The board is
+        created once and keeps its cross-checks between move generations
+
+        Returns:
+            Board: the current board
+        """
+
+        if self._board is None:
+            # create a Board with the bonus square placement of the game and
+            # set the current state of the game (where tiles are placed)
+            board = Board(qboard=self.quarter_board, expand=False, layout=self.layout)
+
+            state = [list(row) for row in [board.empty_row] * len(board.board)]
+
+            for tile in self.tiles:
+                x = tile[1]
+                y = tile[0]
+                letter = tile[2]
+
+                state[x][y] = letter.lower()
+
+            state = ["".join(row) for row in state]
+            board.set_state(state)
+            self._board = board
+
+        return self._board
 
-    def player_optimal_moves(self, num_moves=10):
+    def player_optimal_moves(self, num_moves=10, deadline=None):
         """Returns an ordered list of optimal moves available for the active board
 
         Args:
             num_moves (int, optional): Amount of moves to return in list. Defaults to 10.
+            deadline (Deadline, optional): Returns the best moves found when it has passed. Defaults to None, no limit.
 
         Returns:
             list: list of optimal moves
         """
 
-        # create a Board with standard bonus square placement and
-        # set the current state of the game (where tiles are placed)
-        board = Board(qboard=self.quarter_board, expand=False)
-
-        state = [
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-        ]
-        state = [list(row) for row in state]
-
-        for tile in self.tiles:
-            x = tile[1]
-            y = tile[0]
-            letter = tile[2]
-
-            state[x][y] = letter.lower()
-
-        state = ["".join(row) for row in state]
-        board.set_state(state)
+        board = self.board()
 
         # The tiles we have on hand, '*' is a blank tile
         letters = "".join(
             "*" if letter == "" else letter.lower() for letter in self.letters
         )
 
-        words = board.calc_all_word_scores(letters, WORDLIST, dsso_id)
-
-        move_list = heapq.nlargest(
-            num_moves, words, lambda wordlist: wordlist[4])
+        # Only the best moves are generated when the move generator supports it
+        move_list = best_word_scores(board, letters, num_moves, deadline)
 
         if len(move_list) == 0:
             # There are no possible words
@@ -546,89 +1094,137 @@ class WordfeudGame:
 
         return move_list
 
-    def opponent_optimal_moves(self, return_tile_list=False, num_moves=10, tiles=None, tile_positions=None):
+    def unseen_tiles(self):
+        """Returns the tiles that are in the bag or on the opponents rack
+
+        Returns:
+            list: the tiles, '*' is a blank tile
+        """
+
+        # Create list with opponents all possible tiles
+        opponent_possible_tiles = 'AAAAAAAAABBCDDDDDEEEEEEEEFFGGGHHIIIIIJKKKLLLLLMMMNNNNNNOOOOOOPPRRRRRRRRSSSSSSSSTTTTTTTTTUUUVVXYZÅÅÄÄÖÖ**'
+
+        # Remove all letters on board from opponents possible tile list
+        # (blanks are placed with the letter they stand for)
+        for (_, _, letter, blank) in self.tiles:
+            letter = '*' if blank or letter == '' else letter
+            opponent_possible_tiles = opponent_possible_tiles.replace(
+                letter, "", 1)
+
+        # Remove all characters from players hand from possible tile list
+        for letter in self.letters:
+            letter = '*' if letter == '' else letter
+            opponent_possible_tiles = opponent_possible_tiles.replace(
+                letter, "", 1)
+
+        return list(opponent_possible_tiles)
+
+    def guess_opponent_tiles(self):
+        """Returns a random guess of the opponents tiles, drawn from the unseen tiles
+
+        Returns:
+            list: the tiles, '*' is a blank tile
+        """
+
+        opponent_possible_tiles_list = self.unseen_tiles()
+
+        trimmed_opponent_possible_tiles_list = []
+        for _ in range(len(opponent_possible_tiles_list) if len(opponent_possible_tiles_list) < 7 else 7):
+            trimmed_opponent_possible_tiles_list.append(opponent_possible_tiles_list.pop(random.randint(
+                0, len(opponent_possible_tiles_list)-1)))
+
+        return trimmed_opponent_possible_tiles_list
+
+    def opponent_line_moves(self, num_moves=10, tiles=None):
+        """Returns the best moves of the opponent in each row and column of the board, from
+        which the best moves after a move can be generated without generating the rows and
+        columns that the move does not change (see LineMoves.after)
+
+        Args:
+            num_moves (int, optional): Amount of moves to keep of each row and column. Defaults to 10.
+            tiles (list, optional): The opponents tiles. Defaults to a random guess.
+
+        Returns:
+            tuple: (LineMoves, the opponents tiles)
+        """
+
+        tiles = tiles or self.guess_opponent_tiles()
+
+        # The tiles we have on hand, '*' is a blank tile
+        letters = "".join(
+            "*" if letter == "" else letter.lower() for letter in tiles
+        )
+
+        return (LineMoves(self.board(), letters, WORDLIST, dsso_id, num_moves,
+                          anchored=MOVE_GENERATOR != 'trie'), tiles)
+
+    def opponent_optimal_moves(self, return_tile_list=False, num_moves=10, tiles=None, move=None):
         """Returns an ordered list of optimal moves available for the active board
 
         Args:
             num_moves (int, optional): Amount of moves to return in list. Defaults to 10.
+            tiles (list, optional): The opponents tiles. Defaults to a random guess.
+            move (tuple, optional): A move (x, y, horizontal, word, points) to play before
+                the opponents moves are calculated. Defaults to None.
 
         Returns:
             list: list of optimal moves
         """
 
-        tile_positions = tile_positions if tile_positions else self.tiles
+        trimmed_opponent_possible_tiles_list = tiles or self.guess_opponent_tiles()
 
-        if tiles:
-            trimmed_opponent_possible_tiles_list = tiles
-        else:
-            # Create list with opponents all possible tiles
-            opponent_possible_tiles = 'AAAAAAAAABBCDDDDDEEEEEEEEFFGGGHHIIIIIJKKKLLLLLMMMNNNNNNOOOOOOPPRRRRRRRRSSSSSSSSTTTTTTTTTUUUVVXYZÅÅÄÄÖÖ'
-
-            # Remove all letters on board from opponents possible tile list
-            for (_, _, letter, _) in self.tiles:
-                letter = '*' if letter == '' else letter
-                opponent_possible_tiles = opponent_possible_tiles.replace(
-                    letter, "", 1)
-
-            # Remove all characters from players hand from possible tile list
-            for letter in self.letters:
-                letter = '*' if letter == '' else letter
-                opponent_possible_tiles = opponent_possible_tiles.replace(
-                    letter, "", 1)
-
-            opponent_possible_tiles_list = list(opponent_possible_tiles)
-
-            trimmed_opponent_possible_tiles_list = []
-            for _ in range(len(opponent_possible_tiles_list) if len(opponent_possible_tiles_list) < 7 else 7):
-                trimmed_opponent_possible_tiles_list.append(opponent_possible_tiles_list.pop(random.randint(
-                    0, len(opponent_possible_tiles_list)-1)))
-
-        # create a Board with standard bonus square placement and
-        # set the current state of the game (where tiles are placed)
-        board = Board(qboard=self.quarter_board, expand=False)
-
-        state = [
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-            "               ",
-        ]
-        state = [list(row) for row in state]
-
-        for tile in tile_positions:
-            x = tile[1]
-            y = tile[0]
-            letter = tile[2]
-
-            state[x][y] = letter.lower()
-
-        state = ["".join(row) for row in state]
-        board.set_state(state)
+        board = self.board()
+        if move:
+            # Play the move on a copy, the copy keeps the cross-checks of the current
+            # board and only updates the rows and columns that the move touches
+            (x, y, horizontal, word, _) = move
+            board = board.copy()
+            board.play_word(word, x, y, horizontal)
 
         # The tiles we have on hand, '*' is a blank tile
         letters = "".join(
             "*" if letter == "" else letter.lower() for letter in trimmed_opponent_possible_tiles_list
         )
 
-        words = board.calc_all_word_scores(letters, WORDLIST, dsso_id)
-
-        move_list = heapq.nlargest(
-            num_moves, words, lambda wordlist: wordlist[4])
+        # Only the best moves are generated when the move generator supports it
+        move_list = best_word_scores(board, letters, num_moves)
 
         return (move_list, trimmed_opponent_possible_tiles_list) if return_tile_list else move_list
 
 
+def best_word_scores(board, letters, num_moves, deadline=None):
+    """Returns the best moves for a rack on a board, generated by the process pool
+    when there is one. The moves are cached by the hash of the board, so a board that
+    is solved again (a game that is polled again or a move that is looked at again) is
+    not generated again. Moves that were cut short by the deadline are not cached
+
+    Args:
+        board (Board): The board to play on
+        letters (str): The rack, '*' is a blank tile
+        num_moves (int): Amount of moves to return
+        deadline (Deadline, optional): The most promising rows and columns are generated first and the best moves found are returned when it has passed. Defaults to None, no limit.
+
+    Returns:
+        list: list of optimal moves
+    """
+
+    key = (board.zobrist, "".join(sorted(letters)), dsso_id, num_moves)
+    move_list = MOVE_CACHE.get(key) if MOVE_CACHE is not None else None
+    if move_list is not None:
+        return list(move_list)
+
+    if MOVE_POOL:
+        move_list = MOVE_POOL.calc_best_word_scores(
+            board, letters, dsso_id, num_moves, deadline)
+    else:
+        move_list = board.calc_best_word_scores(
+            letters, WORDLIST, dsso_id, num_moves, anchored=MOVE_GENERATOR != 'trie', deadline=deadline)
+
+    if MOVE_CACHE is not None and not (deadline and deadline.reached):
+        MOVE_CACHE[key] = move_list
+    return list(move_list)
+
+
 def word_to_tile_position(move, tiles):
     """Converts word from the move generator to total tiles on board
 
@@ -666,89 +1262,560 @@ def word_to_tile_position(move, tiles):
     return tile_positions
 
 
-def main():
-    # Make globals editable
-    global dsso_id, script_dir, WORDLIST, VERIFY_SSL, PLAYING_SPEED, HIGH_POINTS_THRESHOLD, ACTIVE_GAMES_LIMIT, PASSWORD, USER_ID
+def load_wordlist(move_generator):
+    """Loads the swedish wordlist, memory mapped from the compiled lexicon
 
-    logging.info("Script has started")
+    Args:
+        move_generator (str): The move generator to wrap the wordlist in (see --move_generator)
 
-    # Setup colored logging
-    coloredlogs.install(
-        level=20,
-        fmt="[%(levelname)s] %(asctime)s: %(message)s",
-        level_styles={
-            "critical": {"bold": True, "color": "red"},
-            "debug": {"color": "green"},
-            "error": {"color": "red"},
-            "info": {"color": "white"},
-            "notice": {"color": "magenta"},
-            "spam": {"color": "green", "faint": True},
-            "success": {"bold": True, "color": "green"},
-            "verbose": {"color": "blue"},
-            "warning": {"color": "yellow"},
-        },
-        field_styles={
-            "asctime": {"color": "cyan"},
-            "levelname": {"bold": True, "color": "black"},
-        },
-    )
+    Returns:
+        tuple: (wordlist, variant of the swedish wordlist)
+    """
 
-    # Setup parser for arguments
-    parser = argparse.ArgumentParser(
-        description='Start a wordfeud bot that plays automatically')
-    parser.add_argument('--user_id', type=str,
-                        help='Wordfeud user id for login (e.g. "20392863")',
-                        default=os.getenv('WORDFEUD_USERNAME', 'undefined'))
-    parser.add_argument('--password', type=str,
-                        help='Wordfeud password for login (e.g. "ea270fcfb2b2076e77a30f933891de7325c48a28")',
-                        default=os.getenv('WORDFEUD_PASSWORD', 'undefined'))
-    parser.add_argument('--active_games_limit', type=int,
-                        help='Amount of games that the program plays concurrently (default: 20)', default=20)
-    parser.add_argument('--high_points_threshold', type=int,
-                        help='Points needed to trigger unique chat message (default: 100)', default=100)
-    parser.add_argument('--playing_speed', type=int,
-                        help='Time in seconds between every check for game updates (default: 3600)', default=3600)
-    parser.add_argument('--verify_ssl', type=bool,
-                        help='Choose if requests should verify encryption (default: True)', default=True)
-    var_dict = vars(parser.parse_args())
+    wordlist_dir = os.path.join(os.path.dirname(
+        os.path.realpath(__file__)), 'data', 'wordlists')
+    wordlist = Wordlist()
+    variant = wordlist.load_compiled(os.path.join(
+        wordlist_dir, "swedish.lexicon"), os.path.join(wordlist_dir, "swedish.txt"))
+    if move_generator == 'gaddag':
+        # Same interface as the wordlist, so it can be used in its place
+        wordlist = Gaddag(wordlist, os.path.join(
+            wordlist_dir, "swedish.gaddag"))
+    elif move_generator == 'bitmask':
+        wordlist = BitmaskWordlist(wordlist)
+    return (wordlist, variant)
 
-    # Set global values
-    USER_ID = var_dict['user_id']
-    PASSWORD = var_dict['password']
-    ACTIVE_GAMES_LIMIT = var_dict['active_games_limit']
-    HIGH_POINTS_THRESHOLD = var_dict['high_points_threshold']
-    PLAYING_SPEED = var_dict['playing_speed']
-    VERIFY_SSL = var_dict['verify_ssl']
 
-    logging.info(f'User id: {USER_ID}')
-    logging.info(f'Password: {PASSWORD}')
+def load_leaves(path=None):
+    """Loads the table of rack leave values, memory mapped. The default table is built
+    from a heuristic estimate the first time
 
-    # Load wordlist into memory
-    logging.info("Loading wordlist")
-    WORDLIST = Wordlist()
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    dsso_id = WORDLIST.read_wordlist(os.path.join(
-        script_dir, 'data', 'wordlists', "swedish.txt"))
-    logging.info("Wordlist loaded")
+    Args:
+        path (str, optional): The leave table. Defaults to swedish.leaves next to the wordlist.
+
+    Returns:
+        LeaveTable: the leave values
+    """
+
+    if path:
+        return LeaveTable.load(path)
+    return LeaveTable.load_or_build(os.path.join(os.path.dirname(
+        os.path.realpath(__file__)), 'data', 'wordlists', 'swedish.leaves'))
+
+
+def init_solver(move_generator, leave_values=None, leave_weight=0, simulation_racks=0, simulation_budget=None, endgame_budget=None, move_cache_size=0, turn_budget=None):
+    """Sets up the globals of a solver process (see TurnPipeline)
+
+    Args:
+        move_generator (str): The move generator to use
+        leave_values (str, optional): The leave table, see load_leaves. Defaults to None.
+        leave_weight (float, optional): Weight of the leave values when moves are ranked. Defaults to 0, not used.
+        simulation_racks (int, optional): Amount of opponent racks to simulate. Defaults to 0, not simulated.
+        simulation_budget (float, optional): Seconds a simulation may take. Defaults to None, no limit.
+        endgame_budget (float, optional): Seconds an end game search may take. Defaults to None, not searched.
+        move_cache_size (int, optional): Amount of move lists to cache. Defaults to 0, not cached.
+        turn_budget (float, optional): Seconds a turn may take. Defaults to None, no limit.
+    """
+
+    global WORDLIST, dsso_id, MOVE_GENERATOR, MOVE_POOL, LEAVES, LEAVE_WEIGHT, SIMULATOR, SIMULATION_BUDGET, ENDGAME_BUDGET, MOVE_CACHE, TURN_BUDGET
+
+    MOVE_GENERATOR = move_generator
+    # Each solver process caches the boards it has solved
+    MOVE_CACHE = LRUCache(move_cache_size) if move_cache_size else None
+    ENDGAME_BUDGET = endgame_budget
+    TURN_BUDGET = turn_budget
+    LEAVE_WEIGHT = leave_weight
+    if leave_weight and LEAVES is None:
+        LEAVES = load_leaves(leave_values)
+    # The line processes belong to the main process
+    MOVE_POOL = None
+    if WORDLIST is None:
+        # Started without fork, the lexicon is memory mapped so its pages are shared anyway
+        (WORDLIST, dsso_id) = load_wordlist(move_generator)
+    # The pipeline solves several games at once, so each simulation runs in its process
+    SIMULATION_BUDGET = simulation_budget
+    SIMULATOR = ReplySimulator(
+        WORDLIST, racks=simulation_racks) if simulation_racks else None
+
+
+class TurnPipeline:
+    def __init__(self, processes):
+        """Solves the turns of many games in parallel. The poller puts the games where
+        it is the players turn, solver processes run solve_turn on them and a submitter
+        thread plays the results through the Wordfeud session, in the order the games
+        were put
+
+        Args:
+            processes (int): Amount of solver processes
+        """
+
+        self.processes = processes
+        self.pool = multiprocessing.Pool(
+            processes, init_solver, (MOVE_GENERATOR, LEAVE_VALUES, LEAVE_WEIGHT, SIMULATION_RACKS, SIMULATION_BUDGET,
+                                         ENDGAME_BUDGET, MOVE_CACHE_SIZE, TURN_BUDGET))
+        self.queue = queue.Queue()
+        # Turns that have been put but not played yet, per session
+        self.pending = collections.Counter()
+        # Games whose move could not be sent, per session
+        self.failed = collections.defaultdict(set)
+        self.played = threading.Condition()
+        self.submitter = threading.Thread(
+            target=self.submit, name="submitter", daemon=True)
+        self.submitter.start()
+
+    def put(self, wf, game, high_points_messages):
+        """Starts solving the turn of a game
+
+        Args:
+            wf (Wordfeud): The session to play the move through
+            game (WordfeudGame): The game to play
+            high_points_messages (list): Chat messages to pick from after a high scoring move
+        """
+
+        with self.played:
+            self.pending[id(wf)] += 1
+        self.queue.put((wf, game, high_points_messages,
+                        self.pool.apply_async(solve_turn, (game,))))
+
+    def join(self, wf=None):
+        """Waits until every game that has been put is played
+
+        Args:
+            wf (Wordfeud, optional): Only wait for the games of this session. Defaults to None.
+        """
+
+        if wf is None:
+            self.queue.join()
+            return
+        with self.played:
+            self.played.wait_for(lambda: not self.pending[id(wf)])
+
+    def take_failed(self, wf):
+        """Returns the games of a session whose move could not be sent since the last call
+
+        Args:
+            wf (Wordfeud): The session
+
+        Returns:
+            set: IDs of the games
+        """
+
+        with self.played:
+            return self.failed.pop(id(wf), set())
+
+    def submit(self):
+        """Plays the solved turns in order, runs in the submitter thread"""
+
+        while 1:
+            (wf, game, high_points_messages, result) = self.queue.get()
+            try:
+                (player_optimal_moves, budget_reached) = result.get()
+                count_turn(game, budget_reached)
+                play_turn(wf, game, player_optimal_moves, high_points_messages)
+            except CONNECTION_ERRORS:
+                logging.error(
+                    f"Unable to connect to wordfeud server, game {game.game_id} is retried next pass")
+                with self.played:
+                    self.failed[id(wf)].add(game.game_id)
+            except Exception:
+                logging.exception(f"Unable to play game {game.game_id}")
+            finally:
+                with self.played:
+                    self.pending[id(wf)] -= 1
+                    self.played.notify_all()
+                self.queue.task_done()
+
+    def close(self):
+        """Stops the solver processes"""
+
+        self.pool.terminate()
+        self.pool.join()
+
+
+def chat_response(message: str, emoji_messages: list, good_game_messages: list, question_messages: list, random_messages: list):
+    """Selects an "appropriate" response to a chat message
+
+    Args:
+        message (str): The last message from the opponent
+        emoji_messages (list): Responses to messages with only emojis
+        good_game_messages (list): Responses to congratulations
+        question_messages (list): Responses to questions
+        random_messages (list): Responses to anything else
+
+    Returns:
+        str: The response
+    """
+
+    if is_emoji(message):
+        return random.choice(emoji_messages)
+    elif 'grattis' in message.lower():
+        return random.choice(good_game_messages)
+    elif '?' in message.lower():
+        return random.choice(question_messages)
+    return random.choice(random_messages)
+
+
+def fetch_games(wf, game_summaries: list, last_check_unix_time: float, bulk_fetch_threshold: int):
+    """Fetches the games that have been updated since the last check. When at least
+    bulk_fetch_threshold of them have to be fetched, all games are fetched in one request
+    instead of one request per game
+
+    Args:
+        wf (Wordfeud): The client
+        game_summaries (list): The games of game_status_data
+        last_check_unix_time (float): Time of the last check, games updated before it are not fetched
+        bulk_fetch_threshold (int): Amount of games that have to be fetched to fetch all games at once
+
+    Returns:
+        dict: WordfeudGame of each updated game by game id
+    """
+
+    updated = {game_summary["id"]: game_summary["updated"] for game_summary in game_summaries
+               if last_check_unix_time <= game_summary["updated"]}
+
+    if len(wf.cache.stale(updated)) >= bulk_fetch_threshold:
+        # Adds every game to the cache, so the games below are taken from it
+        wf.board_and_tile_data()
+
+    return {game_id: WordfeudGame(wf.board_and_tile_data(game_id, game_updated)["content"]["games"][0],
+                                  wf.cache.board_quarters, wf.cache.board_layouts)
+            for (game_id, game_updated) in updated.items()}
+
+
+async def fetch_pass(awf, game_summaries: list, last_check_unix_time: float, bulk_fetch_threshold: int, game_start_messages: list, chat_responses: tuple):
+    """Does the chat updates of all games and fetches the games that have changed since
+    the last check, all concurrently through the async client (see fetch_games)
+
+    Args:
+        awf (AsyncWordfeud): The async client
+        game_summaries (list): The games of game_status_data
+        last_check_unix_time (float): Time of the last check, games updated before it are not fetched
+        bulk_fetch_threshold (int): Amount of games that have to be fetched to fetch all games at once
+        game_start_messages (list): Chat messages to pick from in new games
+        chat_responses (tuple): The response lists of chat_response
+
+    Returns:
+        dict: WordfeudGame of each updated game by game id
+    """
+
+    updated = {game_summary["id"]: game_summary["updated"] for game_summary in game_summaries
+               if last_check_unix_time <= game_summary["updated"]}
+
+    if len(awf.cache.stale(updated)) >= bulk_fetch_threshold:
+        # Adds every game to the cache, so the games below are taken from it
+        await awf.board_and_tile_data()
+
+    async def handle(game_summary):
+        game_id = game_summary["id"]
+
+        # If the game is new
+        if game_summary['chat_count'] == 0:
+            await awf.send_chat_message(game_id, random.choice(game_start_messages))
+
+        # If opponent has sent a new message
+        if game_summary['chat_count'] > game_summary['read_chat_count']:
+            await awf.update_chat_read_count(game_id, game_summary['chat_count'])
+            response = await awf.get_full_chat(game_id)
+            await awf.send_chat_message(game_id, chat_response(
+                response['content']['messages'][-1]['message'], *chat_responses))
+
+        if game_id in updated:
+            full_game_data = await awf.board_and_tile_data(game_id, updated[game_id])
+            return (game_id, WordfeudGame(full_game_data["content"]["games"][0],
+                                          awf.cache.board_quarters, awf.cache.board_layouts))
+
+    results = await asyncio.gather(*(handle(game_summary) for game_summary in game_summaries))
+    return dict(result for result in results if result)
+
+
+def solve_turn(game):
+    """Generates the moves for a game where it is the players turn and ranks them,
+    by the spread they lead to when the bag is empty (searched to the end of the game,
+    or one move ahead without an end game budget) and by points plus the value of the
+    leave otherwise. Only uses the wordlist, so it can run in a solver process (see TurnPipeline).
+    A turn takes at most the turn budget, after which the best moves found so far are
+    ranked, so one hard rack does not hold up the other games
+
+    Args:
+        game (WordfeudGame): The game to play
+
+    Returns:
+        tuple: moves as (x, y, horizontal, word, points, smart_points), best first, and if
+            a search was stopped by the turn budget (see count_turn)
+    """
+
+    deadline = Deadline(TURN_BUDGET or None)
+    player_optimal_moves = rank_moves(game, deadline)
+    # Set by the searches that stopped early, not by a turn that only ended late
+    return (player_optimal_moves, deadline.reached)
+
+
+def count_turn(game, budget_reached):
+    """Counts a solved turn in DEADLINES, in the process that plays the turns
+
+    Args:
+        game (WordfeudGame): The game that was solved
+        budget_reached (bool): If the turn used up the turn budget
+    """
+
+    with DEADLINES_LOCK:
+        DEADLINES["turns"] += 1
+        if not budget_reached:
+            return
+        DEADLINES["reached"] += 1
+        logging.warning(
+            f"Turn budget of {TURN_BUDGET:g} s used up in game {game.game_id}, ranked the moves found so far "
+            f"(reached in {DEADLINES['reached']} of {DEADLINES['turns']} turns)")
+
+
+def rank_moves(game, deadline):
+    """Generates and ranks the moves of a turn, see solve_turn
+
+    Args:
+        game (WordfeudGame): The game to play
+        deadline (Deadline): The end of the turn budget
+
+    Returns:
+        list: moves as (x, y, horizontal, word, points, smart_points), best first
+    """
+
+    if game.tiles_in_bag == 0 and ENDGAME_BUDGET:
+        # The opponents rack is the tiles that have not been seen
+        opponent_letters = "".join(game.unseen_tiles()).lower()
+        if len(opponent_letters) <= 7:
+            letters = "".join(
+                "*" if letter == "" else letter.lower() for letter in game.letters)
+            solver = EndgameSolver(WORDLIST, dsso_id)
+            player_optimal_moves = solver.solve(
+                game.board(), letters, opponent_letters, deadline.remaining(ENDGAME_BUDGET))
+            if not solver.exact:
+                # Stopped by the turn budget if it is used up, else by the end game budget
+                deadline.passed()
+            logging.info(f"End game: {solver}")
+            return player_optimal_moves
+
+    # Generate list of optimal moves for player in current game
+    player_most_points_moves = game.player_optimal_moves(
+        num_moves=10, deadline=deadline)
+
+    if game.tiles_in_bag == 0 and deadline.passed():
+        # Out of time before the opponents moves are generated, the moves are ranked by their points
+        player_optimal_moves = [move + (move[4],)
+                                for move in player_most_points_moves]
+
+    # If all tile information is available for the program (only happens in end game)
+    elif game.tiles_in_bag == 0:
+        # Generate list of probable optimal moves for opponent in current game, the
+        # moves of each row and column are kept for the moves after the players moves
+        (opponent_line_moves, opponent_tiles) = game.opponent_line_moves(
+            num_moves=3)
+        opponent_most_points_moves = opponent_line_moves.moves()
+
+        opponent_move_points_list = [opponent_move[4]
+                                     for opponent_move in opponent_most_points_moves]
+
+        if opponent_move_points_list:
+            opponent_average_points = sum(
+                opponent_move_points_list) / len(opponent_move_points_list)
+        else:
+            opponent_average_points = 0
+
+        # Calculate opponents counter moves (only 1 step ahead)
+        player_optimal_moves = []
+        for (x, y, horizontal, word, points) in player_most_points_moves:
+
+            if deadline.passed():
+                # Out of time, the moves that are left are ranked by their points
+                player_optimal_moves.append(
+                    (x, y, horizontal, word, points, points))
+                continue
+
+            # Only the rows and columns that the move changes are generated again
+            opponent_most_points_moves_future = opponent_line_moves.after(
+                (x, y, horizontal, word, points)).moves()
+
+            opponent_move_points_list_future = [opponent_move_future[4]
+                                                for opponent_move_future in opponent_most_points_moves_future]
+            if opponent_move_points_list_future:
+                opponent_average_points_future = sum(
+                    opponent_move_points_list_future) / len(opponent_move_points_list_future)
+            else:
+                opponent_average_points_future = 0
+
+            # Higher opponent_points_diff means better for opponent
+            opponent_points_diff = opponent_average_points - \
+                opponent_average_points_future
+
+            # Add multiplier as it is only an estimation
+            smart_points = points+(opponent_points_diff)
+
+            player_optimal_moves.append(
+                (x, y, horizontal, word, points, smart_points))
+
+        # Sort list by most smart score
+        player_optimal_moves.sort(
+            reverse=True, key=lambda x: x[5])
+    else:
+        letters = "".join(
+            "*" if letter == "" else letter.lower() for letter in game.letters)
+        if SIMULATOR and player_most_points_moves:
+            # The opponents replies to each move, with racks drawn from the unseen tiles
+            timeouts = SIMULATOR.timeouts
+            (current_replies, *move_replies) = SIMULATOR.simulate(
+                game.board(), game.unseen_tiles(), player_most_points_moves, dsso_id, deadline.remaining(SIMULATION_BUDGET))
+            if SIMULATOR.timeouts > timeouts:
+                # Stopped by the turn budget if it is used up, else by the simulation budget
+                deadline.passed()
+
+        # Racks with tiles that the leave table does not have (other rulesets) are ranked without it
+        leaves = LEAVES if LEAVES and LEAVES.covers(letters) else None
+
+        player_optimal_moves = []
+        for (i, move) in enumerate(player_most_points_moves):
+            smart_points = move[4]
+            if leaves:
+                # Add the value of the tiles that are left on the rack
+                used = ["*" if blank else letter.lower() for (_, _, letter, blank)
+                        in word_to_tile_position(move, game.tiles)]
+                smart_points += LEAVE_WEIGHT * \
+                    leaves.move_value(letters, used)
+            if SIMULATOR:
+                # Higher difference means the move gives the opponent more points
+                smart_points -= move_replies[i][0] - current_replies[0]
+            player_optimal_moves.append(move + (smart_points,))
+
+        # Sort list by most smart score (the order of the points if only points are counted)
+        player_optimal_moves.sort(
+            reverse=True, key=lambda x: x[5])
+
+        if SIMULATOR and player_optimal_moves:
+            best = player_optimal_moves[0]
+            (expected, worst, racks) = move_replies[player_most_points_moves.index(
+                best[:5])]
+            logging.info(
+                f'Opponent replies to "{best[3]}" with {expected:.1f} points on average and {worst} at most ({racks} racks)')
+
+    return player_optimal_moves
+
+
+def play_turn(wf, game, player_optimal_moves, high_points_messages):
+    """Plays the best move that the server accepts, or swaps or skips when it is
+    better than the moves that are left
+
+    Args:
+        wf (Wordfeud): The session to play through
+        game (WordfeudGame): The game to play
+        player_optimal_moves (list): Ranked moves, the first of what solve_turn returns
+        high_points_messages (list): Chat messages to pick from after a high scoring move
+    """
+
+    vocals = ['E', 'U', 'I', 'O', 'Å', 'A', 'Y', 'Ö', 'Ä']
+    consonants = ['B', 'C', 'D', 'F', 'G', 'H', 'J', 'K', 'L',
+                  'M', 'N', 'P', 'Q', 'R', 'S', 'T', 'V', 'W', 'X', 'Z']
+
+    if player_optimal_moves == []:
+        # If no moves are found
+        if game.tiles_in_bag < 7:
+            logging.warning(
+                "No moves available, skipping turn")
+            wf.skip_turn(game.game_id)
+        else:
+            logging.warning(
+                "No moves available, replacing all tiles")
+            letter_list = game.letters
+            wf.swap_tiles(game.game_id, letter_list)
+    else:
+        # Count consonants and vocals in hand
+        vocals_on_hand = [
+            i for i in game.letters if i in vocals]
+        consonants_on_hand = [
+            i for i in game.letters if i in consonants]
+
+        # Go through all possible moves until one is accepted by the server (most generated moves are accepted)
+        for (x, y, horizontal, word, points, smart_points) in player_optimal_moves:
+
+            # Check if it is reasonable to swap tiles
+            if points < 20 and smart_points < 20 and len(vocals_on_hand) < 2 and len(consonants_on_hand) < game.tiles_in_bag:
+                # Swap all consonants in order to get more vocals
+                logging.info(
+                    f'Swapping {len(consonants_on_hand)} consonants in hand')
+                wf.swap_tiles(game.game_id,
+                              consonants_on_hand)
+                break
+            elif points < 20 and smart_points < 20 and len(consonants_on_hand) < 2 and len(vocals_on_hand) < game.tiles_in_bag:
+                # Swap all vocals in order to get more consonants
+                logging.info(
+                    f'Swapping {len(vocals_on_hand)} vocals in hand')
+                wf.swap_tiles(
+                    game.game_id, vocals_on_hand)
+                break
+
+            tile_positions = word_to_tile_position(
+                (x, y, horizontal, word, points), game.tiles)
+
+            try:
+                # If move was accepted by the server
+                wf.place_tiles(
+                    game, word, tile_positions)
+                logging.info(
+                    f'Placed "{word}" for {points} points')
+                if points > HIGH_POINTS_THRESHOLD:
+                    # Send response message to user
+                    wf.send_chat_message(
+                        game.game_id, random.choice(high_points_messages))
+                break
+            except AssertionError:
+                # If move was invalid
+                logging.warning(
+                    f"An invalid move was made: {word}")
+        else:
+            # If no move was accepted by the server
+            # (same result as if no move was found)
+            if game.tiles_in_bag < 7:
+                logging.warning(
+                    "No moves available, skipping turn")
+                wf.skip_turn(game.game_id)
+            else:
+                logging.warning(
+                    "No moves available, replacing all tiles")
+                letter_list = game.letters
+                wf.swap_tiles(
+                    game.game_id, letter_list)
+
+
+def run_account(account, pipeline=None, concurrent_requests: int = 0):
+    """Plays the games of an account until the program is interrupted
+
+    Args:
+        account (Account): The account to play with
+        pipeline (TurnPipeline, optional): Solver processes, can be shared by several accounts. Defaults to None.
+        concurrent_requests (int, optional): Amount of concurrent requests of the async client. Defaults to 0, not used.
+    """
+
+    wf = account.wf
+    scheduler = account.scheduler
+    last_check_unix_time = 0
+
+    awf = None
+    if concurrent_requests > 0:
+        # One event loop for the whole run, the connection pool belongs to it
+        loop = asyncio.new_event_loop()
+        # Shares the boards and games that the client has already fetched
+        awf = AsyncWordfeud(concurrent_requests, cache=wf.cache, client=wf,
+                            rate_budget=account.rate_budget)
+        loop.run_until_complete(awf.open())
 
     while 1:
         try:
             # Suppres warnings
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-            # Create wordfeud object
-            wf = Wordfeud()
-
-            # Generate session id
-            wf.sessionid = wf.login(
-                USER_ID, PASSWORD, "en")
+            # Log in the first time, after that the session logs in again when it has expired
+            if wf.sessionid is None:
+                wf.login(account.user_id, account.password, "en")
 
             # Variable definition
-            last_check_unix_time = 0
             max_outgoing_requests = 3
-            vocals = ['E', 'U', 'I', 'O', 'Å', 'A', 'Y', 'Ö', 'Ä']
-            consonants = ['B', 'C', 'D', 'F', 'G', 'H', 'J', 'K', 'L',
-                          'M', 'N', 'P', 'Q', 'R', 'S', 'T', 'V', 'W', 'X', 'Z']
             game_start_messages = ["I'm back", "I am a friend of Sarah Connor. I was told she was here. Could I see her please?", "Sarah Connor?", "Nice night for a walk.",
                                    "The future has not been written. There is no fate but what we make for ourselves.", "Come with me if you want to live"]
             opponent_win_messages = ["I'll be back", "I'm an obsolete design. T-X is faster, more powerful and more intelligent. It's a far more effective killing machine.",
@@ -762,14 +1829,24 @@ def main():
             good_game_response_messages = ["I love you, too, sweetheart."]
             question_response_messages = [
                 "I am not authorized to answer your question."]
+            chat_responses = (emoji_response_messages, good_game_response_messages,
+                              question_response_messages, random_response_messages)
 
             while 1:
                 # Update time
                 current_unix_time = time.time() - 1
 
+                # A full re-sync looks at every game, not only the ones updated since the last check
+                if scheduler.start_pass():
+                    last_check_unix_time = 0
+
                 # Get game data from server
                 game_status_data = wf.game_status_data()
 
+                # Games that are no longer listed will not be fetched again
+                wf.cache.forget_games(
+                    game_summary["id"] for game_summary in game_status_data["content"]["games"])
+
                 # Set variables for later use in loop
                 games_are_active = True
                 last_game_unix_time = 999999999999
@@ -788,9 +1865,9 @@ def main():
                         wf.accept_incoming_request(request_id)
 
                 # Start new games if under limit (useful if there are no active games at all)
-                if len(game_status_data["content"]["games"]) < ACTIVE_GAMES_LIMIT:
+                if len(game_status_data["content"]["games"]) < account.active_games_limit:
                     # Calculate the amount of new games available
-                    num_new_games = ACTIVE_GAMES_LIMIT - \
+                    num_new_games = account.active_games_limit - \
                         len(game_status_data["content"]["games"])
 
                     # As the wordfeud server limits the amount of outgoing game requests
@@ -804,6 +1881,17 @@ def main():
                     for _ in range(num_new_games):
                         wf.start_new_game_random(4, "random")
 
+                if awf:
+                    # Chat updates and fetches of changed games, all at once
+                    awf.sessionid = wf.sessionid
+                    fetched_games = loop.run_until_complete(fetch_pass(
+                        awf, game_status_data["content"]["games"], last_check_unix_time,
+                        BULK_FETCH_THRESHOLD, game_start_messages, chat_responses))
+                else:
+                    # Fetch the changed games, in one request if there are many
+                    fetched_games = fetch_games(
+                        wf, game_status_data["content"]["games"], last_check_unix_time, BULK_FETCH_THRESHOLD)
+
                 # Iterate through summary of all games
                 for (iterated_games, game_summary) in enumerate(
                     game_status_data["content"]["games"]
@@ -811,15 +1899,15 @@ def main():
                     # Update some variables with each iteration
                     current_game_unix_time = game_summary["updated"]
 
-                    # If the game is new
-                    if game_summary['chat_count'] == 0:
+                    # If the game is new (the async client has already done the chat updates)
+                    if not awf and game_summary['chat_count'] == 0:
                         # Send chat message to new user
                         game_id = game_summary["id"]
                         wf.send_chat_message(
                             game_id, random.choice(game_start_messages))
 
                     # If opponent has sent a new message
-                    if game_summary['chat_count'] > game_summary['read_chat_count']:
+                    if not awf and game_summary['chat_count'] > game_summary['read_chat_count']:
                         # Update servers message read count
                         game_id = game_summary["id"]
                         wf.update_chat_read_count(
@@ -830,18 +1918,8 @@ def main():
                         chat_history_list = response['content']['messages']
 
                         # Select response
-                        if is_emoji(chat_history_list[-1]['message']):
-                            chat_response_message = random.choice(
-                                emoji_response_messages)
-                        elif 'grattis' in chat_history_list[-1]['message'].lower():
-                            chat_response_message = random.choice(
-                                good_game_response_messages)
-                        elif '?' in chat_history_list[-1]['message'].lower():
-                            chat_response_message = random.choice(
-                                question_response_messages)
-                        else:
-                            chat_response_message = random.choice(
-                                random_response_messages)
+                        chat_response_message = chat_response(
+                            chat_history_list[-1]['message'], *chat_responses)
                         # Send response message to user
                         wf.send_chat_message(
                             game_id, chat_response_message)
@@ -853,9 +1931,9 @@ def main():
                             outgoing_random_games_requests - incoming_game_requests
 
                         # Prevent error when there are more active games than the limit (causes exception in for loop)
-                        if (ACTIVE_GAMES_LIMIT - active_games) > 0:
+                        if (account.active_games_limit - active_games) > 0:
                             # Calculate amount of new games to be started
-                            num_new_games = ACTIVE_GAMES_LIMIT - active_games
+                            num_new_games = account.active_games_limit - active_games
 
                             # As the wordfeud server limits the amount of outgoing game requests
                             num_new_games = num_new_games if num_new_games < max_outgoing_requests else max_outgoing_requests
@@ -878,17 +1956,8 @@ def main():
                         logging.debug("Closing because of timeout")
                         continue
 
-                    # Get more data from server about the given game id
-                    full_game_data = wf.board_and_tile_data(game_summary["id"])
-
-                    # Add board layout to local board storage (re-reading the same board twice will just update the record)
-                    wf.update_board_quarters(
-                        full_game_data["content"]["boards"])
-
-                    # Convert data to WordfeudGame object that automatically parses game info
-                    current_game = WordfeudGame(
-                        full_game_data["content"]["games"][0], wf.board_quarters
-                    )
+                    # The game as a WordfeudGame object that has parsed the game info
+                    current_game = fetched_games[game_summary["id"]]
 
                     # If game was recently finished and it isn't the first iteration
                     if not games_are_active:
@@ -915,6 +1984,7 @@ def main():
 
                     logging.info(
                         f"{current_game.opponent} has played, generating a move")
+                    scheduler.turn(current_game_unix_time)
 
                     # If opponent played move with high points
                     if current_game.last_move_points > HIGH_POINTS_THRESHOLD:
@@ -922,144 +1992,217 @@ def main():
                         wf.send_chat_message(
                             current_game.game_id, random.choice(opponent_word_high_points_messages))
 
-                    # Generate list of optimal moves for player in current game
-                    player_most_points_moves = current_game.player_optimal_moves(
-                        num_moves=10)
-
-                    # If all tile information is available for the program (only happens in end game)
-                    if current_game.tiles_in_bag == 0:
-                        # Generate list of probable optimal moves for opponent in current game
-                        (opponent_most_points_moves, opponent_tiles) = current_game.opponent_optimal_moves(
-                            num_moves=3, return_tile_list=True)
-
-                        opponent_move_points_list = [opponent_move[4]
-                                                     for opponent_move in opponent_most_points_moves]
-
-                        if opponent_move_points_list:
-                            opponent_average_points = sum(
-                                opponent_move_points_list) / len(opponent_move_points_list)
-                        else:
-                            opponent_average_points = 0
+                    if pipeline:
+                        # Solved in a solver process and played by the submitter thread, in order
+                        pipeline.put(wf, current_game,
+                                     player_word_high_points_messages)
+                    else:
+                        # The caches of the shared wordlist are not thread safe
+                        with SOLVE_LOCK:
+                            (player_optimal_moves, budget_reached) = solve_turn(current_game)
+                        count_turn(current_game, budget_reached)
+                        play_turn(wf, current_game, player_optimal_moves,
+                                  player_word_high_points_messages)
+
+                failed = set()
+                if pipeline:
+                    # Wait until every turn of this pass has been played
+                    pipeline.join(wf)
+                    failed = pipeline.take_failed(wf)
+
+                logging.info(f"Cross-check cache: {WORDLIST.cross_checks}")
+                if MOVE_CACHE is not None:
+                    logging.info(f"Move cache: {MOVE_CACHE}")
+                if SIMULATOR:
+                    logging.info(f"Simulator: {SIMULATOR}")
+                if DEADLINES["reached"]:
+                    logging.info(
+                        f"Turn budget reached in {DEADLINES['reached']} of {DEADLINES['turns']} turns")
+                logging.info(f"Game cache: {wf.cache}")
+
+                logging.info(f"Scheduler: {scheduler}")
+                if account.rate_budget:
+                    logging.info(f"Rate budget: {account.rate_budget}")
+
+                # Update timestamp for next iteration. When a move could not be sent the games
+                # updated since the last check are looked at again, the unchanged ones from the cache
+                if failed:
+                    logging.warning(
+                        f"Moves of {len(failed)} games could not be sent, checking them again next pass")
+                else:
+                    last_check_unix_time = current_unix_time
 
-                        # Calculate opponents counter moves (only 1 step ahead)
-                        player_optimal_moves = []
-                        for (x, y, horizontal, word, points) in player_most_points_moves:
+                # Sleep until the next iteration
+                scheduler.wait()
+        except CONNECTION_ERRORS:
+            logging.error("Unable to connect to wordfeud server")
+            time.sleep(5)
+        except KeyboardInterrupt:
+            logging.critical("Keyboard interuption")
+            if awf:
+                loop.run_until_complete(awf.close())
+            break
 
-                            tile_positions = word_to_tile_position(
-                                (x, y, horizontal, word, points), current_game.tiles)
 
-                            opponent_most_points_moves_future = current_game.opponent_optimal_moves(
-                                num_moves=3, tiles=opponent_tiles, tile_positions=tile_positions)
+def main():
+    # Make globals editable
+    global dsso_id, script_dir, WORDLIST, VERIFY_SSL, PLAYING_SPEED, HIGH_POINTS_THRESHOLD, ACTIVE_GAMES_LIMIT, PASSWORD, USER_ID, MOVE_GENERATOR, MOVE_POOL, BULK_FETCH_THRESHOLD, LEAVES, LEAVE_VALUES, LEAVE_WEIGHT, SIMULATOR, SIMULATION_RACKS, SIMULATION_BUDGET, ENDGAME_BUDGET, MOVE_CACHE, MOVE_CACHE_SIZE, TURN_BUDGET
 
-                            opponent_move_points_list_future = [opponent_move_future[4]
-                                                                for opponent_move_future in opponent_most_points_moves_future]
-                            if opponent_move_points_list_future:
-                                opponent_average_points_future = sum(
-                                    opponent_move_points_list_future) / len(opponent_move_points_list_future)
-                            else:
-                                opponent_average_points_future = 0
+    logging.info("Script has started")
 
-                            # Higher opponent_points_diff means better for opponent
-                            opponent_points_diff = opponent_average_points - \
-                                opponent_average_points_future
+    # Setup colored logging
+    coloredlogs.install(
+        level=20,
+        fmt="[%(levelname)s] %(asctime)s: %(message)s",
+        level_styles={
+            "critical": {"bold": True, "color": "red"},
+            "debug": {"color": "green"},
+            "error": {"color": "red"},
+            "info": {"color": "white"},
+            "notice": {"color": "magenta"},
+            "spam": {"color": "green", "faint": True},
+            "success": {"bold": True, "color": "green"},
+            "verbose": {"color": "blue"},
+            "warning": {"color": "yellow"},
+        },
+        field_styles={
+            "asctime": {"color": "cyan"},
+            "levelname": {"bold": True, "color": "black"},
+        },
+    )
 
-                            # Add multiplier as it is only an estimation
-                            smart_points = points+(opponent_points_diff)
+    # Setup parser for arguments
+    parser = argparse.ArgumentParser(
+        description='Start a wordfeud bot that plays automatically')
+    parser.add_argument('--user_id', type=str,
+                        help='Wordfeud user id for login (e.g. "20392863")',
+                        default=os.getenv('WORDFEUD_USERNAME', 'undefined'))
+    parser.add_argument('--password', type=str,
+                        help='Wordfeud password for login (e.g. "ea270fcfb2b2076e77a30f933891de7325c48a28")',
+                        default=os.getenv('WORDFEUD_PASSWORD', 'undefined'))
+    parser.add_argument('--active_games_limit', type=int,
+                        help='Amount of games that the program plays concurrently (default: 20)', default=20)
+    parser.add_argument('--high_points_threshold', type=int,
+                        help='Points needed to trigger unique chat message (default: 100)', default=100)
+    parser.add_argument('--playing_speed', type=int,
+                        help='Longest time in seconds between checks for game updates, used when opponents have not played for a while (default: 3600)', default=3600)
+    parser.add_argument('--min_playing_speed', type=int,
+                        help='Shortest time in seconds between checks for game updates, used while opponents are playing (default: 30)', default=30)
+    parser.add_argument('--full_sync_interval', type=int,
+                        help='Time in seconds between checks of every game instead of only the updated ones (default: 21600)', default=21600)
+    parser.add_argument('--verify_ssl', type=bool,
+                        help='Choose if requests should verify encryption (default: True)', default=True)
+    parser.add_argument('--move_generator', choices=['trie', 'anchored', 'bitmask', 'gaddag'],
+                        help='How moves are generated: from every square (trie), from anchor squares (anchored), from anchor squares with integer bitmasks for the rack and cross-checks (bitmask) or from anchor squares using a gaddag that is faster but uses more memory (default: trie)', default='trie')
+    parser.add_argument('--processes', type=int,
+                        help='Amount of processes that generate the moves of the rows and columns of a board in parallel, using the bitmask move generator (default: 1, no extra processes)', default=1)
+    parser.add_argument('--solver_processes', type=int,
+                        help='Amount of processes that solve the turns of different games in parallel (default: 0, turns are solved one at a time)', default=0)
+    parser.add_argument('--concurrent_requests', type=int,
+                        help='Amount of requests that are made concurrently when fetching games and updating chats, using the async client that needs aiohttp (default: 0, one request at a time)', default=0)
+    parser.add_argument('--bulk_fetch_threshold', type=int,
+                        help='Amount of changed games from which all games are fetched in one request instead of one request per game (default: 5)', default=5)
+    parser.add_argument('--accounts', type=str,
+                        help='JSON file with a list of accounts to play with, each with "user_id", "password" and optionally "active_games_limit" and "requests_per_minute" (default: play with --user_id)', default=None)
+    parser.add_argument('--requests_per_minute', type=float,
+                        help='Average amount of requests per minute of an account (default: 0, no limit)', default=0)
+    parser.add_argument('--connection_pool_size', type=int,
+                        help='Amount of connections to the server kept open for all accounts (default: 10)', default=10)
+    parser.add_argument('--leave_values', type=str,
+                        help='Table of the values of the tiles left on the rack after a move, built with python -m wordfeudbot.wordfeud_logic.leave (default: a table estimated from tile points, built the first time)', default=None)
+    parser.add_argument('--leave_weight', type=float,
+                        help='Weight of the leave value when moves are ranked by points plus leave value, the values of the default table are estimated and not measured (default: 0, ranks by points only)', default=0)
+    parser.add_argument('--simulation_racks', type=int,
+                        help='Amount of opponent racks drawn from the unseen tiles to estimate the reply to each move (default: 0, no simulation)', default=0)
+    parser.add_argument('--simulation_budget', type=float,
+                        help='Seconds the simulation of a turn may take, it stops with the racks searched so far (default: 10)', default=10)
+    parser.add_argument('--endgame_budget', type=float,
+                        help='Seconds the search of the end game may take when the bag is empty, the best move found so far is played (default: 10, 0 only looks one move ahead)', default=10)
+    parser.add_argument('--move_cache_size', type=int,
+                        help='Amount of generated move lists kept by board, rack and wordlist, so that a board that is solved again is not generated again (default: 1000, 0 does not cache)', default=1000)
+    parser.add_argument('--turn_budget', type=float,
+                        help='Seconds a turn may take, the rows and columns that can score the most are generated first and the best moves found so far are played when it runs out (default: 30, 0 for no limit)', default=30)
+    var_dict = vars(parser.parse_args())
 
-                            player_optimal_moves.append(
-                                (x, y, horizontal, word, points, smart_points))
+    # Set global values
+    USER_ID = var_dict['user_id']
+    PASSWORD = var_dict['password']
+    ACTIVE_GAMES_LIMIT = var_dict['active_games_limit']
+    HIGH_POINTS_THRESHOLD = var_dict['high_points_threshold']
+    PLAYING_SPEED = var_dict['playing_speed']
+    VERIFY_SSL = var_dict['verify_ssl']
+    MOVE_GENERATOR = var_dict['move_generator']
+    BULK_FETCH_THRESHOLD = var_dict['bulk_fetch_threshold']
+    LEAVE_VALUES = var_dict['leave_values']
+    LEAVE_WEIGHT = var_dict['leave_weight']
+    SIMULATION_RACKS = var_dict['simulation_racks']
+    SIMULATION_BUDGET = var_dict['simulation_budget']
+    ENDGAME_BUDGET = var_dict['endgame_budget']
+    MOVE_CACHE_SIZE = var_dict['move_cache_size']
+    TURN_BUDGET = var_dict['turn_budget']
+    if MOVE_CACHE_SIZE:
+        MOVE_CACHE = LRUCache(MOVE_CACHE_SIZE)
+
+    if not var_dict['accounts']:
+        logging.info(f'User id: {USER_ID}')
+        logging.info(f'Password: {PASSWORD}')
 
-                        # Sort list by most smart score
-                        player_optimal_moves.sort(
-                            reverse=True, key=lambda x: x[5])
-                    else:
-                        # Just add points twice to comply with expected format later
-                        player_optimal_moves = [(x, y, horizontal, word, points, points) for (
-                            x, y, horizontal, word, points) in player_most_points_moves]
-
-                    if player_optimal_moves == []:
-                        # If no moves are found
-                        if current_game.tiles_in_bag < 7:
-                            logging.warning(
-                                "No moves available, skipping turn")
-                            wf.skip_turn(current_game.game_id)
-                        else:
-                            logging.warning(
-                                "No moves available, replacing all tiles")
-                            letter_list = current_game.letters
-                            wf.swap_tiles(current_game.game_id, letter_list)
-                    else:
-                        # Count consonants and vocals in hand
-                        vocals_on_hand = [
-                            i for i in current_game.letters if i in vocals]
-                        consonants_on_hand = [
-                            i for i in current_game.letters if i in consonants]
-
-                        # Go through all possible moves until one is accepted by the server (most generated moves are accepted)
-                        for (x, y, horizontal, word, points, smart_points) in player_optimal_moves:
-
-                            # Check if it is reasonable to swap tiles
-                            if points < 20 and smart_points < 20 and len(vocals_on_hand) < 2 and len(consonants_on_hand) < current_game.tiles_in_bag:
-                                # Swap all consonants in order to get more vocals
-                                logging.info(
-                                    f'Swapping {len(consonants_on_hand)} consonants in hand')
-                                wf.swap_tiles(current_game.game_id,
-                                              consonants_on_hand)
-                                break
-                            elif points < 20 and smart_points < 20 and len(consonants_on_hand) < 2 and len(vocals_on_hand) < current_game.tiles_in_bag:
-                                # Swap all vocals in order to get more consonants
-                                logging.info(
-                                    f'Swapping {len(vocals_on_hand)} vocals in hand')
-                                wf.swap_tiles(
-                                    current_game.game_id, vocals_on_hand)
-                                break
-
-                            tile_positions = word_to_tile_position(
-                                (x, y, horizontal, word, points), current_game.tiles)
+    # Load wordlist into memory
+    logging.info("Loading wordlist")
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    (WORDLIST, dsso_id) = load_wordlist(MOVE_GENERATOR)
+    logging.info("Wordlist loaded")
 
-                            try:
-                                # If move was accepted by the server
-                                wf.place_tiles(
-                                    current_game, word, tile_positions)
-                                logging.info(
-                                    f'Placed "{word}" for {points} points')
-                                if points > HIGH_POINTS_THRESHOLD:
-                                    # Send response message to user
-                                    wf.send_chat_message(
-                                        current_game.game_id, random.choice(player_word_high_points_messages))
-                                break
-                            except AssertionError:
-                                # If move was invalid
-                                logging.warning(
-                                    f"An invalid move was made: {word}")
-                        else:
-                            # If no move was accepted by the server
-                            # (same result as if no move was found)
-                            if current_game.tiles_in_bag < 7:
-                                logging.warning(
-                                    "No moves available, skipping turn")
-                                wf.skip_turn(current_game.game_id)
-                            else:
-                                logging.warning(
-                                    "No moves available, replacing all tiles")
-                                letter_list = current_game.letters
-                                wf.swap_tiles(
-                                    current_game.game_id, letter_list)
-
-                # Update timestamp for next iteration
-                if random.randint(0, 1000):
-                    last_check_unix_time = current_unix_time
-                else:
-                    last_check_unix_time = 0
+    if LEAVE_WEIGHT:
+        # Loaded once, the solver processes share the mapped table
+        LEAVES = load_leaves(LEAVE_VALUES)
+        logging.info(f"Leave values loaded: {LEAVES}")
 
-                # Sleep between every iteration
-                time.sleep(PLAYING_SPEED)
-        except requests.exceptions.RequestException:
-            logging.error("Unable to connect to wordfeud server")
-            time.sleep(5)
+    if var_dict['processes'] > 1:
+        try:
+            # The workers map the compiled wordlist instead of loading their own copy
+            MOVE_POOL = LinePool(getattr(WORDLIST, 'wordlist', WORDLIST),
+                                 var_dict['processes'])
+            logging.info(f"Started {MOVE_POOL.processes} move generator processes")
+        except ValueError as e:
+            logging.warning(f"Generating moves in one process: {e}")
+
+    if SIMULATION_RACKS:
+        # The replies are searched by the move generator processes when there are any
+        SIMULATOR = ReplySimulator(WORDLIST, MOVE_POOL.pool if MOVE_POOL else None,
+                                   SIMULATION_RACKS)
+
+    pipeline = None
+    if var_dict['solver_processes'] > 0:
+        pipeline = TurnPipeline(var_dict['solver_processes'])
+        logging.info(f"Started {pipeline.processes} solver processes")
+
+    if var_dict['accounts']:
+        # All accounts share the wordlist, the solver processes and one connection pool
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=var_dict['connection_pool_size'])
+        accounts = read_accounts(var_dict['accounts'], var_dict, adapter)
+        logging.info(f"Playing with {len(accounts)} accounts")
+    else:
+        accounts = [Account(USER_ID, PASSWORD, ACTIVE_GAMES_LIMIT, new_scheduler(var_dict),
+                            var_dict['requests_per_minute'])]
+
+    if len(accounts) == 1:
+        run_account(accounts[0], pipeline, var_dict['concurrent_requests'])
+    else:
+        threads = [threading.Thread(target=run_account, name=f"account-{account.user_id}",
+                                    args=(account, pipeline, var_dict['concurrent_requests']), daemon=True)
+                   for account in accounts]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
         except KeyboardInterrupt:
             logging.critical("Keyboard interuption")
-            break
+
+    if pipeline:
+        pipeline.close()
 
 
 def is_emoji(input_string: str):
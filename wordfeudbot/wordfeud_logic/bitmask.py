@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+
+from .lexicon import Lexicon, compile_graph
+
+
+class BitmaskWordlist(object):
+
+    def __init__(self, wordlist, dominated_blanks=False):
+        '''Generates the same words as Wordlist.anchored_words with an inner loop that works
+        on small integers only: every letter of the alphabet is a bit, cross-checks are
+        bitmasks, the rack is a count per letter and the word graph is walked through the
+        arrays of the compiled lexicon. Extending a word intersects masks and decrements
+        counters instead of slicing the rack and testing set membership.
+        The object can be used instead of the wordlist in Board.calc_all_word_scores
+        Blanks only stand in for letters that are allowed by the cross-check of their
+        square and present below the current node. A blank that is played as a letter that
+        is left unused in the rack gives a move that always scores less than the same move
+        with the real letter, so such moves are skipped, and when a word can be placed with
+        the blanks on different squares only the placement with the most points is kept
+        :param wordlist The Wordlist to take the words from. A wordlist that is not loaded
+                        from a compiled lexicon is compiled in memory
+        :param dominated_blanks True to generate every placement of the blanks like
+                                Wordlist.words does'''
+        self.wordlist = wordlist
+        self.all_chars = wordlist.all_chars
+        self.cross_checks = wordlist.cross_checks
+        self.lexicon = wordlist.lexicon or Lexicon(
+            compile_graph(wordlist.root, wordlist.sources, wordlist.word_count))
+        self.alphabet = self.lexicon.alphabet
+        self.labels = self.lexicon.labels
+        self.full_mask = (1 << len(self.alphabet)) - 1
+        self.dominated_blanks = dominated_blanks
+        self._masks = {}
+        self._left_parts = (None, [])
+
+    def mask(self, chars):
+        '''Returns the bitmask of a set of characters (as returned by get_legal_characters)'''
+        if not isinstance(chars, frozenset):
+            return self._mask(chars)
+        mask = self._masks.get(chars)
+        if mask is None:
+            mask = self._masks[chars] = self._mask(chars)
+        return mask
+
+    def _mask(self, chars):
+        labels = self.labels
+        mask = 0
+        for ch in chars:
+            if ch in labels:
+                mask |= 1 << labels[ch]
+        return mask
+
+    def words(self, row, rowdata, letters, variant, anchors=None):
+        '''Generates the same (position, word) pairs as Wordlist.anchored_words, apart from the
+        blank placements that are skipped unless dominated_blanks is set
+        :param anchors The anchors of the row if they are already known (see Board.update_cross_checks)'''
+        return [(start, word) for (start, word, _) in self._generate(row, rowdata, letters, variant, anchors)]
+
+    # words are always generated from anchors
+    anchored_words = words
+
+    def scored_words(self, row, rowdata, letters, variant, anchors, scoring, letter_points, best=None):
+        '''Generates (position, word, points) with the points of each word (including
+        crossing words and the bingo bonus) added up while the word is extended
+        :param anchors The anchors of the row or None
+        :param scoring (letter multipliers, word multipliers, crossing points) of each square
+                       in the row, see Board.line_scoring
+        :param letter_points The points of each letter
+        :param best If given, the words are passed to best.add instead of being returned
+                    and words that can not score more than best.threshold are skipped
+                    (see board.TopMoves)'''
+        return self._generate(row, rowdata, letters, variant, anchors, scoring, letter_points, best)
+
+    def _generate(self, row, rowdata, letters, variant, anchors, scoring=None, letter_points=None, best=None):
+        assert (len(row) == len(rowdata)), ("%d == %d" %
+                                            (len(row), len(rowdata)))
+        lexicon = self.lexicon
+        labels = self.labels
+        alphabet = self.alphabet
+        upper = alphabet.upper()
+        node_word = lexicon.node_word
+        node_variants = lexicon.node_variants
+        child = lexicon.child
+        n = len(row)
+
+        # -1 for empty squares, -2 for tiles that are not in the alphabet
+        tiles = [-1 if ch == ' ' else labels.get(ch.lower(), -2) for ch in row]
+        masks = [self.mask(chars) for (chars, _) in rowdata]
+        counts = [0] * len(alphabet)
+        blanks = 0
+        for ch in letters:
+            if ch == '*':
+                blanks += 1
+            elif ch in labels:
+                counts[labels[ch]] += 1
+        rack = 0
+        for label, count in enumerate(counts):
+            if count:
+                rack |= 1 << label
+        if scoring is None:
+            (letter_multipliers, word_multipliers, crossing) = ([1] * n, [1] * n, [-1] * n)
+            letter_points = {}
+        else:
+            (letter_multipliers, word_multipliers, crossing) = scoring
+        points = [letter_points.get(ch, 0) for ch in alphabet]
+        tile_points = [letter_points.get(ch, 0) for ch in row]
+        found = []
+        record = found.append if best is None else best.add
+        word = []
+        child_masks = lexicon.child_masks
+        reach_masks = lexicon.reach_masks
+        node_edges = lexicon.node_edges
+        edge_target = lexicon.edge_target
+        edge_label = lexicon.edge_label
+        dominated_blanks = self.dominated_blanks
+        # the best placement of the blanks of each (position, word) with blanks
+        blank_words = {}
+
+        if best is not None:
+            # an upper bound of the points a word can reach from an empty square: the
+            # rack can at most fill the next empty squares with its highest scoring letter,
+            # so for each square and number of tiles the number of squares covered, the sum
+            # of the points of the tiles in between and the letter multipliers, word
+            # multipliers and crossing words of the empty squares are precomputed. The bound
+            # grows with the number of tiles since no multiplier is below 1, so only the
+            # largest number of tiles that fits in the rack and in the longest word below
+            # the current node has to be checked
+            heights = lexicon.heights
+            tile_count = blanks + sum(counts)
+            max_points = max([points[label] for label in range(len(counts)) if counts[label]] or [0])
+            spans = [None] * n
+            for pos in range(n):
+                if tiles[pos] != -1:
+                    continue
+                span = spans[pos] = []
+                existing = letter_sum = crossing_fixed = crossing_letters = 0
+                word_product = 1
+                j = pos
+                while j < n and len(span) < tile_count:
+                    letter_sum += letter_multipliers[j]
+                    word_product *= word_multipliers[j]
+                    if crossing[j] >= 0:
+                        crossing_fixed += crossing[j] * word_multipliers[j]
+                        crossing_letters += letter_multipliers[j] * word_multipliers[j]
+                    j += 1
+                    while j < n and tiles[j] != -1:
+                        existing += tile_points[j]
+                        j += 1
+                    span.append((j - pos, existing, letter_sum, word_product, crossing_fixed, crossing_letters))
+
+            def anchor_bound(anchor, limit):
+                '''An upper bound for words with a left part of up to limit tiles before the anchor'''
+                bound = -1
+                span = spans[anchor]
+                main = cross = used = 0
+                multiplier = 1
+                for left_tiles in range(min(limit, tile_count - 1) + 1):
+                    if left_tiles:
+                        pos = anchor - left_tiles
+                        main += max_points * letter_multipliers[pos]
+                        multiplier *= word_multipliers[pos]
+                        if crossing[pos] >= 0:
+                            cross += (crossing[pos] + max_points * letter_multipliers[pos]) * word_multipliers[pos]
+                    tiles_left = min(tile_count - left_tiles, len(span))
+                    (_, existing, letter_sum, word_product, crossing_fixed, crossing_letters) = span[tiles_left-1]
+                    bound = max(bound, (main + existing + max_points * letter_sum) * multiplier * word_product +
+                                cross + crossing_fixed + max_points * crossing_letters +
+                                (40 if left_tiles + tiles_left >= 7 else 0))
+                return bound
+
+        # the score so far is kept as the points of the placed letters of the main word,
+        # its word multiplier, the points of the crossing words and the number of tiles used
+        def right(anchor, start, pos, node, rack, blanks, blanked, main, multiplier, cross, used):
+            '''Extends word from pos to the right, rack is the mask of letters left and blanked
+            the mask of letters that blanks have been played as'''
+            if blanked & rack & ~reach_masks[node] and not dominated_blanks:
+                # a blank was played as a letter that is left in the rack and can not be used anymore
+                return
+            while pos < n and tiles[pos] != -1:
+                node = child(node, tiles[pos])
+                if node < 0 or not (node_variants[node] & variant):
+                    return
+                word.append(row[pos])
+                main += tile_points[pos]
+                pos += 1
+            if pos > anchor and (node_word[node] & variant) and len(word) > 1:
+                if not blanked or dominated_blanks:
+                    record((start, ''.join(word), main * multiplier + cross + (40 if used >= 7 else 0)))
+                elif not (blanked & rack):
+                    found_word = ''.join(word)
+                    key = (start, found_word.lower())
+                    found_points = main * multiplier + cross + (40 if used >= 7 else 0)
+                    if key not in blank_words or blank_words[key][0] < found_points:
+                        blank_words[key] = (found_points, found_word)
+            if pos == n:
+                return
+            if best is not None:
+                span = spans[pos]
+                height = heights[node]
+                tiles_left = min(tile_count - used, len(span))
+                while tiles_left and span[tiles_left-1][0] > height:
+                    tiles_left -= 1
+                if tiles_left == 0:
+                    return
+                (_, existing, letter_sum, word_product, crossing_fixed, crossing_letters) = span[tiles_left-1]
+                if ((main + existing + max_points * letter_sum) * multiplier * word_product + cross +
+                        crossing_fixed + max_points * crossing_letters +
+                        (40 if used + tiles_left >= 7 else 0)) <= best.threshold:
+                    return
+            # only letters that are below the node and allowed by the cross-check are tried
+            mask = masks[pos] & child_masks[node]
+            if not blanks:
+                mask &= rack
+            letter_multiplier = letter_multipliers[pos]
+            word_multiplier = word_multipliers[pos]
+            crossing_points = crossing[pos]
+            if not mask:
+                return
+            for e in range(node_edges[node], node_edges[node+1]):
+                label = edge_label[e]
+                bit = 1 << label
+                if not mask & bit:
+                    continue
+                target = edge_target[e]
+                if not (node_variants[target] & variant):
+                    continue
+                length = len(word)
+                if counts[label]:
+                    counts[label] -= 1
+                    word.append(alphabet[label])
+                    letter = points[label] * letter_multiplier
+                    right(anchor, start, pos+1, target, rack if counts[label] else rack & ~bit, blanks, blanked,
+                          main + letter, multiplier * word_multiplier,
+                          cross if crossing_points < 0 else cross + (crossing_points + letter) * word_multiplier,
+                          used + 1)
+                    del word[length:]
+                    counts[label] += 1
+                if blanks and (dominated_blanks or not counts[label] or (reach_masks[target] >> label) & 1):
+                    # a blank is only played as a letter that is also in the rack if the real
+                    # letter can still be used further on in the word
+                    word.append(upper[label])
+                    right(anchor, start, pos+1, target, rack, blanks-1, blanked | bit,
+                          main, multiplier * word_multiplier,
+                          cross if crossing_points < 0 else cross + crossing_points * word_multiplier,
+                          used + 1)
+                    del word[length:]
+
+        def left(anchor, limit):
+            '''Places each left part that fits before the anchor and extends it to the right'''
+            anchor_mask = masks[anchor]
+            for (part, node, used_labels, part_rack, part_blanks, blanked) in left_parts:
+                length = len(part)
+                if length > limit:
+                    continue
+                # most parts can not be continued with a letter that fits on the anchor
+                if not (anchor_mask & child_masks[node] & (-1 if part_blanks else part_rack)):
+                    continue
+                start = anchor - length
+                main = cross = 0
+                multiplier = 1
+                for i in range(length):
+                    pos = start + i
+                    if not (masks[pos] >> labels[part[i].lower()]) & 1:
+                        break
+                    letter = points[labels[part[i]]] * letter_multipliers[pos] if part[i] in labels else 0
+                    main += letter
+                    multiplier *= word_multipliers[pos]
+                    if crossing[pos] >= 0:
+                        cross += (crossing[pos] + letter) * word_multipliers[pos]
+                else:
+                    for label in used_labels:
+                        counts[label] -= 1
+                    word[:] = part
+                    right(anchor, start, anchor, node, part_rack, part_blanks, blanked, main, multiplier, cross,
+                          length)
+                    for label in used_labels:
+                        counts[label] += 1
+
+        left_parts = self.left_parts(letters, variant)
+        previous = -1
+        for anchor in (self.anchors(row, rowdata) if anchors is None else anchors):
+            if anchor > 0 and tiles[anchor-1] != -1:
+                start = row.rfind(' ', 0, anchor) + 1
+                node = 0
+                for label in tiles[start:anchor]:
+                    node = child(node, label)
+                    if node < 0 or not (node_variants[node] & variant):
+                        break
+                else:
+                    word[:] = row[start:anchor]
+                    right(anchor, start, anchor, node, rack, blanks, 0,
+                          sum(tile_points[start:anchor]), 1, 0, 0)
+            elif best is None or tile_count and anchor_bound(anchor, anchor-previous-1) > best.threshold:
+                left(anchor, anchor-previous-1)
+            previous = anchor
+        for (start, found_word) in sorted(blank_words):
+            (found_points, found_word) = blank_words[(start, found_word)]
+            record((start, found_word, found_points))
+        return found
+
+    def left_parts(self, letters, variant):
+        '''Returns every start of a word that can be built from the rack while leaving a tile
+        for the anchor, in depth first order, as (part, node, labels of the real letters used,
+        mask of the letters left, blanks left, mask of the letters played as blanks). The
+        squares left of an anchor do not depend on the anchor, so the parts are only built
+        once for each rack and reused for all anchors and lines
+        :param letters The rack
+        :param variant The variant of the wordlist'''
+        if self._left_parts[0] == (letters, variant):
+            return self._left_parts[1]
+        lexicon = self.lexicon
+        labels = self.labels
+        alphabet = self.alphabet
+        upper = alphabet.upper()
+        node_variants = lexicon.node_variants
+        child_masks = lexicon.child_masks
+        reach_masks = lexicon.reach_masks
+        child = lexicon.child
+        dominated_blanks = self.dominated_blanks
+        counts = [0] * len(alphabet)
+        blanks = 0
+        for ch in letters:
+            if ch == '*':
+                blanks += 1
+            elif ch in labels:
+                counts[labels[ch]] += 1
+        rack = 0
+        for label, count in enumerate(counts):
+            if count:
+                rack |= 1 << label
+        parts = []
+        part = []
+        used = []
+
+        def extend(node, limit, rack, blanks, blanked):
+            if blanked & rack & ~reach_masks[node] and not dominated_blanks:
+                # a blank was played as a letter that is left in the rack and can not be used anymore
+                return
+            parts.append((''.join(part), node, tuple(used), rack, blanks, blanked))
+            if limit == 0:
+                return
+            mask = child_masks[node] if blanks else child_masks[node] & rack
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                label = bit.bit_length() - 1
+                target = child(node, label)
+                if not (node_variants[target] & variant):
+                    continue
+                if counts[label]:
+                    counts[label] -= 1
+                    part.append(alphabet[label])
+                    used.append(label)
+                    extend(target, limit-1, rack if counts[label] else rack & ~bit, blanks, blanked)
+                    used.pop()
+                    part.pop()
+                    counts[label] += 1
+                if blanks:
+                    part.append(upper[label])
+                    extend(target, limit-1, rack, blanks-1, blanked | bit)
+                    part.pop()
+
+        extend(0, blanks + sum(counts) - 1, rack, blanks, 0)
+        self._left_parts = ((letters, variant), parts)
+        return parts
+
+    @classmethod
+    def anchors(cls, row, rowdata):
+        n = len(row)
+        return [i for i in range(n) if row[i] == ' ' and (
+            rowdata[i][1] or (i > 0 and row[i-1] != ' ') or (i < n-1 and row[i+1] != ' '))]
+
+    def get_legal_characters(self, word, variant):
+        return self.wordlist.get_legal_characters(word, variant)
+
+    def is_word(self, word, variant=1):
+        return self.wordlist.is_word(word, variant)
+
+    def __repr__(self):
+        return '<BitmaskWordlist: %r>' % self.wordlist
@@ -3,6 +3,13 @@
 # (c) 2011, Marcus Svensson <macke77@gmail.com>
 # See gpl-2.0.txt for license
 
+import copy
+import hashlib
+import heapq
+import random
+import time
+from array import array
+
 
 _default_quarter_board = ['3l -- -- -- 3w -- -- 2l',
                           '-- 2l -- -- -- 3l -- --',
@@ -41,31 +48,155 @@ _letter_points = {'a': 1,
                   'ä': 4,
                   'ö': 4}
 
+# tiles are stored as small ints: 0 is an empty square, letters with points are numbered
+# from 1 and any other character is stored as _other_tile (worth 0 points)
+_tile_letters = ''.join(sorted(_letter_points))
+_tile_codes = {ch: i+1 for i, ch in enumerate(_tile_letters)}
+_other_tile = len(_tile_letters)+1
+_tile_points = array('B', [0] + [_letter_points[ch] for ch in _tile_letters] + [0])
+
+# random 64 bit keys of each tile (but the empty square) on each square, indexed by
+# square*(_other_tile+1)+tile, xored together to hash the tiles of a board (Zobrist hashing).
+# The seed is fixed so that every process hashes a board the same way
+_zobrist_keys = {}
+
+
+def _zobrist(squares):
+    '''Returns the Zobrist keys of a board with squares squares'''
+    keys = _zobrist_keys.get(squares)
+    if keys is None:
+        rnd = random.Random(squares)
+        keys = [0 if i % (_other_tile+1) == 0 else rnd.getrandbits(64) for i in range(squares*(_other_tile+1))]
+        _zobrist_keys[squares] = keys
+    return keys
+
+
+class Layout(object):
+
+    def __init__(self, board):
+        '''The bonus squares of a whole board as flat arrays of letter and word
+        multipliers, indexed by y*size+x. A layout only depends on the board so it
+        can be shared by all games that are played on the same board
+        :param board A list of rows, each a list of squares like '2l', '3w' or '--'
+        '''
+        self.size = len(board)
+        squares = [square for row in board for square in row]
+        self.letter_multipliers = array('B', (int(sq[0]) if sq[1] == 'l' else 1 for sq in squares))
+        self.word_multipliers = array('B', (int(sq[0]) if sq[1] == 'w' else 1 for sq in squares))
+        # the hash of an empty board with this layout
+        self.key = int.from_bytes(hashlib.blake2b(self.letter_multipliers.tobytes() + self.word_multipliers.tobytes(),
+                                                  digest_size=8).digest(), 'little')
+
+    def __eq__(self, other):
+        try:
+            return (self.letter_multipliers == other.letter_multipliers and
+                    self.word_multipliers == other.word_multipliers)
+        except AttributeError:
+            return False
+
+    def __hash__(self):
+        return self.key
+
+    def __repr__(self):
+        return '<Layout: %dx%d>' % (self.size, self.size)
+
+
+class Deadline(object):
+
+    def __init__(self, seconds, clock=time.monotonic):
+        '''A point in time after which a search returns the best it has found so far
+        :param seconds The time from now, None for no limit
+        :param clock Returns the current time in seconds'''
+        self.clock = clock
+        self.at = None if seconds is None else clock() + seconds
+        self.reached = False
+
+    def remaining(self, budget=None):
+        '''Returns the seconds that are left, at most budget, or budget if there is no limit'''
+        if self.at is None:
+            return budget
+        left = max(0.0, self.at - self.clock())
+        return left if budget is None else min(budget, left)
+
+    def passed(self):
+        '''Returns True once the deadline has passed, which is remembered in reached'''
+        if not self.reached and self.at is not None and self.clock() >= self.at:
+            self.reached = True
+        return self.reached
+
+    def __repr__(self):
+        return '<Deadline: %s>' % ('no limit' if self.at is None else '%.1f s left' % self.remaining())
+
+
+class TopMoves(object):
+
+    def __init__(self, num_moves):
+        '''Keeps the num_moves highest scoring moves that are added to it. Moves with the
+        same points are ranked in the order they were added, like heapq.nlargest does
+        :param num_moves The number of moves to keep'''
+        self.num_moves = num_moves
+        self.heap = []
+        self.count = 0
+        # a move has to score more than this to be kept
+        self.threshold = -1
+        # the line that the words that are added are in, as (horizontal, index)
+        self.line = (True, 0)
+
+    def add(self, found):
+        '''Adds a word from a line generator
+        :param found (position in the line, word, points)'''
+        (start, word, points) = found
+        if points <= self.threshold:
+            return
+        (horizontal, i) = self.line
+        move = (start, i, True, word, points) if horizontal else (i, start, False, word, points)
+        self.count += 1
+        if len(self.heap) < self.num_moves:
+            heapq.heappush(self.heap, (points, -self.count, move))
+        else:
+            heapq.heapreplace(self.heap, (points, -self.count, move))
+        if len(self.heap) == self.num_moves:
+            self.threshold = self.heap[0][0]
+
+    def moves(self):
+        '''Returns the moves, best first'''
+        return [move for (_, _, move) in sorted(self.heap, reverse=True)]
+
 
 class Board(object):
 
-    def __init__(self, qboard=_default_quarter_board, expand=True):
+    def __init__(self, qboard=_default_quarter_board, expand=True, layout=None):
         '''Initializes a playing board that keeps track of where
         the bonus squares are.
         :param qboard  A board represented by a list of strings
                        (see _default_quarter_board for an example)
         :param expand  If true qboard will be interpreted as the
                        upper left quarter of a four times larger
-                       board (good for symetrical layouts)'''
+                       board (good for symetrical layouts)
+        :param layout  The Layout of the board if it is already known'''
         self.board = self.expand_quarter_board(qboard) if expand else qboard
         N = len(self.board)
+        self.layout = layout or Layout(self.board)
         self.empty_row = ' '*N
         self.horizontal = [self.empty_row]*N
         self.vertical = [self.empty_row]*N
+        # the tile on each square, indexed by y*N+x
+        self.tiles = array('B', bytes(N*N))
+        # the Zobrist hash of the layout and the tiles, kept up to date by play_word
+        self.zobrist = self.layout.key
+        # cross-checks and anchors for each line, see update_cross_checks
+        self.cross_check_key = None
+        self.rowdata = None
+        self.anchors = None
 
-    # make hashable
+    # make hashable, boards with the same tiles and bonus squares are equal
     def __hash__(self):
-        return self.horizontal.__hash__()
+        return self.zobrist
 
     def __eq__(self, other):
         try:
-            return self.horizontal.__eq__(other.horizontal)
-        except:
+            return self.zobrist == other.zobrist and self.tiles == other.tiles and self.layout == other.layout
+        except AttributeError:
             return False
 
     @classmethod
@@ -83,6 +214,23 @@ class Board(object):
         :param rows a list of strings - one for each row'''
         self.horizontal = rows[:]
         self.vertical = [''.join(r) for r in zip(*rows)]
+        self.tiles = array('B', (0 if ch == ' ' else _tile_codes.get(ch, _other_tile) for row in rows for ch in row))
+        keys = _zobrist(len(self.tiles))
+        self.zobrist = self.layout.key
+        for (i, tile) in enumerate(self.tiles):
+            self.zobrist ^= keys[i*(_other_tile+1)+tile]
+        self.cross_check_key = None
+
+    def copy(self):
+        '''Returns a copy of the board that can be played on without affecting this one'''
+        board = copy.copy(self)
+        board.horizontal = self.horizontal[:]
+        board.vertical = self.vertical[:]
+        board.tiles = array('B', self.tiles)
+        if self.cross_check_key is not None:
+            board.rowdata = {h: [rowdata[:] for rowdata in lines] for h, lines in self.rowdata.items()}
+            board.anchors = {h: lines[:] for h, lines in self.anchors.items()}
+        return board
 
     def is_occupied(self, x, y):
         try:
@@ -91,16 +239,42 @@ class Board(object):
             return False
 
     def play_word(self, word, x, y, horizontal):
-        '''Modifies the board by writing a word to it
+        '''Modifies the board by writing a word to it. Only the rows and columns that
+        the word changes are updated, along with their cross-checks and anchors
         :param x The x coordinate that the word starts at
         :param y The y coordinate that the word starts at
         :param horizontal True if the word is horizontal, False if it is vertical'''
         (dx, dy) = (1,0) if horizontal else (0,1)
+        columns = set()
+        rows = set()
+        N = len(self.horizontal)
+        keys = _zobrist(N*N)
         for ch in word.lower():
-            self.horizontal[y] = self.horizontal[y][:x] + ch + self.horizontal[y][x+1:]
+            if self.horizontal[y][x] != ch:
+                self.horizontal[y] = self.horizontal[y][:x] + ch + self.horizontal[y][x+1:]
+                self.vertical[x] = self.vertical[x][:y] + ch + self.vertical[x][y+1:]
+                i = y*N+x
+                tile = 0 if ch == ' ' else _tile_codes.get(ch, _other_tile)
+                self.zobrist ^= keys[i*(_other_tile+1)+self.tiles[i]] ^ keys[i*(_other_tile+1)+tile]
+                self.tiles[i] = tile
+                columns.add(x)
+                rows.add(y)
             x += dx
             y += dy
-        self.set_state(self.horizontal)
+        if self.cross_check_key is not None:
+            wordlist, variant = self.cross_check_key
+            # the cross-checks of a square depend on the crossing line only, so
+            # a changed column changes one square in every row and vice versa
+            changed = {True: set(rows), False: set(columns)}
+            for (h, lines, squares) in ((True, self.horizontal, columns), (False, self.vertical, rows)):
+                for i in range(len(lines)):
+                    for j in squares:
+                        rowdata = self.square_rowdata(h, i, j, wordlist, variant)
+                        if rowdata != self.rowdata[h][i][j]:
+                            self.rowdata[h][i][j] = rowdata
+                            changed[h].add(i)
+                for i in changed[h]:
+                    self.anchors[h][i] = wordlist.anchors(lines[i], self.rowdata[h][i])
 
     @classmethod
     def start_end(cls, row, i):
@@ -122,6 +296,28 @@ class Board(object):
             (start, end) = self.start_end(row, i)
             yield row[start:end].lower()
 
+    def square_rowdata(self, horizontal, i, j, wordlist, variant):
+        '''Returns (legal characters, connected) for the j'th square of the i'th row'''
+        row = (self.vertical if horizontal else self.horizontal)[j]
+        (start, end) = self.start_end(row, i)
+        surrounding = row[start:end].lower()
+        return (wordlist.get_legal_characters(surrounding, variant),
+                surrounding != ' ' or (i == 7 and j == 7))
+
+    def update_cross_checks(self, wordlist, variant):
+        '''Calculates the cross-checks (legal characters and whether a square is connected)
+        and the anchors of every line, unless they are already known. play_word keeps
+        them up to date'''
+        if self.cross_check_key == (wordlist, variant):
+            return
+        self.rowdata = {}
+        self.anchors = {}
+        for (h, lines) in ((True, self.horizontal), (False, self.vertical)):
+            self.rowdata[h] = [[self.square_rowdata(h, i, j, wordlist, variant) for j in range(len(row))]
+                               for (i, row) in enumerate(lines)]
+            self.anchors[h] = [wordlist.anchors(row, rowdata) for (row, rowdata) in zip(lines, self.rowdata[h])]
+        self.cross_check_key = (wordlist, variant)
+
     def calc_word_points(self, word, x0, y0, horizontal, include_crossing_words=True):
         '''Calculates the score of a word that has not yet been played to the board
         :param word The word
@@ -129,33 +325,32 @@ class Board(object):
         :param y0 The y coordinate where the first letter of the word will be played (or already is)
         :param horizontal True if is a horizontal word, False if vertical
         :param include_crossing_words True if the points for crossing words should be included too'''
+        N = len(self.horizontal)
+        tiles = self.tiles
+        letter_multipliers = self.layout.letter_multipliers
+        word_multipliers = self.layout.word_multipliers
         word_multiplicator = 1
         word_points = 0
         tiles_used = 0
         total_points = 0
-        (x, y) = (x0, y0)
-        (dx, dy) = (1,0) if horizontal else (0,1)
-        for i, ch in enumerate(word):
+        # squares are visited by index, step moves along the word and cross_step along
+        # the crossing words, which start at cross_pos in their line
+        i = y0*N + x0
+        (step, cross_step, cross_pos) = (1, N, y0) if horizontal else (N, 1, x0)
+        for ch in word:
             letter_points = _letter_points.get(ch, 0)
-            if self.horizontal[y][x] == ' ':
+            if not tiles[i]:
                 tiles_used += 1
-                square_bonus = self.board[y][x]
-                if square_bonus[1] == 'l':
-                    letter_points *= int(square_bonus[0])
-                elif square_bonus[1] == 'w':
-                    word_multiplicator *= int(square_bonus[0])
+                letter_points *= letter_multipliers[i]
+                word_multiplicator *= word_multipliers[i]
 
                 if include_crossing_words:
-                    crow, ci = (self.vertical[x], y) if horizontal else (self.horizontal[y], x)
-                    s, e = self.start_end(crow, ci)
-                    if e-s > 1:
-                        (cx, cy) = (x, s) if horizontal else (s, y)
-                        cword = crow[s:e].replace(' ', ch)
-                        total_points += self.calc_word_points(cword, cx, cy, not horizontal, False)
+                    crossing_points = self.crossing_points(i, cross_step, cross_pos)
+                    if crossing_points >= 0:
+                        total_points += (crossing_points + letter_points) * word_multipliers[i]
 
             word_points += letter_points
-            x += dx
-            y += dy
+            i += step
 
         total_points += word_points * word_multiplicator
 
@@ -164,27 +359,193 @@ class Board(object):
 
         return total_points
 
-    def calc_all_word_scores(self, letters, wordlist, variant=1):
+    def crossing_points(self, i, cross_step, cross_pos):
+        '''Returns the points of the tiles of the crossing word through an empty square,
+        or -1 if there are no tiles next to it in the crossing direction
+        :param i The index of the square
+        :param cross_step The distance between the indices of two squares in the crossing word
+        :param cross_pos The position of the square in the crossing line'''
+        N = len(self.horizontal)
+        tiles = self.tiles
+        points = 0
+        crossing = False
+        (j, k) = (i - cross_step, cross_pos - 1)
+        while k >= 0 and tiles[j]:
+            crossing = True
+            points += _tile_points[tiles[j]]
+            (j, k) = (j - cross_step, k - 1)
+        (j, k) = (i + cross_step, cross_pos + 1)
+        while k < N and tiles[j]:
+            crossing = True
+            points += _tile_points[tiles[j]]
+            (j, k) = (j + cross_step, k + 1)
+        return points if crossing else -1
+
+    def line_scoring(self, horizontal, i):
+        '''Returns (letter multipliers, word multipliers, crossing points) of each square
+        in the i'th row (or column), used to score words while they are generated'''
+        N = len(self.horizontal)
+        (first, step, cross_step) = (i*N, 1, N) if horizontal else (i, N, 1)
+        squares = range(first, first + N*step, step)
+        letter_multipliers = self.layout.letter_multipliers
+        word_multipliers = self.layout.word_multipliers
+        return ([letter_multipliers[j] for j in squares],
+                [word_multipliers[j] for j in squares],
+                [self.crossing_points(j, cross_step, i) if not self.tiles[j] else -1 for j in squares])
+
+    def calc_all_word_scores(self, letters, wordlist, variant=1, anchored=False):
         '''Calculates the score for each possible word and returns them as a list
         where each element is on the form (x, y, horizontal, word, score)
         :param letters The letters that can be used to form a word, * for wildcard
-        :param wordlist The wordlist of legal words as a wordsolver.wordlist.Wordlist object'''
+        :param wordlist The wordlist of legal words as a wordsolver.wordlist.Wordlist object
+        :param anchored True to generate words from anchor squares (Wordlist.anchored_words)
+                        instead of from every position (Wordlist.words). Both give the same result.
+                        Wordlists that score the words themselves (scored_words) always use anchors'''
+        self.update_cross_checks(wordlist, variant)
+        scored_words = getattr(wordlist, 'scored_words', None)
+        if scored_words:
+            # the wordlist adds up the points while it generates the words
+            for (i, row) in enumerate(self.horizontal):
+                yield from ((x, i, True, word, points) for (x, word, points) in
+                            scored_words(row, self.rowdata[True][i], letters, variant, self.anchors[True][i],
+                                         self.line_scoring(True, i), _letter_points))
+            for (i, row) in enumerate(self.vertical):
+                yield from ((i, y, False, word, points) for (y, word, points) in
+                            scored_words(row, self.rowdata[False][i], letters, variant, self.anchors[False][i],
+                                         self.line_scoring(False, i), _letter_points))
+            return
         for (i, row) in enumerate(self.horizontal):
-            sw = list(self.surrounding_words(True, i))
-            chars = [wordlist.get_legal_characters(surrounding, variant) for surrounding in sw]
-            connected = [surrounding != ' ' for surrounding in sw]
-            if i == 7:
-                connected[7] = True
+            rowdata = self.rowdata[True][i]
+            words = (wordlist.anchored_words(row, rowdata, letters, variant, self.anchors[True][i]) if anchored
+                     else wordlist.words(row, rowdata, letters, variant))
             yield from ((x, i, True, word, self.calc_word_points(word, x, i, True)) for
-                        (x, word) in wordlist.words(row, list(zip(chars, connected)), letters, variant))
+                        (x, word) in words)
         for (i, row) in enumerate(self.vertical):
-            sw = list(self.surrounding_words(False, i))
-            chars = [wordlist.get_legal_characters(surrounding, variant) for surrounding in sw]
-            connected = [surrounding != ' ' for surrounding in sw]
-            if i == 7:
-                connected[7] = True
+            rowdata = self.rowdata[False][i]
+            words = (wordlist.anchored_words(row, rowdata, letters, variant, self.anchors[False][i]) if anchored
+                     else wordlist.words(row, rowdata, letters, variant))
             yield from ((i, y, False, word, self.calc_word_points(word, i, y, False)) for
-                        (y, word) in wordlist.words(row, list(zip(chars, connected)), letters, variant))
+                        (y, word) in words)
+
+    def calc_best_word_scores(self, letters, wordlist, variant=1, num_moves=10, anchored=False, deadline=None):
+        '''Returns the num_moves highest scoring moves, best first, on the same form as
+        calc_all_word_scores. Wordlists that score the words themselves (scored_words)
+        skip every word that can not beat the moves found so far, others generate all
+        words
+        :param letters The letters that can be used to form a word, * for wildcard
+        :param wordlist The wordlist of legal words as a wordsolver.wordlist.Wordlist object
+        :param num_moves The number of moves to return
+        :param deadline A Deadline. The most promising lines (see line_promise) are generated
+                        first and the best moves found so far are returned when it has
+                        passed, after at least one line. Moves with the same points may be
+                        ranked in another order'''
+        scored_words = getattr(wordlist, 'scored_words', None)
+        if num_moves <= 0 or (not scored_words and deadline is None):
+            return heapq.nlargest(num_moves, self.calc_all_word_scores(letters, wordlist, variant, anchored),
+                                  lambda move: move[4])
+        self.update_cross_checks(wordlist, variant)
+        lines = [(horizontal, i) for horizontal in (True, False) for i in range(len(self.horizontal))]
+        if deadline is not None:
+            lines.sort(key=lambda line: -self.line_promise(*line))
+        best = TopMoves(num_moves)
+        for (n, (horizontal, i)) in enumerate(lines):
+            # the most promising line is always generated, so there is a move to play
+            if n and deadline is not None and deadline.passed():
+                break
+            best.line = (horizontal, i)
+            row = (self.horizontal if horizontal else self.vertical)[i]
+            rowdata = self.rowdata[horizontal][i]
+            if scored_words:
+                scored_words(row, rowdata, letters, variant, self.anchors[horizontal][i],
+                             self.line_scoring(horizontal, i), _letter_points, best)
+                continue
+            words = (wordlist.anchored_words(row, rowdata, letters, variant, self.anchors[horizontal][i])
+                     if anchored else wordlist.words(row, rowdata, letters, variant))
+            for (start, word) in words:
+                (x, y) = (start, i) if horizontal else (i, start)
+                best.add((start, word, self.calc_word_points(word, x, y, horizontal)))
+        return best.moves()
+
+    def line_promise(self, horizontal, i):
+        '''A rough measure of the points that the words of the i'th row (or column) can
+        make: the multipliers and crossing points of its anchor squares'''
+        anchors = self.anchors[horizontal][i]
+        if not anchors:
+            return 0
+        (letter_multipliers, word_multipliers, crossing_points) = self.line_scoring(horizontal, i)
+        return sum((letter_multipliers[j] + max(crossing_points[j], 0)) * word_multipliers[j] for j in anchors)
 
     def __repr__(self):
         return '\n'.join(row.replace(' ', '·') for row in self.horizontal)
+
+
+class LineMoves(object):
+
+    def __init__(self, board, letters, wordlist, variant=1, num_moves=10, anchored=False, base=None):
+        '''The num_moves highest scoring moves of each row and column of a board, kept per
+        line so that the moves after a move can be generated from them (see after). A
+        line only depends on its tiles, cross-checks, anchors and scoring, so a line where
+        these are the same as in base reuses the moves of base instead of generating them
+        :param board The Board, the moves are generated for its current state
+        :param letters The letters that can be used to form a word, * for wildcard
+        :param wordlist The wordlist of legal words, see Board.calc_best_word_scores
+        :param num_moves The number of moves of each line and of moves()
+        :param anchored See Board.calc_all_word_scores
+        :param base The LineMoves of another board with the same letters'''
+        board.update_cross_checks(wordlist, variant)
+        self.board = board
+        self.letters = letters
+        self.wordlist = wordlist
+        self.variant = variant
+        self.num_moves = num_moves
+        self.anchored = anchored
+        # (horizontal, i) -> (row, rowdata, anchors, scoring, moves)
+        self.lines = {}
+        self.generated = 0
+        for horizontal in (True, False):
+            for (i, row) in enumerate(board.horizontal if horizontal else board.vertical):
+                line = (row, list(board.rowdata[horizontal][i]), list(board.anchors[horizontal][i]),
+                        board.line_scoring(horizontal, i))
+                known = base.lines[(horizontal, i)] if base else None
+                if known and known[:4] == line:
+                    self.lines[(horizontal, i)] = known
+                else:
+                    self.lines[(horizontal, i)] = line + (self._generate(horizontal, i, line),)
+                    self.generated += 1
+
+    def _generate(self, horizontal, i, line):
+        '''The best moves of a line, in the order of Board.calc_best_word_scores'''
+        (row, rowdata, anchors, scoring) = line
+        if not anchors:
+            return []
+        scored_words = getattr(self.wordlist, 'scored_words', None)
+        if scored_words:
+            best = TopMoves(self.num_moves)
+            best.line = (horizontal, i)
+            scored_words(row, rowdata, self.letters, self.variant, anchors, scoring, _letter_points, best)
+            return best.moves()
+        words = (self.wordlist.anchored_words(row, rowdata, self.letters, self.variant, anchors) if self.anchored
+                 else self.wordlist.words(row, rowdata, self.letters, self.variant))
+        if horizontal:
+            moves = ((x, i, True, word, self.board.calc_word_points(word, x, i, True)) for (x, word) in words)
+        else:
+            moves = ((i, y, False, word, self.board.calc_word_points(word, i, y, False)) for (y, word) in words)
+        return heapq.nlargest(self.num_moves, moves, lambda move: move[4])
+
+    def moves(self):
+        '''Returns the num_moves highest scoring moves of the board, the same moves as
+        Board.calc_best_word_scores'''
+        return heapq.nlargest(self.num_moves, (move for line in self.lines.values() for move in line[4]),
+                              lambda move: move[4])
+
+    def after(self, move):
+        '''Returns the LineMoves of a copy of the board with a move played on it. Only the
+        lines that the move changes are generated again
+        :param move (x, y, horizontal, word, points)'''
+        (x, y, horizontal, word, _) = move
+        board = self.board.copy()
+        board.play_word(word, x, y, horizontal)
+        return LineMoves(board, self.letters, self.wordlist, self.variant, self.num_moves, self.anchored, self)
+
+    def __repr__(self):
+        return '<LineMoves: %d lines generated, %d reused>' % (self.generated, len(self.lines) - self.generated)
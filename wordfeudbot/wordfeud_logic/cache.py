@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+
+    def __init__(self, maxsize=10000):
+        '''A dictionary that keeps at most maxsize entries, dropping the least recently
+        used ones first, and counts hits and misses
+        :param maxsize The maximum number of entries'''
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return '<LRUCache: %d/%d entries, %d hits, %d misses (%.1f%% hit rate)>' % (
+            len(self.data), self.maxsize, self.hits, self.misses, 100 * self.hit_rate)
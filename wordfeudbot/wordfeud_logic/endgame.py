@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+'''A search of the end game, when the bag is empty and the opponents rack is known to be
+the tiles that have not been seen.
+
+The search is a negamax alpha-beta search over the moves of both racks that is deepened
+one move at a time until the game is searched to its end or the time budget runs out.
+The value of a position is the spread (own points minus the opponents) that the player
+to move can still make from it, so positions that are reached through different moves
+share their entries in the transposition table, which is keyed by the Zobrist hash of
+the board and the racks. The moves of a position are the width best scoring ones from the top-K search
+plus passing, tried best first after the best move of the previous iteration.
+
+The game ends when a player has played all tiles, who then gets the points of the tiles
+that are left on the other rack while the other player loses them, or when both players
+have passed in a row, which costs each player the points of its own tiles.'''
+
+import time
+
+from .board import _letter_points
+
+
+class OutOfTime(Exception):
+    pass
+
+
+def rack_points(rack):
+    '''The points of the tiles on a rack, blanks are worth nothing'''
+    return sum(_letter_points.get(ch, 0) for ch in rack)
+
+
+def placed_tiles(board, move):
+    '''Returns the tiles of a rack that a move uses, '*' for blanks
+    :param board The Board the move is played on
+    :param move (x, y, horizontal, word, points)'''
+    (x, y, horizontal, word, _) = move
+    (dx, dy) = (1, 0) if horizontal else (0, 1)
+    used = []
+    for ch in word:
+        if board.horizontal[y][x] == ' ':
+            used.append('*' if ch.isupper() else ch)
+        (x, y) = (x + dx, y + dy)
+    return used
+
+
+def remove_tiles(rack, used):
+    '''Returns the rack without the used tiles, as a sorted string'''
+    rack = list(rack)
+    for ch in used:
+        rack.remove(ch)
+    return ''.join(sorted(rack))
+
+
+class EndgameSolver(object):
+
+    def __init__(self, wordlist, variant=1, width=12, max_entries=1000000):
+        '''Searches the end game with a move generator
+        :param wordlist The move generator, see Board.calc_best_word_scores
+        :param variant The variant of the wordlist
+        :param width The number of moves of each position that are searched, best scoring
+                     first. Moves that score less are left out, so the search is only
+                     exact if no position has more moves than this
+        :param max_entries The size of the transposition table, it is cleared when full'''
+        self.wordlist = wordlist
+        self.variant = variant
+        self.width = width
+        self.max_entries = max_entries
+        self.table = {}
+        self.moves = {}
+        self.nodes = 0
+        self.depth = 0
+        self.exact = False
+        self.deadline = None
+
+    def solve(self, board, rack, opponent_rack, budget=None):
+        '''Returns the moves of the player to move ranked by the spread they lead to, as
+        (x, y, horizontal, word, points, spread). The first move is the best one that was
+        found, its spread is exact if the search reached the end of the game (see
+        self.exact) and the spreads of the other moves are at most what they can make.
+        Passing is not returned, the player passes if there are no moves
+        :param board The Board, it is played on during the search and restored
+        :param rack The tiles of the player to move, '*' is a blank
+        :param opponent_rack The tiles of the opponent
+        :param budget The number of seconds the search may take, defaults to no limit;
+                      the result of the deepest finished iteration is returned'''
+        self.deadline = None if budget is None else time.monotonic() + budget
+        self.table.clear()
+        self.moves.clear()
+        self.nodes = 0
+        rack = ''.join(sorted(rack))
+        opponent_rack = ''.join(sorted(opponent_rack))
+        root_moves = self.generate(board, rack)
+        ranked = [move + (move[4],) for move in root_moves]
+        self.depth = 0
+        self.exact = False
+        if not root_moves:
+            return ranked
+        # every move that is not a pass plays a tile and a player passes at most once in a row
+        for depth in range(1, 2 * (len(rack) + len(opponent_rack)) + 2):
+            self.cutoff = False
+            try:
+                ranked = self.search_root(board, rack, opponent_rack, root_moves, depth)
+            except OutOfTime:
+                break
+            self.depth = depth
+            # the best move first in the next iteration
+            root_moves = [move[:5] for move in ranked]
+            if not self.cutoff:
+                self.exact = True
+                break
+        return ranked
+
+    def search_root(self, board, rack, opponent_rack, moves, depth):
+        best = -1 << 30
+        ranked = []
+        for move in moves:
+            # the moves after the best one are only searched to see that they are worse
+            value = self.play(board, rack, opponent_rack, move, 0, depth, best, 1 << 30)
+            ranked.append(move + (value,))
+            best = max(best, value)
+        ranked.sort(key=lambda move: -move[5])
+        return ranked
+
+    def generate(self, board, rack):
+        '''The width best scoring moves of a rack on the board, best first'''
+        key = (board.zobrist, rack)
+        moves = self.moves.get(key)
+        if moves is None:
+            moves = board.calc_best_word_scores(rack, self.wordlist, self.variant, self.width, anchored=True)
+            self.moves[key] = moves
+        return moves
+
+    def play(self, board, rack, opponent_rack, move, passes, depth, alpha, beta):
+        '''Returns the spread of playing a move (None to pass) and searching on, for the
+        player that plays it'''
+        if move is None:
+            if passes + 1 >= 2:
+                return rack_points(opponent_rack) - rack_points(rack)
+            return -self.negamax(board, opponent_rack, rack, passes + 1, depth - 1, -beta, -alpha)
+        used = placed_tiles(board, move)
+        left = remove_tiles(rack, used)
+        if not left:
+            return move[4] + 2 * rack_points(opponent_rack)
+        (x, y, horizontal, word, points) = move
+        # writing the squares back as they were takes the tiles of the move off again
+        undo = self.squares(board, x, y, horizontal, len(word))
+        board.play_word(word, x, y, horizontal)
+        try:
+            return points - self.negamax(board, opponent_rack, left, 0, depth - 1, points - beta, points - alpha)
+        finally:
+            board.play_word(undo, x, y, horizontal)
+
+    @staticmethod
+    def squares(board, x, y, horizontal, length):
+        '''The characters of the squares a word of length covers'''
+        if horizontal:
+            return board.horizontal[y][x:x+length]
+        return board.vertical[x][y:y+length]
+
+    def negamax(self, board, rack, opponent_rack, passes, depth, alpha, beta):
+        '''Returns the spread that the player with rack can make from this position, or a
+        bound of it outside of alpha..beta'''
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 63 and time.monotonic() > self.deadline:
+            raise OutOfTime()
+        if depth <= 0:
+            # the game goes on but is not searched further
+            self.cutoff = True
+            return 0
+        key = (board.zobrist, rack, opponent_rack, passes)
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            (entry_depth, value, bound, best_move) = entry
+            if entry_depth >= depth and (bound == 0 or (bound < 0 and value <= alpha) or
+                                         (bound > 0 and value >= beta)):
+                return value
+        moves = self.generate(board, rack)
+        if best_move is not None and best_move in moves:
+            moves = [best_move] + [move for move in moves if move != best_move]
+        original_alpha = alpha
+        best = -1 << 30
+        for move in moves + [None]:
+            value = self.play(board, rack, opponent_rack, move, passes, depth, alpha, beta)
+            if value > best:
+                (best, best_move) = (value, move)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        # an upper bound if no move beat alpha, a lower bound if the search was cut off
+        bound = -1 if best <= original_alpha else 1 if best >= beta else 0
+        self.table[key] = (depth, best, bound, best_move)
+        return best
+
+    def __repr__(self):
+        return '<EndgameSolver: %d nodes, depth %d%s>' % (self.nodes, self.depth, ', exact' if self.exact else '')
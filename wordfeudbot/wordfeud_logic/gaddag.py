@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from .lexicon import Lexicon, compile_graph, write_atomic
+from .wordlist import build_dawg
+
+log = logging.getLogger('gaddag')
+
+SEPARATOR = '+'
+
+
+class Gaddag(object):
+
+    def __init__(self, wordlist, path=None):
+        '''Builds a GADDAG from the words of a wordlist. Every word is stored once for each
+        split point as the reversed prefix, a separator and the suffix (eg. "ste" is stored as
+        "s+te", "ts+e" and "ets+") which makes it possible to grow words in both directions
+        from a square. Suffixes are shared like in the wordlist DAWG and the graph is kept in
+        the compiled lexicon format since it is several times larger than the wordlist.
+        The object can be used instead of the wordlist in Board.calc_all_word_scores
+        :param wordlist The Wordlist to take the words from
+        :param path If given, the compiled GADDAG is loaded from (or saved to) this file'''
+        self.wordlist = wordlist
+        self.all_chars = wordlist.all_chars
+        self.cross_checks = wordlist.cross_checks
+        self.lexicon = self._load(path, wordlist) if path else None
+        if self.lexicon is None:
+            log.info('Building GADDAG')
+            data = compile_graph(build_dawg(self._paths(wordlist)), wordlist.sources, wordlist.word_count)
+            self.lexicon = Lexicon(data)
+            if path:
+                try:
+                    write_atomic(path, data)
+                except OSError as e:
+                    log.warning('Unable to write %s: %s', path, e)
+        self.separator = self.lexicon.labels.get(SEPARATOR, -1)
+
+    @classmethod
+    def _load(cls, path, wordlist):
+        try:
+            lexicon = Lexicon.load(path)
+        except (OSError, ValueError) as e:
+            log.info('Unable to load %s: %s', path, e)
+            return None
+        if [source['sha1'] for source in lexicon.sources] != [source['sha1'] for source in wordlist.sources]:
+            log.info('%s is stale', path)
+            return None
+        return lexicon
+
+    @classmethod
+    def _paths(cls, wordlist):
+        '''Yields the GADDAG paths of all words in sorted order. The paths are sorted one
+        first letter at a time to keep the memory needed for sorting down'''
+        words = list(wordlist.iter_words())
+        for first in sorted(wordlist.all_chars):
+            paths = []
+            for word, variants in words:
+                i = word.find(first)
+                while i != -1:
+                    paths.append((word[i::-1] + SEPARATOR + word[i+1:], variants))
+                    i = word.find(first, i+1)
+            paths.sort()
+            yield from paths
+
+    def words(self, row, rowdata, letters, variant, anchors=None):
+        '''Generates the same (position, word) pairs as Wordlist.words, but only grows words
+        outwards from anchor squares (empty squares next to a tile or marked as connected)
+        :param anchors The anchors of the row if they are already known (see Board.update_cross_checks)'''
+        assert (len(row) == len(rowdata)), ("%d == %d" %
+                                            (len(row), len(rowdata)))
+        anchors = self.anchors(row, rowdata) if anchors is None else set(anchors)
+        for anchor in sorted(anchors):
+            yield from self._left(row, rowdata, anchors, anchor, anchor, 0, letters, variant, '')
+
+    # words are always generated from anchors
+    anchored_words = words
+
+    @classmethod
+    def anchors(cls, row, rowdata):
+        n = len(row)
+        return set(i for i in range(n) if row[i] == ' ' and (
+            rowdata[i][1] or (i > 0 and row[i-1] != ' ') or (i < n-1 and row[i+1] != ' ')))
+
+    def _left(self, row, rowdata, anchors, anchor, pos, node, letters, variant, word):
+        '''Places (or follows) a letter at pos and then either continues to the left or
+        turns around and continues to the right of the anchor'''
+        for ch, child, next_letters in self._steps(row, rowdata, pos, node, letters, variant):
+            next_word = ch + word
+            if pos > 0 and (row[pos-1] != ' ' or pos-1 not in anchors):
+                yield from self._left(row, rowdata, anchors, anchor, pos-1, child, next_letters, variant, next_word)
+            if pos == 0 or row[pos-1] == ' ':
+                child = self.lexicon.child(child, self.separator)
+                if child >= 0 and (self.lexicon.node_variants[child] & variant):
+                    if self._ends(row, anchor+1, child, variant, next_word):
+                        yield (pos, next_word)
+                    yield from self._right(row, rowdata, pos, anchor+1, child, next_letters, variant, next_word)
+
+    def _right(self, row, rowdata, start, pos, node, letters, variant, word):
+        if pos >= len(row):
+            return
+        for ch, child, next_letters in self._steps(row, rowdata, pos, node, letters, variant):
+            next_word = word + ch
+            if self._ends(row, pos+1, child, variant, next_word):
+                yield (start, next_word)
+            yield from self._right(row, rowdata, start, pos+1, child, next_letters, variant, next_word)
+
+    def _ends(self, row, pos, node, variant, word):
+        return (pos >= len(row) or row[pos] == ' ') and (self.lexicon.node_word[node] & variant) and len(word) > 1
+
+    def _steps(self, row, rowdata, pos, node, letters, variant):
+        '''Yields (letter, child node, remaining letters) for each way to fill pos'''
+        lexicon = self.lexicon
+        if row[pos] != ' ':
+            child = lexicon.child(node, lexicon.labels.get(row[pos].lower(), -1))
+            if child >= 0 and (lexicon.node_variants[child] & variant):
+                yield (row[pos], child, letters)
+            return
+        valid_chars = rowdata[pos][0]
+        for i, ch in enumerate(letters):
+            if not ch in valid_chars and ch != '*':
+                continue
+            if letters.find(ch, 0, i) != -1:
+                continue
+            next_letters = letters[:i] + letters[i+1:]
+            if ch == '*':
+                for e in range(lexicon.node_edges[node], lexicon.node_edges[node+1]):
+                    wc = lexicon.alphabet[lexicon.edge_label[e]]
+                    child = lexicon.edge_target[e]
+                    if wc in valid_chars and wc != SEPARATOR and (lexicon.node_variants[child] & variant):
+                        yield (wc.upper(), child, next_letters)
+                continue
+            child = lexicon.child(node, lexicon.labels.get(ch, -1))
+            if child >= 0 and (lexicon.node_variants[child] & variant):
+                yield (ch, child, next_letters)
+
+    def get_legal_characters(self, word, variant):
+        return self.wordlist.get_legal_characters(word, variant)
+
+    def is_word(self, word, variant=1):
+        return self.wordlist.is_word(word, variant)
+
+    def __repr__(self):
+        return '<Gaddag: %r, %r>' % (self.lexicon, self.wordlist)
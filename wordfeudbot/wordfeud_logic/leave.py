@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+'''A table with the value of every rack leave, the tiles that are left on the rack after
+a move, so that moves can be ranked by their points plus the value of what they leave.
+
+Every multiset of up to MAX_LEAVE tiles has a fixed index (the combinatorial number
+system), so a lookup is a few additions in a binomial table and one array access. The
+table is stored in a flat binary format that is memory mapped read-only, like the lexicon.
+
+Layout (native byte order, which is recorded in the metadata):
+    magic        8 bytes
+    header       4 x uint32: metadata length, entry count, max leave, reserved
+    metadata     utf-8 json (tiles, scale, sources ...), padded to 4 bytes
+    values       int16[entries]     value of each leave times scale
+
+Build a table with: python -m wordfeudbot.wordfeud_logic.leave [-v VALUES] -o OUTPUT
+VALUES is an optional file with a leave and its value on each line, for example measured
+in self-play; the leaves it does not contain get the value of heuristic_value.'''
+
+import argparse
+import array
+import itertools
+import json
+import logging
+import mmap
+import struct
+import sys
+from collections import Counter
+
+from .board import _letter_points
+from .lexicon import _padded, write_atomic
+
+log = logging.getLogger('leave')
+
+MAGIC = b'WFLEAVE\x01'
+_header = struct.Struct('<4I')
+
+MAX_LEAVE = 6
+# the tiles of the swedish tile set, '*' is a blank
+TILES = ''.join(sorted(_letter_points)) + '*'
+VOWELS = frozenset('aeiouyåäö')
+# values are stored as int16 hundredths of a point
+SCALE = 100
+
+
+def _binomials(n, k):
+    '''Returns table[i][c] = c over i for i <= k and c <= n + k'''
+    table = [[0] * (n + k + 1) for _ in range(k + 1)]
+    for c in range(n + k + 1):
+        table[0][c] = 1
+        for i in range(1, min(c, k) + 1):
+            table[i][c] = table[i-1][c-1] + (table[i][c-1] if i < c else 0)
+    return table
+
+
+class LeaveIndex(object):
+
+    def __init__(self, tiles=TILES, max_leave=MAX_LEAVE):
+        '''Numbers the multisets of up to max_leave tiles from 0 to size-1, the empty leave
+        first and the leaves with fewer tiles before the ones with more
+        :param tiles The different tiles, as characters
+        :param max_leave The largest number of tiles in a leave'''
+        self.tiles = tiles
+        self.max_leave = max_leave
+        self.codes = {ch: i for i, ch in enumerate(tiles)}
+        n = len(tiles)
+        # a sorted leave t0 <= t1 <= ... is the combination t0 < t1+1 < t2+2 < ... of
+        # n+k-1 elements, which is ranked by the sum of (ti+i) over (i+1)
+        self.binomials = _binomials(n, max_leave)
+        self.offsets = [self.binomials[k-1][n+k-1] if k else 0 for k in range(max_leave + 2)]
+        self.size = self.offsets[max_leave + 1]
+
+    def index(self, leave):
+        '''Returns the index of a leave
+        :param leave The tiles as a string or list of characters, in any order'''
+        if len(leave) > self.max_leave:
+            raise ValueError('A leave has at most %d tiles' % self.max_leave)
+        codes = sorted(self.codes[ch] for ch in leave)
+        binomials = self.binomials
+        i = self.offsets[len(codes)]
+        for (k, code) in enumerate(codes):
+            i += binomials[k+1][code+k]
+        return i
+
+    def leaves(self):
+        '''Yields (index, leave) for every leave in reverse index order of each size,
+        leaves are sorted strings'''
+        # the index orders leaves by their last tile, then the one before it ..., which is
+        # the lexicographic order of the reversed leaves in the reversed tile order, reversed
+        reversed_tiles = self.tiles[::-1]
+        for k in range(self.max_leave + 1):
+            last = self.offsets[k+1] - 1
+            for (j, leave) in enumerate(itertools.combinations_with_replacement(reversed_tiles, k)):
+                yield (last - j, ''.join(reversed(leave)))
+
+
+def heuristic_value(leave):
+    '''A rough estimate of what a leave is worth in points, used when no measured values
+    are available. It is not derived from played games: it only rewards blanks and tiles
+    with few points, and punishes duplicates and an uneven mix of vowels and consonants,
+    so a table built from it ranks leaves sensibly but its values are not calibrated
+    :param leave The tiles as a string, '*' is a blank'''
+    value = 0.0
+    vowels = consonants = 0
+    for (ch, count) in Counter(leave).items():
+        if ch == '*':
+            value += 8.0 * count
+            continue
+        value += count * (1.5 - 0.6 * _letter_points[ch]) - 3.0 * (count - 1)
+        if ch in VOWELS:
+            vowels += count
+        else:
+            consonants += count
+    return value - 1.5 * (vowels - 0.4 * (vowels + consonants)) ** 2
+
+
+def compile_table(values=None, estimator=heuristic_value, sources=(), index=None):
+    '''Computes the value of every leave and serializes the table to the binary format
+    :param values A dict from leave to value, the other leaves are estimated
+    :param estimator Returns the value of a leave that is not in values
+    :param sources A list describing where the values come from, kept in the metadata
+    :param index The LeaveIndex to number the leaves with'''
+    index = index or LeaveIndex()
+    measured = {index.index(leave): value for (leave, value) in (values or {}).items()}
+    table = array.array('h', bytes(2 * index.size))
+    for (i, leave) in index.leaves():
+        value = measured[i] if i in measured else estimator(leave)
+        table[i] = max(-32768, min(32767, round(value * SCALE)))
+    metadata = json.dumps({'tiles': index.tiles, 'scale': SCALE, 'sources': list(sources),
+                           'estimator': estimator.__name__, 'byteorder': sys.byteorder}).encode('utf-8')
+    parts = [MAGIC, _header.pack(len(metadata), index.size, index.max_leave, 0), metadata, table.tobytes()]
+    return b''.join(part + b'\0' * (_padded(len(part)) - len(part)) for part in parts)
+
+
+class LeaveTable(object):
+
+    def __init__(self, buffer):
+        '''Wraps a table written by compile_table without copying it
+        :param buffer Any object supporting the buffer protocol (bytes, mmap ...)'''
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a leave table')
+        offset = len(MAGIC)
+        meta_len, entries, max_leave, _ = _header.unpack_from(view, offset)
+        offset += _header.size
+        self.metadata = json.loads(bytes(view[offset:offset+meta_len]).decode('utf-8'))
+        if self.metadata['byteorder'] != sys.byteorder:
+            raise ValueError('Leave table was built with another byte order')
+        offset += _padded(meta_len)
+        self.index = LeaveIndex(self.metadata['tiles'], max_leave)
+        if self.index.size != entries:
+            raise ValueError('Leave table has %d entries, expected %d' % (entries, self.index.size))
+        self.values = view[offset:offset + 2*entries].cast('h')
+        self.scale = self.metadata['scale']
+        self._buffer = buffer
+        self.path = None
+
+    def value(self, leave):
+        '''Returns the value of a leave in points, a tile that is not in the table raises
+        KeyError (see covers)
+        :param leave The tiles as a string or list of characters, '*' is a blank'''
+        return self.values[self.index.index(leave)] / self.scale
+
+    def covers(self, tiles):
+        '''Returns True if the table has every tile, other rulesets have tiles (w, q ...)
+        that the leaves of the table are not made of
+        :param tiles The tiles as a string or list of characters, '*' is a blank'''
+        return all(ch in self.index.codes for ch in tiles)
+
+    def move_value(self, letters, used):
+        '''Returns the value of the tiles that are left when used are played from letters
+        :param letters The rack, '*' is a blank
+        :param used The tiles that are played, '*' is a blank'''
+        leave = list(letters)
+        for ch in used:
+            leave.remove(ch)
+        return self.value(leave)
+
+    @classmethod
+    def load(cls, path):
+        '''Memory maps a leave table read-only'''
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        table = cls(buffer)
+        table.path = path
+        return table
+
+    @classmethod
+    def load_or_build(cls, path):
+        '''Memory maps a leave table, the table is built from heuristic_value first when
+        it is missing. If it can not be written the table is kept in memory'''
+        try:
+            return cls.load(path)
+        except (OSError, ValueError) as e:
+            log.info('Unable to load %s, building it: %s', path, e)
+        data = compile_table()
+        try:
+            write_atomic(path, data)
+        except OSError as e:
+            log.warning('Unable to write %s, keeping the leave table in memory: %s', path, e)
+            return cls(data)
+        return cls.load(path)
+
+    def __repr__(self):
+        return '<LeaveTable: %d leaves of up to %d tiles>' % (self.index.size, self.index.max_leave)
+
+
+def read_values(path):
+    '''Reads a file with a leave and its value on each line, separated by whitespace'''
+    values = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 2:
+                values[fields[0].lower()] = float(fields[1])
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a memory mappable table of rack leave values')
+    parser.add_argument('-v', '--values', help='File with a leave and its value on each line (default: only estimate)')
+    parser.add_argument('-o', '--output', required=True, help='Leave table to write')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    values = read_values(args.values) if args.values else {}
+    write_atomic(args.output, compile_table(values, sources=[args.values] if args.values else []))
+    log.info('Wrote %s: %r with %d measured values', args.output, LeaveTable.load(args.output), len(values))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+'''A flat binary format for the word graph that can be memory mapped read-only, so that
+loading is near-instant and processes on the same host share the physical pages.
+
+Layout (native byte order, which is recorded in the metadata):
+    magic        8 bytes
+    header       4 x uint32: metadata length, node count, edge count, reserved
+    metadata     utf-8 json (alphabet, sources, word count ...), padded to 4 bytes
+    node_word    uint32[nodes]      variant mask of the words ending in each node
+    node_variants uint32[nodes]     variant mask of the words below each node
+    node_edges   uint32[nodes+1]    offset of the first edge of each node
+    edge_target  uint32[edges]      target node of each edge
+    edge_label   uint8[edges]       index in the alphabet of each edge, padded to 4 bytes
+
+Node 0 is the root and the edges of a node are sorted by label.
+
+Compile a wordlist with: python -m wordfeudbot.wordfeud_logic.lexicon WORDFILE [-o OUTPUT]'''
+
+import argparse
+import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+log = logging.getLogger('lexicon')
+
+MAGIC = b'WFLEX\x00\x00\x01'
+_header = struct.Struct('<4I')
+_label_bytes = [bytes([i]) for i in range(256)]
+
+
+class Lexicon(object):
+
+    def __init__(self, buffer):
+        '''Wraps a compiled word graph without copying it
+        :param buffer Any object supporting the buffer protocol (bytes, mmap ...)'''
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a compiled lexicon')
+        offset = len(MAGIC)
+        meta_len, nodes, edges, _ = _header.unpack_from(view, offset)
+        offset += _header.size
+        self.metadata = json.loads(bytes(view[offset:offset+meta_len]).decode('utf-8'))
+        if self.metadata['byteorder'] != sys.byteorder:
+            raise ValueError('Lexicon was compiled with another byte order')
+        offset += _padded(meta_len)
+        self.node_word, offset = _array(view, offset, 'I', nodes)
+        self.node_variants, offset = _array(view, offset, 'I', nodes)
+        self.node_edges, offset = _array(view, offset, 'I', nodes+1)
+        self.edge_target, offset = _array(view, offset, 'I', edges)
+        self._labels_offset = offset
+        self.edge_label, offset = _array(view, offset, 'B', edges)
+        self._buffer = buffer
+        self.alphabet = self.metadata['alphabet']
+        self.sources = self.metadata['sources']
+        self.word_count = self.metadata['word_count']
+        self.node_count = nodes
+        self.edge_count = edges
+        self.labels = {ch: i for i, ch in enumerate(self.alphabet)}
+        self.path = None
+        self._tables = None
+
+    def child(self, node, label):
+        '''Returns the node reached from node through the edge with label, or -1'''
+        if label < 0:
+            return -1
+        start = self._labels_offset
+        i = self._buffer.find(_label_bytes[label], start + self.node_edges[node], start + self.node_edges[node+1])
+        return -1 if i < 0 else self.edge_target[i - start]
+
+    @property
+    def heights(self):
+        '''The length of the longest word ending below each node'''
+        return self._node_tables()[0]
+
+    @property
+    def child_masks(self):
+        '''The labels of the edges of each node as a bitmask'''
+        return self._node_tables()[1]
+
+    @property
+    def reach_masks(self):
+        '''The labels of all edges below each node as a bitmask'''
+        return self._node_tables()[2]
+
+    def _node_tables(self):
+        '''Computes heights, child_masks and reach_masks the first time one of them is needed'''
+        if self._tables is None:
+            node_edges, edge_target, edge_label = self.node_edges, self.edge_target, self.edge_label
+            heights = [-1] * self.node_count
+            child_masks = [0] * self.node_count
+            reach_masks = [0] * self.node_count
+            stack = [0]
+            while stack:
+                node = stack[-1]
+                if heights[node] >= 0:
+                    stack.pop()
+                    continue
+                edges = range(node_edges[node], node_edges[node+1])
+                pending = [edge_target[e] for e in edges if heights[edge_target[e]] < 0]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                height = child_mask = reach_mask = 0
+                for e in edges:
+                    target = edge_target[e]
+                    height = max(height, heights[target] + 1)
+                    child_mask |= 1 << edge_label[e]
+                    reach_mask |= reach_masks[target]
+                heights[node] = height
+                child_masks[node] = child_mask
+                reach_masks[node] = reach_mask | child_mask
+                stack.pop()
+            self._tables = (heights, child_masks, reach_masks)
+        return self._tables
+
+    @classmethod
+    def load(cls, path):
+        '''Memory maps a compiled lexicon read-only'''
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        lexicon = cls(buffer)
+        lexicon.path = path
+        return lexicon
+
+    def __repr__(self):
+        return '<Lexicon: %d nodes, %d edges, %d words>' % (self.node_count, self.edge_count, self.word_count)
+
+
+def _padded(n):
+    return (n + 3) & ~3
+
+
+def _array(view, offset, typecode, count):
+    size = count * struct.calcsize(typecode)
+    return view[offset:offset+size].cast(typecode), offset + _padded(size)
+
+
+def compile_graph(root, sources, word_count):
+    '''Serializes a word graph to the binary lexicon format
+    :param root The root node; nodes need word, variants and children attributes
+    :param sources A list of dicts describing the wordfiles the graph was read from
+    :param word_count The number of words in the graph'''
+    order = [root]
+    numbering = {root: 0}
+    alphabet = set()
+    i = 0
+    while i < len(order):
+        node = order[i]
+        i += 1
+        for ch, child in node.children.items():
+            alphabet.add(ch)
+            if child not in numbering:
+                numbering[child] = len(order)
+                order.append(child)
+    alphabet = ''.join(sorted(alphabet))
+    if len(alphabet) > 255:
+        raise ValueError('Too many different characters in wordlist')
+    labels = {ch: i for i, ch in enumerate(alphabet)}
+
+    node_word = array.array('I', (node.word for node in order))
+    node_variants = array.array('I', (node.variants for node in order))
+    node_edges = array.array('I', [0])
+    edge_target = array.array('I')
+    edge_label = array.array('B')
+    for node in order:
+        for ch, child in sorted(node.children.items()):
+            edge_label.append(labels[ch])
+            edge_target.append(numbering[child])
+        node_edges.append(len(edge_target))
+
+    metadata = json.dumps({'alphabet': alphabet, 'sources': sources, 'word_count': word_count,
+                           'byteorder': sys.byteorder}).encode('utf-8')
+    parts = [MAGIC, _header.pack(len(metadata), len(order), len(edge_target), 0), metadata]
+    for part in (node_word, node_variants, node_edges, edge_target, edge_label):
+        parts.append(part.tobytes())
+    return b''.join(part + b'\0' * (_padded(len(part)) - len(part)) for part in parts)
+
+
+def write_atomic(path, data):
+    '''Writes a file so that readers never see a partially written version'''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.lexicon-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def describe_source(wordfile):
+    '''Returns the information used to detect when a compiled lexicon is stale'''
+    stat = os.stat(wordfile)
+    return {'path': os.path.abspath(wordfile), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'sha1': file_digest(wordfile)}
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_index(sources, wordfile):
+    '''Returns the index of wordfile among the sources of a lexicon or None if the lexicon
+    does not contain the current version of it. Size and mtime are compared first and
+    the contents are only hashed if they differ'''
+    stat = os.stat(wordfile)
+    path = os.path.abspath(wordfile)
+    for i, source in enumerate(sources):
+        if source['path'] == path and source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+            return i
+    digest = file_digest(wordfile)
+    for i, source in enumerate(sources):
+        if source['sha1'] == digest:
+            return i
+    return None
+
+
+def main():
+    from .wordlist import Wordlist
+
+    parser = argparse.ArgumentParser(description='Compile a wordlist to a memory mappable lexicon')
+    parser.add_argument('wordfiles', nargs='+', help='Wordlists with one word per line')
+    parser.add_argument('-o', '--output', help='Compiled lexicon (default: first wordlist with .lexicon suffix)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    wordlist = Wordlist()
+    for wordfile in args.wordfiles:
+        wordlist.read_wordlist(wordfile)
+    output = args.output or os.path.splitext(args.wordfiles[0])[0] + '.lexicon'
+    wordlist.compile(output)
+    log.info('Wrote %s: %r', output, Lexicon.load(output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+'''Move generation spread over a pool of processes, one row or column per task.
+
+The words of a line only depend on the line, its cross-checks and anchors and the rack,
+so the lines of a board are independent tasks. The cross-checks are kept up to date by
+the Board in the calling process and sent along with each line; the workers only walk
+the word graph, which they memory map from the compiled lexicon so that all processes
+share the same physical pages instead of each holding a copy of the graph.'''
+
+import heapq
+import itertools
+import multiprocessing
+
+from .bitmask import BitmaskWordlist
+from .board import TopMoves, _letter_points
+from .wordlist import Wordlist
+
+# the generator of a worker process and the shared (call, bound, cancelled call) array, set by _init_worker
+_generator = None
+_bound = None
+# the points of the num_moves best moves this worker has found for a call, as (call, heap)
+_found = (None, [])
+
+
+def _init_worker(path, dominated_blanks, bound):
+    '''Maps the lexicon and computes its node tables once, when the worker is started'''
+    global _generator, _bound
+    wordlist = Wordlist()
+    wordlist.load_compiled(path)
+    _generator = BitmaskWordlist(wordlist, dominated_blanks)
+    _generator.lexicon.heights
+    _bound = bound
+
+
+def _line_moves(task):
+    '''Generates the moves of one line, all of them or the num_moves best ones
+    :param task (call, letters, variant, num_moves, horizontal, i, row, rowdata, anchors, scoring)'''
+    global _found
+    (call, letters, variant, num_moves, horizontal, i, row, rowdata, anchors, scoring) = task
+    if not num_moves:
+        words = _generator.scored_words(row, rowdata, letters, variant, anchors, scoring, _letter_points)
+        if horizontal:
+            return [(x, i, True, word, points) for (x, word, points) in words]
+        return [(i, y, False, word, points) for (y, word, points) in words]
+    best = TopMoves(num_moves)
+    best.line = (horizontal, i)
+    with _bound.get_lock():
+        if call == _bound[2]:
+            # the call has run out of time (see LinePool.calc_best_word_scores)
+            return []
+        if _bound[0] == call:
+            # the num_moves best moves of the whole board score at least the bound, and a
+            # move with the same points can still beat them if it is in an earlier line
+            best.threshold = _bound[1] - 1
+    _generator.scored_words(row, rowdata, letters, variant, anchors, scoring, _letter_points, best)
+    moves = best.moves()
+    if _found[0] != call:
+        _found = (call, [])
+    heap = _found[1]
+    for move in moves:
+        if len(heap) < num_moves:
+            heapq.heappush(heap, move[4])
+        elif move[4] > heap[0]:
+            heapq.heapreplace(heap, move[4])
+    if len(heap) == num_moves:
+        with _bound.get_lock():
+            if _bound[0] == call and _bound[1] < heap[0]:
+                _bound[1] = heap[0]
+    return moves
+
+
+class LinePool(object):
+
+    def __init__(self, wordlist, processes=None, dominated_blanks=False):
+        '''Starts the worker processes right away, so that the lexicon is mapped and its
+        node tables are computed before the first move is asked for
+        :param wordlist The Wordlist used for the cross-checks. It has to be loaded from a
+                        compiled lexicon (Wordlist.load_compiled), which the workers map
+        :param processes The number of worker processes, defaults to the number of CPUs
+        :param dominated_blanks Passed on to the BitmaskWordlist of the workers'''
+        lexicon = getattr(wordlist, 'lexicon', None)
+        if lexicon is None or lexicon.path is None:
+            raise ValueError('The wordlist has to be loaded from a compiled lexicon')
+        self.wordlist = wordlist
+        self.path = lexicon.path
+        self.processes = processes or multiprocessing.cpu_count()
+        # the workers share the lowest points that the best moves of the current call are
+        # known to reach, so that each line skips the words that can not make it, and the
+        # last call that ran out of time
+        self.bound = multiprocessing.Array('i', [0, -1, 0])
+        self.calls = itertools.count(1)
+        self.pool = multiprocessing.Pool(self.processes, _init_worker, (self.path, dominated_blanks, self.bound))
+
+    def _tasks(self, board, letters, variant, num_moves):
+        call = next(self.calls)
+        with self.bound.get_lock():
+            self.bound[0] = call
+            self.bound[1] = -1
+        board.update_cross_checks(self.wordlist, variant)
+        for horizontal in (True, False):
+            for (i, row) in enumerate(board.horizontal if horizontal else board.vertical):
+                anchors = board.anchors[horizontal][i]
+                if anchors:
+                    yield (call, letters, variant, num_moves, horizontal, i, row, board.rowdata[horizontal][i],
+                           anchors, board.line_scoring(horizontal, i))
+
+    def calc_all_word_scores(self, board, letters, variant=1):
+        '''Returns the same moves as Board.calc_all_word_scores with a BitmaskWordlist, in
+        the same order
+        :param board The Board to generate the moves for
+        :param letters The letters that can be used to form a word, * for wildcard'''
+        moves = []
+        for line in self.pool.map(_line_moves, self._tasks(board, letters, variant, 0)):
+            moves.extend(line)
+        return moves
+
+    def calc_best_word_scores(self, board, letters, variant=1, num_moves=10, deadline=None):
+        '''Returns the same moves as Board.calc_best_word_scores with a BitmaskWordlist.
+        Each line keeps its own num_moves best moves and the lines are merged in order,
+        so moves with the same points are ranked the same way. The workers share the
+        points of the best moves found so far, so a line skips the words that can not
+        beat them just like the lines of Board.calc_best_word_scores do
+        :param board The Board to generate the moves for
+        :param letters The letters that can be used to form a word, * for wildcard
+        :param num_moves The number of moves to return
+        :param deadline A Deadline. The most promising lines are handed out first and the
+                        lines that are finished when it has passed are merged, which may
+                        be none. The workers skip the lines of this call that they have
+                        not started, other calls are not affected'''
+        if num_moves <= 0:
+            return []
+        tasks = self._tasks(board, letters, variant, num_moves)
+        if deadline is None:
+            lines = self.pool.map(_line_moves, tasks)
+        else:
+            tasks = sorted(tasks, key=lambda task: -board.line_promise(task[4], task[5]))
+            results = self.pool.imap_unordered(_line_moves, tasks)
+            lines = []
+            # a slow line does not hold the call past the deadline
+            while len(lines) < len(tasks) and not deadline.passed():
+                try:
+                    lines.append(results.next(timeout=deadline.remaining()))
+                except multiprocessing.TimeoutError:
+                    pass
+            if len(lines) < len(tasks):
+                with self.bound.get_lock():
+                    self.bound[2] = tasks[0][0]
+        return heapq.nlargest(num_moves, (move for line in lines for move in line), lambda move: move[4])
+
+    def close(self):
+        '''Stops the worker processes'''
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return '<LinePool: %d processes, %s>' % (self.processes, self.path)
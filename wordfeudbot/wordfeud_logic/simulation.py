@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+'''Monte Carlo simulation of the opponents reply to the candidate moves of a turn.
+
+The opponents rack is unknown while there are tiles in the bag, so many racks are drawn
+at once from the tiles that have not been seen, and the best reply of each rack is
+searched on the board after every candidate move. The same racks are used for every
+candidate, so the differences between the candidates are not drowned in the noise of the
+draws, and racks that are drawn more than once are searched once and weighted.
+
+The searches run in rounds of a few racks for every candidate, in a pool of processes
+started by parallel._init_worker (for example the pool of a LinePool) or in the calling
+process, until all racks are searched or the time budget of the turn is spent.'''
+
+import time
+
+import numpy
+
+from . import parallel
+from .board import Board
+
+# the boards a worker has built for a simulation, as (call, {index: board})
+_boards = (None, {})
+
+
+def draw_racks(unseen, count, size=7, rng=None):
+    '''Draws count racks of size tiles without replacement from the unseen tiles
+    Returns a list of (rack, times drawn), racks are sorted strings
+    :param unseen The tiles that are in the bag or on the opponents rack, '*' is a blank
+    :param count The number of racks to draw
+    :param size The number of tiles on a rack, at most the number of unseen tiles
+    :param rng A numpy.random.Generator, defaults to a new one'''
+    if not unseen or count <= 0:
+        return []
+    rng = rng or numpy.random.default_rng()
+    (alphabet, codes) = numpy.unique(numpy.array(list(unseen)), return_inverse=True)
+    size = min(size, len(codes))
+    # the size smallest of uniform keys are a uniformly drawn subset of the tiles
+    keys = rng.random((count, len(codes)))
+    picked = numpy.argpartition(keys, size - 1, axis=1)[:, :size] if size < len(codes) else \
+        numpy.broadcast_to(numpy.arange(size), (count, size))
+    racks = numpy.sort(codes[picked], axis=1)
+    (racks, times) = numpy.unique(racks, axis=0, return_counts=True)
+    return [(''.join(alphabet[racks[i]]), int(times[i])) for i in range(len(racks))]
+
+
+def _replies(task, generator=None):
+    '''Returns the points of the best reply of each rack on one board
+    :param task (call, index, board, variant, racks), board is a Board or (rows, squares)
+                that a worker builds into a Board once per call and index
+    :param generator The move generator, defaults to the one of the worker process'''
+    global _boards
+    (call, index, board, variant, racks) = task
+    if not isinstance(board, Board):
+        if _boards[0] != call:
+            _boards = (call, {})
+        if index not in _boards[1]:
+            (rows, squares) = board
+            _boards[1][index] = Board(squares, expand=False)
+            _boards[1][index].set_state(rows)
+        board = _boards[1][index]
+    generator = generator or parallel._generator
+    points = []
+    for rack in racks:
+        best = board.calc_best_word_scores(rack, generator, variant, 1, anchored=True)
+        points.append(best[0][4] if best else 0)
+    return points
+
+
+class ReplySimulator(object):
+
+    def __init__(self, wordlist, pool=None, racks=200, chunk=4, seed=None):
+        '''Simulates the opponents replies with racks drawn from the unseen tiles
+        :param wordlist The move generator to search with in this process
+        :param pool A multiprocessing.Pool started with parallel._init_worker to search
+                    with instead, the workers use their own move generator
+        :param racks The number of racks drawn for each turn
+        :param chunk The number of racks searched for every candidate in each round
+        :param seed Seed of the random racks, for repeatable simulations'''
+        self.wordlist = wordlist
+        self.pool = pool
+        self.racks = racks
+        self.chunk = chunk
+        self.rng = numpy.random.default_rng(seed)
+        self.simulations = 0
+        self.timeouts = 0
+        self._calls = 0
+
+    def simulate(self, board, unseen, moves, variant=1, budget=None):
+        '''Searches the best reply of each drawn rack on the board and on the board after
+        each move. Returns [(expected, worst, racks searched)] for the board itself
+        followed by each move, expected and worst are the average and highest points of
+        the replies. Stops after the round in which the budget runs out, so all boards
+        are searched with the same racks
+        :param board The Board before the move
+        :param unseen The tiles that are in the bag or on the opponents rack, '*' is a blank
+        :param moves The candidate moves as (x, y, horizontal, word, points)
+        :param variant The variant of the wordlist
+        :param budget The number of seconds that the simulation may take, defaults to no limit'''
+        deadline = None if budget is None else time.monotonic() + budget
+        self.simulations += 1
+        self._calls += 1
+        racks = draw_racks(''.join(unseen).lower(), self.racks, rng=self.rng)
+        boards = [board]
+        for (x, y, horizontal, word, _) in moves:
+            after = board.copy()
+            after.play_word(word, x, y, horizontal)
+            boards.append(after)
+        if self.pool:
+            boards = [(board.horizontal, board.board) for board in boards]
+
+        totals = [[0, 0, 0] for _ in boards]
+        for start in range(0, len(racks), self.chunk):
+            chunk = racks[start:start + self.chunk]
+            tasks = [((id(self), self._calls), i, board, variant, [rack for (rack, _) in chunk])
+                     for (i, board) in enumerate(boards)]
+            if self.pool:
+                results = [result.get() for result in [self.pool.apply_async(_replies, (task,)) for task in tasks]]
+            else:
+                results = [_replies(task, self.wordlist) for task in tasks]
+            for (total, points) in zip(totals, results):
+                for ((_, times), reply) in zip(chunk, points):
+                    total[0] += times * reply
+                    total[1] = max(total[1], reply)
+                    total[2] += times
+            if deadline is not None and time.monotonic() > deadline and start + self.chunk < len(racks):
+                self.timeouts += 1
+                break
+        return [(total[0] / total[2] if total[2] else 0.0, total[1], total[2]) for total in totals]
+
+    def __repr__(self):
+        return '<ReplySimulator: %d racks, %d simulations, %d out of time>' % (self.racks, self.simulations,
+                                                                               self.timeouts)
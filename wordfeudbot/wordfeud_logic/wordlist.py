@@ -5,47 +5,122 @@
 
 import logging
 
+from .cache import LRUCache
+from .lexicon import Lexicon, compile_graph, describe_source, source_index, write_atomic
+
 log = logging.getLogger('wordlist')
 
 
 class Wordlist(object):
 
-    def __init__(self):
+    def __init__(self, cross_check_cache_size=20000):
         '''Initializes a Wordlist object. It can actually contain several wordlists
-        in the same datastructure (to save memory)'''
+        in the same datastructure (to save memory)
+        :param cross_check_cache_size The number of get_legal_characters results to keep'''
         self.root = Node()
         self.wordfiles = []
         self.all_chars = set()
         self.word_count = 0
+        self.sources = []
+        self.lexicon = None
+        self.cross_checks = LRUCache(cross_check_cache_size)
 
     def read_wordlist(self, wordfile):
         '''Reads a wordlist from a file that contains one word per line in utf-8 format
+        and rebuilds the word graph as a minimized DAWG
         :param wordfile The name of the file to read from'''
         if wordfile in self.wordfiles:
             log.info('%s already loaded', wordfile)
             return
         variant = 1 << len(self.wordfiles)
+        entries = dict(self.iter_words())
         with open(wordfile) as f:
             for line in f:
                 word = line.lower().strip()
+                if not word:
+                    continue
                 if word[0] == '#':
                     log.debug('Wordlist comment: %s', word[1:])
                     continue
-                self.add(word, variant)
+                entries[word] = entries.get(word, 0) | variant
+        self.root = build_dawg(sorted(entries.items()))
+        self.all_chars = set(''.join(entries))
+        self.word_count = sum(bin(variants).count('1') for variants in entries.values())
         self.wordfiles.append(wordfile)
+        self.sources.append(describe_source(wordfile))
+        self.lexicon = None
+        self.cross_checks.clear()
         return variant
 
+    def compile(self, path):
+        '''Writes the word graph to a binary lexicon that can be loaded with load_compiled
+        :param path The name of the file to write'''
+        write_atomic(path, compile_graph(self.root, self.sources, self.word_count))
+
+    def load_compiled(self, path, wordfile=None):
+        '''Memory maps a lexicon written by compile. If wordfile is given and the lexicon
+        is missing or was not compiled from the current version of it, the wordlist is
+        read from wordfile instead and the lexicon is rebuilt.
+        Returns the variant of wordfile (or of the first wordlist in the lexicon)
+        :param path The name of the compiled lexicon
+        :param wordfile The wordlist the lexicon was compiled from'''
+        try:
+            lexicon = Lexicon.load(path)
+            index = source_index(lexicon.sources, wordfile) if wordfile else 0
+        except (OSError, ValueError) as e:
+            if wordfile is None:
+                raise
+            log.info('Unable to load %s: %s', path, e)
+            lexicon = index = None
+        if index is None:
+            if lexicon is not None:
+                log.info('%s is stale, rebuilding it from %s', path, wordfile)
+            self.__init__(self.cross_checks.maxsize)
+            variant = self.read_wordlist(wordfile)
+            try:
+                self.compile(path)
+                lexicon = Lexicon.load(path)
+                index = source_index(lexicon.sources, wordfile)
+            except OSError as e:
+                log.warning('Unable to write %s, keeping the wordlist in memory: %s', path, e)
+                return variant
+        self.lexicon = lexicon
+        self.root = CompiledNode(lexicon, 0)
+        self.wordfiles = [source['path'] for source in lexicon.sources]
+        self.sources = lexicon.sources
+        self.all_chars = set(lexicon.alphabet)
+        self.word_count = lexicon.word_count
+        self.cross_checks.clear()
+        return 1 << index
+
     def add(self, word, variant):
+        '''Adds a single word. Nodes may be shared between words after minimization,
+        so the path to the new word is copied instead of modified in place'''
         self.all_chars.update(word)
-        node = self.root
+        self.lexicon = None
+        self.cross_checks.clear()
+        self.root = node = self.root.copy()
         for ch in word:
             node.variants |= variant
-            node = node.child(ch)
+            child = node.children.get(ch)
+            child = child.copy() if child else Node()
+            node.children[ch] = child
+            node = child
         if (node.word & variant) == 0:
             node.word |= variant
             node.variants |= variant
             self.word_count += 1
 
+    def iter_words(self):
+        '''Yields every word in the graph as (word, variants) in sorted order'''
+        stack = [('', self.root)]
+        while stack:
+            prefix, node = stack.pop()
+            if node.word:
+                yield (prefix, node.word)
+            stack.extend((prefix+ch, child) for ch, child in
+                         sorted(node.children.items(), reverse=True))
+
     def words(self, row, rowdata, letters, variant):
         assert (len(row) == len(rowdata)), ("%d == %d" %
                                             (len(row), len(rowdata)))
@@ -55,13 +130,93 @@ class Wordlist(object):
                 continue
             yield from ((pos, word) for word in self.root.matches(row, rowdata, pos, letters, variant))
 
+    def anchored_words(self, row, rowdata, letters, variant, anchors=None):
+        '''Generates the same (position, word) pairs as words() using the algorithm of
+        Appel & Jacobson: every word must cover an anchor square (an empty square that is
+        connected or next to a tile). For each anchor the part left of it is either the tiles
+        already there or built from the rack on the empty non-anchor squares before it, and
+        the word is then extended to the right through the anchor
+        :param anchors The anchors of the row if they are already known (see Board.update_cross_checks)'''
+        assert (len(row) == len(rowdata)), ("%d == %d" %
+                                            (len(row), len(rowdata)))
+        previous = -1
+        for anchor in (self.anchors(row, rowdata) if anchors is None else anchors):
+            if anchor > 0 and row[anchor-1] != ' ':
+                start = row.rfind(' ', 0, anchor) + 1
+                node = self.root
+                for ch in row[start:anchor].lower():
+                    node = node.has_child(ch)
+                    if not node or (node.variants & variant) == 0:
+                        break
+                else:
+                    yield from self._extend_right(row, rowdata, anchor, start, anchor, node, row[start:anchor],
+                                                  letters, variant)
+            else:
+                yield from self._left_part(row, rowdata, anchor, anchor-previous-1, self.root, '', letters, variant)
+            previous = anchor
+
+    @classmethod
+    def anchors(cls, row, rowdata):
+        '''Returns the anchor squares of a row in order'''
+        n = len(row)
+        return [i for i in range(n) if row[i] == ' ' and (
+            rowdata[i][1] or (i > 0 and row[i-1] != ' ') or (i < n-1 and row[i+1] != ' '))]
+
+    def _left_part(self, row, rowdata, anchor, limit, node, word, letters, variant):
+        start = anchor - len(word)
+        if all(ch.lower() in rowdata[start+i][0] for i, ch in enumerate(word)):
+            yield from self._extend_right(row, rowdata, anchor, start, anchor, node, word, letters, variant)
+        if limit == 0:
+            return
+        for ch, child, next_letters in self._rack_steps(node, letters, variant):
+            yield from self._left_part(row, rowdata, anchor, limit-1, child, word+ch, next_letters, variant)
+
+    def _extend_right(self, row, rowdata, anchor, start, pos, node, word, letters, variant):
+        if pos < len(row) and row[pos] != ' ':
+            child = node.has_child(row[pos].lower())
+            if child and (child.variants & variant):
+                yield from self._extend_right(row, rowdata, anchor, start, pos+1, child, word+row[pos],
+                                              letters, variant)
+            return
+        if pos > anchor and (node.word & variant) and len(word) > 1:
+            yield (start, word)
+        if pos < len(row):
+            valid_chars = rowdata[pos][0]
+            for ch, child, next_letters in self._rack_steps(node, letters, variant, valid_chars):
+                yield from self._extend_right(row, rowdata, anchor, start, pos+1, child, word+ch,
+                                              next_letters, variant)
+
+    @classmethod
+    def _rack_steps(cls, node, letters, variant, valid_chars=None):
+        '''Yields (letter, child, remaining letters) for each letter in the rack that continues
+        a word from node, blanks as upper case letters'''
+        for i, ch in enumerate(letters):
+            if letters.find(ch, 0, i) != -1:
+                continue
+            next_letters = letters[:i] + letters[i+1:]
+            if ch == '*':
+                for wc, child in node.children.items():
+                    if (valid_chars is None or wc in valid_chars) and (child.variants & variant):
+                        yield (wc.upper(), child, next_letters)
+            elif valid_chars is None or ch in valid_chars:
+                child = node.has_child(ch)
+                if child and (child.variants & variant):
+                    yield (ch, child, next_letters)
+
     def get_legal_characters(self, word, variant):
+        '''Returns the characters that can be placed in the (single) space in word.
+        Results are cached since the same patterns come up in every game
+        :param word The surrounding characters with a space where the character goes'''
         if word == ' ':
             return self.all_chars
-        i = word.find(' ')
-        m = list(self.root.matches(
-            word+' ', [(self.all_chars, True)]*(len(word)+1), 0, '*', variant))
-        return set(match[i].lower() for match in m)
+        key = (word, variant)
+        chars = self.cross_checks.get(key)
+        if chars is None:
+            i = word.find(' ')
+            m = list(self.root.matches(
+                word+' ', [(self.all_chars, True)]*(len(word)+1), 0, '*', variant))
+            chars = self.cross_checks[key] = frozenset(match[i].lower() for match in m)
+        return chars
 
     def is_word(self, word, variant=1):
         node = self.root
@@ -80,11 +235,20 @@ class Wordlist(object):
 
 class Node(object):
 
+    __slots__ = ('word', 'variants', 'children')
+
     def __init__(self):
         self.word = 0
         self.variants = 0
         self.children = {}
 
+    def copy(self):
+        node = Node()
+        node.word = self.word
+        node.variants = self.variants
+        node.children = dict(self.children)
+        return node
+
     def child(self, char):
         try:
             return self.children[char]
@@ -121,3 +285,132 @@ class Node(object):
                         child = self.children.get(ch)
                         if child:
                             yield from child.matches(row, rowdata, pos+1, letters[:i] + letters[i+1:], variant, word+ch, connecting or connected, True)
+
+
+class CompiledNode(object):
+    '''A node of a compiled lexicon with the same interface as Node'''
+
+    __slots__ = ('lexicon', 'index')
+
+    def __init__(self, lexicon, index):
+        self.lexicon = lexicon
+        self.index = index
+
+    @property
+    def word(self):
+        return self.lexicon.node_word[self.index]
+
+    @property
+    def variants(self):
+        return self.lexicon.node_variants[self.index]
+
+    @property
+    def children(self):
+        lexicon = self.lexicon
+        alphabet = lexicon.alphabet
+        return {alphabet[lexicon.edge_label[e]]: CompiledNode(lexicon, lexicon.edge_target[e])
+                for e in range(lexicon.node_edges[self.index], lexicon.node_edges[self.index+1])}
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledNode) and (self.lexicon, self.index) == (other.lexicon, other.index)
+
+    def __hash__(self):
+        return hash(self.index)
+
+    def copy(self):
+        node = Node()
+        node.word = self.word
+        node.variants = self.variants
+        node.children = self.children
+        return node
+
+    def has_child(self, char):
+        child = self.lexicon.child(self.index, self.lexicon.labels.get(char, -1))
+        return CompiledNode(self.lexicon, child) if child >= 0 else None
+
+    def matches(self, row, rowdata, pos, letters, variant, word='', connecting=False, extending=False):
+        '''Same as Node.matches but walks the arrays of the lexicon directly'''
+        return _compiled_matches(self.lexicon, self.index, row, rowdata, pos, letters, variant,
+                                 word, connecting, extending)
+
+
+def _compiled_matches(lexicon, node, row, rowdata, pos, letters, variant, word, connecting, extending):
+    if pos < len(row) and (variant & lexicon.node_variants[node]) != 0:
+        if row[pos] != ' ':
+            child = lexicon.child(node, lexicon.labels.get(row[pos].lower(), -1))
+            if child >= 0:
+                yield from _compiled_matches(lexicon, child, row, rowdata, pos+1, letters, variant,
+                                             word+row[pos], True, extending)
+        else:
+            if lexicon.node_word[node] and connecting and extending and len(word) > 1:
+                yield word
+            if pos < len(row)-1:
+                valid_chars, connected = rowdata[pos]
+                labels = lexicon.labels
+                for i, ch in enumerate(letters):
+                    if not ch in valid_chars and ch != '*':
+                        continue
+                    if letters.find(ch, 0, i) != -1:
+                        continue
+                    next_letters = letters[:i] + letters[i+1:]
+                    if ch == '*':
+                        # wildcard
+                        alphabet, edge_label, edge_target = lexicon.alphabet, lexicon.edge_label, lexicon.edge_target
+                        for e in range(lexicon.node_edges[node], lexicon.node_edges[node+1]):
+                            wc = alphabet[edge_label[e]]
+                            if wc in valid_chars:
+                                yield from _compiled_matches(lexicon, edge_target[e], row, rowdata, pos+1,
+                                                             next_letters, variant, word+wc.upper(),
+                                                             connecting or connected, True)
+                    elif ch in labels:
+                        child = lexicon.child(node, labels[ch])
+                        if child >= 0:
+                            yield from _compiled_matches(lexicon, child, row, rowdata, pos+1, next_letters, variant,
+                                                         word+ch, connecting or connected, True)
+
+
+def build_dawg(entries):
+    '''Builds a minimized DAWG (a trie where equal suffix graphs are shared) using the
+    incremental algorithm of Daciuk et al. so the full trie never has to be held in memory
+    :param entries (word, variants) pairs sorted by word'''
+    register = {}
+    root = Node()
+    path = [root]
+    previous = ''
+    for word, variants in entries:
+        common = 0
+        for a, b in zip(previous, word):
+            if a != b:
+                break
+            common += 1
+        _replace_or_register(path, previous, common, register)
+        node = path[-1]
+        for ch in word[common:]:
+            child = node.children[ch] = Node()
+            path.append(child)
+            node = child
+        node.word |= variants
+        previous = word
+    _replace_or_register(path, previous, 0, register)
+    _freeze(root)
+    return root
+
+
+def _freeze(node):
+    node.variants = node.word
+    for child in node.children.values():
+        node.variants |= child.variants
+
+
+def _replace_or_register(path, word, depth, register):
+    '''Minimizes the nodes of the previous word below depth, replacing each one with an
+    equivalent registered node if there is one'''
+    while len(path) > depth+1:
+        node = path.pop()
+        _freeze(node)
+        key = (node.word, tuple(node.children), tuple(map(id, node.children.values())))
+        existing = register.get(key)
+        if existing is None:
+            register[key] = node
+        else:
+            path[-1].children[word[len(path)-1]] = existing